@@ -19,6 +19,8 @@ depends_on: Union[str, Sequence[str], None] = None
 
 
 def upgrade() -> None:
+    # Значения по умолчанию sa.func.now() (вместо текста now()) добавлены для SQLite. В Postgres они дают
+    # тот же DDL (DEFAULT now()), поэтому базы, где миграция уже применена, не отличаются от новых
     # ### commands auto generated by Alembic - please adjust! ###
     op.create_table('user',
     sa.Column('id', sa.Integer(), nullable=False),
@@ -27,8 +29,8 @@ def upgrade() -> None:
     sa.Column('chat_id', sa.String(length=50), nullable=True),
     sa.Column('password', sa.String(length=128), nullable=False),
     sa.Column('nick', sa.String(length=50), nullable=True),
-    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
-    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
     sa.PrimaryKeyConstraint('id'),
     sa.UniqueConstraint('username')
     )
@@ -38,8 +40,8 @@ def upgrade() -> None:
     sa.Column('user_id', sa.Integer(), nullable=True),
     sa.Column('notification_text', sa.String(length=500), nullable=True),
     sa.Column('status', sa.Boolean(), nullable=True),
-    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
-    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
     sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
     sa.PrimaryKeyConstraint('id')
     )
@@ -63,8 +65,8 @@ def upgrade() -> None:
     sa.Column('amount', sa.Integer(), nullable=True),
     sa.Column('description', sa.String(length=300), nullable=True),
     sa.Column('date_added', sa.String(), nullable=True),
-    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
-    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
     sa.ForeignKeyConstraint(['activity_id'], ['activity.id'], ),
     sa.PrimaryKeyConstraint('id')
     )
@@ -0,0 +1,45 @@
+"""add_auth_session
+
+Revision ID: 3b1c5a9d2f47
+Revises: e7d88d37e149
+Create Date: 2026-10-19 10:12:31.512304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b1c5a9d2f47'
+down_revision: Union[str, None] = 'e7d88d37e149'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('auth_session',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('token_hash', sa.String(length=64), nullable=False),
+    sa.Column('device', sa.String(length=200), nullable=True),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('token_hash')
+    )
+    op.create_index(op.f('ix_auth_session_user_id'), 'auth_session', ['user_id'], unique=False)
+    op.create_index(op.f('ix_auth_session_expires_at'), 'auth_session', ['expires_at'], unique=False)
+    # Рефреш токены в открытом виде больше не хранятся; пользователям потребуется войти заново
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('refresh_token')
+
+
+def downgrade() -> None:
+    op.add_column('user', sa.Column('refresh_token', sa.String(), nullable=True))
+    op.drop_index(op.f('ix_auth_session_expires_at'), table_name='auth_session')
+    op.drop_index(op.f('ix_auth_session_user_id'), table_name='auth_session')
+    op.drop_table('auth_session')
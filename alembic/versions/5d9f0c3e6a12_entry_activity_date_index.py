@@ -0,0 +1,26 @@
+"""entry_activity_date_index
+
+Revision ID: 5d9f0c3e6a12
+Revises: 8c4e2d7a1b93
+Create Date: 2026-10-19 11:48:05.671920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d9f0c3e6a12'
+down_revision: Union[str, None] = '8c4e2d7a1b93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_entry_activity_id_date_added', 'entry', ['activity_id', 'date_added'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_entry_activity_id_date_added', table_name='entry')
@@ -0,0 +1,31 @@
+"""add_shard_directory
+
+Revision ID: 6e2b9d4f1c87
+Revises: c7f3a8e1d204
+Create Date: 2026-10-19 14:02:11.318240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e2b9d4f1c87'
+down_revision: Union[str, None] = 'c7f3a8e1d204'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('shard_directory',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('shard_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('shard_directory')
@@ -0,0 +1,38 @@
+"""friend_graph_indexes
+
+Revision ID: 8c4e2d7a1b93
+Revises: 3b1c5a9d2f47
+Create Date: 2026-10-19 11:03:47.208115
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c4e2d7a1b93'
+down_revision: Union[str, None] = '3b1c5a9d2f47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Приводим существующие данные к инварианту: без дружбы с собой и с симметричными парами
+    op.execute('DELETE FROM user_friend WHERE user_id = friend_id')
+    op.execute(
+        'INSERT INTO user_friend (user_id, friend_id) '
+        'SELECT friend_id, user_id FROM user_friend WHERE true '
+        'ON CONFLICT DO NOTHING'
+    )
+    # SQLite не поддерживает добавление ограничений: batch-режим пересоздает таблицу
+    with op.batch_alter_table('user_friend') as batch_op:
+        batch_op.create_check_constraint('ck_user_friend_not_self', 'user_id <> friend_id')
+    op.create_index('ix_user_friend_friend_id', 'user_friend', ['friend_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_friend_friend_id', table_name='user_friend')
+    with op.batch_alter_table('user_friend') as batch_op:
+        batch_op.drop_constraint('ck_user_friend_not_self', type_='check')
@@ -0,0 +1,27 @@
+"""activity_revision
+
+Revision ID: 9a5c1e7f3b26
+Revises: 6e2b9d4f1c87
+Create Date: 2026-10-19 14:48:27.551093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a5c1e7f3b26'
+down_revision: Union[str, None] = '6e2b9d4f1c87'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('activity', sa.Column('revision', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('activity') as batch_op:
+        batch_op.drop_column('revision')
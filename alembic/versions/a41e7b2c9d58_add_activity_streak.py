@@ -0,0 +1,107 @@
+"""add_activity_streak
+
+Revision ID: a41e7b2c9d58
+Revises: 5d9f0c3e6a12
+Create Date: 2026-10-19 12:30:52.118734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41e7b2c9d58'
+down_revision: Union[str, None] = '5d9f0c3e6a12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Берутся только корректные даты: строка проверяется до приведения к date (2026-02-30 при приведении
+# вызывает ошибку и прерывает миграцию). Ветви CASE вычисляются по порядку, в отличие от условий WHERE,
+# поэтому приведение и make_date выполняются только для строк, прошедших предыдущие проверки
+POSTGRES_BACKFILL = """
+        WITH checked AS (
+            SELECT activity_id,
+                   CASE
+                       WHEN date_added !~ '^\\d{4}-\\d{2}-\\d{2}$' THEN NULL
+                       WHEN substr(date_added, 1, 4)::int < 1 OR substr(date_added, 6, 2)::int NOT BETWEEN 1 AND 12
+                           THEN NULL
+                       WHEN substr(date_added, 9, 2)::int NOT BETWEEN 1 AND EXTRACT(DAY FROM
+                           make_date(substr(date_added, 1, 4)::int, substr(date_added, 6, 2)::int, 1)
+                           + INTERVAL '1 month - 1 day')
+                           THEN NULL
+                       ELSE date_added::date
+                   END AS day
+            FROM entry
+            WHERE activity_id IS NOT NULL
+        ), days AS (
+            SELECT DISTINCT activity_id, day
+            FROM checked
+            WHERE day IS NOT NULL
+        ), islands AS (
+            SELECT activity_id, day,
+                   day - (ROW_NUMBER() OVER (PARTITION BY activity_id ORDER BY day))::int AS grp
+            FROM days
+        ), runs AS (
+            SELECT activity_id, MIN(day) AS run_start, MAX(day) AS last_active_day, COUNT(*) AS run_length
+            FROM islands
+            GROUP BY activity_id, grp
+        )
+        INSERT INTO activity_streak (activity_id, run_length, run_start, last_active_day, longest_streak)
+        SELECT DISTINCT ON (activity_id)
+               activity_id, run_length, run_start, last_active_day,
+               MAX(run_length) OVER (PARTITION BY activity_id)
+        FROM runs
+        ORDER BY activity_id, last_active_day DESC
+"""
+
+# То же для SQLite: берутся только корректные даты (date() с модификатором нормализует 2026-02-30 в 2026-03-02),
+# разность дат считается через julianday, вместо DISTINCT ON - номер серии в окне
+SQLITE_BACKFILL = """
+        WITH days AS (
+            SELECT DISTINCT activity_id, date(date_added) AS day
+            FROM entry
+            WHERE activity_id IS NOT NULL AND date(date_added, '+0 days') = date_added
+        ), islands AS (
+            SELECT activity_id, day,
+                   julianday(day) - ROW_NUMBER() OVER (PARTITION BY activity_id ORDER BY day) AS grp
+            FROM days
+        ), runs AS (
+            SELECT activity_id, MIN(day) AS run_start, MAX(day) AS last_active_day, COUNT(*) AS run_length
+            FROM islands
+            GROUP BY activity_id, grp
+        ), ranked AS (
+            SELECT activity_id, run_length, run_start, last_active_day,
+                   MAX(run_length) OVER (PARTITION BY activity_id) AS longest_streak,
+                   ROW_NUMBER() OVER (PARTITION BY activity_id ORDER BY last_active_day DESC) AS position
+            FROM runs
+        )
+        INSERT INTO activity_streak (activity_id, run_length, run_start, last_active_day, longest_streak)
+        SELECT activity_id, run_length, run_start, last_active_day, longest_streak
+        FROM ranked
+        WHERE position = 1
+"""
+
+
+def upgrade() -> None:
+    op.create_table('activity_streak',
+    sa.Column('activity_id', sa.Integer(), nullable=False),
+    sa.Column('run_length', sa.Integer(), nullable=False),
+    sa.Column('run_start', sa.Date(), nullable=True),
+    sa.Column('last_active_day', sa.Date(), nullable=True),
+    sa.Column('longest_streak', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['activity_id'], ['activity.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('activity_id')
+    )
+    # Начальное заполнение серий одним запросом (gaps and islands): для каждой активности
+    # берется последняя серия и самая длинная серия
+    if op.get_context().dialect.name == 'sqlite':
+        op.execute(SQLITE_BACKFILL)
+    else:
+        op.execute(POSTGRES_BACKFILL)
+
+
+def downgrade() -> None:
+    op.drop_table('activity_streak')
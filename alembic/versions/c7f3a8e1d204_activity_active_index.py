@@ -0,0 +1,27 @@
+"""activity_active_index
+
+Revision ID: c7f3a8e1d204
+Revises: a41e7b2c9d58
+Create Date: 2026-10-19 13:15:40.904516
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7f3a8e1d204'
+down_revision: Union[str, None] = 'a41e7b2c9d58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_activity_user_id_active', 'activity', ['user_id'], unique=False,
+                    postgresql_where=sa.text('status'), sqlite_where=sa.text('status'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activity_user_id_active', table_name='activity')
@@ -25,6 +25,9 @@ def upgrade() -> None:
 
 
 def downgrade() -> None:
+    # batch_alter_table добавлен для SQLite (пересоздание таблицы). В Postgres выполняется тот же
+    # ALTER TABLE ... DROP COLUMN, что и раньше
     # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_column('user', 'refresh_token')
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('refresh_token')
     # ### end Alembic commands ###
@@ -0,0 +1,27 @@
+"""user_friends_revision
+
+Revision ID: f3a9c2d17b45
+Revises: 9a5c1e7f3b26
+Create Date: 2026-10-20 10:12:41.208364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a9c2d17b45'
+down_revision: Union[str, None] = '9a5c1e7f3b26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user', sa.Column('friends_revision', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('friends_revision')
@@ -0,0 +1,73 @@
+"""
+Бенчмарк проверки JWT (src.user.utils.decode_token).
+
+Измеряет среднее время проверки токена на запрос без кэша (jwt.decode, как до появления кэша),
+через decode_token при промахе кэша (каждый токен встречается впервые) и при попадании
+(рабочий набор из --tokens токенов, многократно проверяемых по кругу, как у активных пользователей).
+
+Запуск: python -m benchmarks.auth [--calls N] [--tokens N]
+"""
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from jose import jwt
+
+from src.config import settings
+from src.user.utils import decode_token, token_cache
+
+
+def make_tokens(count: int) -> List[str]:
+    expire = datetime.utcnow() + timedelta(hours=1)
+    return [jwt.encode({"sub": f"bench{number}", "exp": expire}, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+            for number in range(count)]
+
+
+def measure(decode: Callable[[str], dict], tokens: List[str], calls: int) -> float:
+    started = time.perf_counter()
+    for number in range(calls):
+        decode(tokens[number % len(tokens)])
+    return (time.perf_counter() - started) / calls
+
+
+def decode_uncached(token: str) -> dict:
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def run(calls: int, tokens: int) -> dict:
+    if tokens > token_cache.maxsize:
+        raise SystemExit(f"--tokens больше JWT_CACHE_SIZE ({token_cache.maxsize}): попаданий не будет")
+    working_set = make_tokens(tokens)
+    distinct = make_tokens(calls)
+
+    uncached = measure(decode_uncached, working_set, calls)
+    token_cache.entries.clear()
+    miss = measure(decode_token, distinct, calls)
+    token_cache.entries.clear()
+    measure(decode_token, working_set, tokens)
+    hit = measure(decode_token, working_set, calls)
+    return {
+        "calls": calls,
+        "working_set_tokens": tokens,
+        "algorithm": settings.ALGORITHM,
+        "uncached_us": round(uncached * 1e6, 2),
+        "cache_miss_us": round(miss * 1e6, 2),
+        "cache_hit_us": round(hit * 1e6, 2),
+        "miss_overhead_us": round((miss - uncached) * 1e6, 2),
+        "hit_saving_us": round((uncached - hit) * 1e6, 2),
+        "hit_speedup": round(uncached / hit, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки JWT")
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--tokens", type=int, default=1000, help="рабочий набор токенов для попаданий в кэш")
+    args = parser.parse_args()
+    print(json.dumps(run(args.calls, args.tokens), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Бенчмарк накладных расходов телеметрии (src.instrumentation).
+
+Измеряет среднее время обработки запроса ASGI-приложением с InstrumentationMiddleware и без него
+(пустой эндпоинт - худший случай для относительных накладных расходов), а также стоимость
+обработчиков событий запросов к базе данных в пересчете на один запрос.
+
+Запуск: python -m benchmarks.instrumentation [--requests N]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from fastapi import FastAPI
+
+from src.instrumentation import InstrumentationMiddleware, _after_cursor_execute, _before_cursor_execute, \
+    _request_db_stats
+
+
+def make_app(instrumented: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/items/{item_id}")
+    async def item(item_id: int):
+        return {"id": item_id}
+
+    if instrumented:
+        app.add_middleware(InstrumentationMiddleware)
+    return app
+
+
+async def call(app, path: str) -> None:
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [],
+             "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def measure_requests(app, requests: int) -> float:
+    for i in range(100):
+        await call(app, f"/api/items/{i}")
+    started = time.perf_counter()
+    for i in range(requests):
+        await call(app, f"/api/items/{i}")
+    return (time.perf_counter() - started) / requests
+
+
+def measure_query_hooks(queries: int) -> float:
+    class Context:
+        pass
+
+    context = Context()
+    token = _request_db_stats.set([0, 0.0])
+    started = time.perf_counter()
+    for _ in range(queries):
+        _before_cursor_execute(None, None, "", None, context, False)
+        _after_cursor_execute(None, None, "", None, context, False)
+    elapsed = (time.perf_counter() - started) / queries
+    _request_db_stats.reset(token)
+    return elapsed
+
+
+async def run(requests: int) -> dict:
+    baseline = await measure_requests(make_app(False), requests)
+    instrumented = await measure_requests(make_app(True), requests)
+    middleware = instrumented - baseline
+    query_hooks = measure_query_hooks(requests)
+    return {
+        "baseline_us": round(baseline * 1e6, 2),
+        "instrumented_us": round(instrumented * 1e6, 2),
+        "middleware_overhead_us": round(middleware * 1e6, 2),
+        "middleware_overhead_percent_of_empty_endpoint": round(middleware / baseline * 100, 2),
+        "query_hooks_us_per_query": round(query_hooks * 1e6, 2),
+        # Типичный запрос к API: несколько миллисекунд и несколько запросов к базе данных
+        "overhead_percent_of_5ms_request_with_5_queries": round((middleware + 5 * query_hooks) / 0.005 * 100, 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк накладных расходов телеметрии")
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.requests)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
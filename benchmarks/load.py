@@ -0,0 +1,396 @@
+"""
+Нагрузочный тест API на заполненной базе данных (см. benchmarks.seed).
+
+Конкурентные клиенты (по одному пользователю bench1..benchN на клиента) выполняют заданное количество запросов
+каждого сценария: login, refresh, activities (список активностей), chart_only_you, chart_rating (графики)
+и entries_bulk (массовое создание записей). Сценарий mixed выполняет запросы activities, chart_only_you
+и chart_rating сначала без фоновой нагрузки, затем одновременно с login-штормом (--storm-clients сопрограмм,
+непрерывно выполняющих вход) и сравнивает p99 задержки маршрутов, отличных от входа. Приложение запускается в процессе (ASGI-транспорт httpx,
+--mode asgi) или отдельным процессом uvicorn (--mode uvicorn).
+
+Для каждого сценария выводятся пропускная способность, p50/p95/p99 задержки, статусы ответов
+и среднее количество запросов к базе данных на HTTP-запрос (по метрикам /metrics; в режиме uvicorn
+точно только при одном воркере). Результат записывается в JSON (--output) для сравнения запусков.
+
+Лимит частоты запросов пользователя (RATE_LIMIT_*) на время теста снимается, если не указан --keep-rate-limit.
+
+Запуск: python -m benchmarks.load [--mode asgi|uvicorn] [--concurrency N] [--requests N]
+        [--scenarios login,refresh,...] [--storm-clients N] [--output results.json]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+SCENARIOS = ("login", "refresh", "activities", "chart_only_you", "chart_rating", "entries_bulk", "mixed")
+# Сценарии, выполняемые в mixed на фоне login-шторма
+MIXED_SCENARIOS = ("activities", "chart_only_you", "chart_rating")
+# Шаблоны маршрутов сценариев (метка route метрик /metrics)
+ROUTES = {
+    "login": "/api/users/login",
+    "refresh": "/api/users/refresh",
+    "activities": "/api/activities/activities/",
+    "chart_only_you": "/api/charts/data_for_chart",
+    "chart_rating": "/api/charts/data_for_chart",
+    "entries_bulk": "/api/entries/entries/bulk/",
+}
+METRIC_LINE = re.compile(r'^http_request_db_queries_(sum|count)\{route="([^"]*)"\} (\S+)$', re.MULTILINE)
+# Переопределения настроек на время теста
+UNLIMITED_RATE = {"RATE_LIMIT_PER_SECOND": "1000000", "RATE_LIMIT_BURST": "1000000"}
+
+
+class Client:
+    """
+    Состояние одного клиента: пользователь, токены и активности.
+    """
+
+    def __init__(self, username: str):
+        self.username = username
+        self.access_token = ""
+        self.refresh_token = ""
+        self.activity_ids: List[int] = []
+
+    def auth(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+
+def make_request(scenario: str, client: Client, rnd: random.Random, bulk_size: int, password: str) -> Tuple[str, str, dict]:
+    """
+    Запрос сценария: метод, путь и аргументы httpx.
+    """
+    if scenario == "login":
+        return "POST", ROUTES["login"], {"json": {"username": client.username, "password": password}}
+    if scenario == "refresh":
+        return "POST", ROUTES["refresh"], {"headers": {"Cookie": f"refresh_token={client.refresh_token}"}}
+    if scenario == "activities":
+        return "GET", ROUTES["activities"], {"headers": client.auth()}
+    if scenario in ("chart_only_you", "chart_rating"):
+        body = {"id": rnd.choice(client.activity_ids), "StatusView": scenario == "chart_rating"}
+        return "POST", ROUTES[scenario], {"json": body, "headers": client.auth()}
+    if scenario == "entries_bulk":
+        entries = [
+            {"activity_id": rnd.choice(client.activity_ids), "amount": rnd.randint(1, 100), "description": "",
+             "date_added": (date.today() - timedelta(days=rnd.randint(0, 30))).isoformat()}
+            for _ in range(bulk_size)
+        ]
+        return "POST", ROUTES[scenario], {"json": entries, "headers": client.auth()}
+    raise ValueError(f"Неизвестный сценарий: {scenario}")
+
+
+def update_tokens(client: Client, response: httpx.Response) -> None:
+    if response.status_code == 200:
+        tokens = response.json()
+        client.access_token = tokens["access_token"]
+        client.refresh_token = tokens["refresh_token"]
+
+
+async def prepare_clients(http: httpx.AsyncClient, concurrency: int, password: str) -> List[Client]:
+    """
+    Авторизует клиентов и загружает их активности (не входит в измерения).
+    """
+    clients = [Client(f"bench{number}") for number in range(1, concurrency + 1)]
+    for client in clients:
+        response = await http.post(ROUTES["login"], json={"username": client.username, "password": password})
+        if response.status_code != 200:
+            raise SystemExit(f"Не удалось войти как {client.username} ({response.status_code}): заполните базу "
+                             f"benchmarks.seed с --users не меньше --concurrency")
+        update_tokens(client, response)
+        response = await http.get(ROUTES["activities"], headers=client.auth())
+        client.activity_ids = [activity["id"] for activity in response.json()]
+        if not client.activity_ids:
+            raise SystemExit(f"У пользователя {client.username} нет активностей")
+    return clients
+
+
+async def db_query_stats(http: httpx.AsyncClient) -> Dict[str, Tuple[float, float]]:
+    """
+    Суммарное количество запросов к базе данных и количество HTTP-запросов по маршрутам (из /metrics).
+    """
+    stats: Dict[str, List[float]] = {}
+    for kind, route, value in METRIC_LINE.findall((await http.get("/metrics")).text):
+        stats.setdefault(route, [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+    return {route: (total, count) for route, (total, count) in stats.items()}
+
+
+def percentile_ms(values: List[float], q: int) -> Optional[float]:
+    if not values:
+        return None
+    value = values[0] if len(values) < 2 else statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+    return round(value * 1000, 2)
+
+
+async def run_scenario(http: httpx.AsyncClient, scenario: str, clients: List[Client], requests: int,
+                       bulk_size: int, password: str, seed: int) -> dict:
+    """
+    Выполняет запросы сценария конкурентными клиентами.
+
+    :param http: HTTP-клиент приложения.
+    :param scenario: Имя сценария.
+    :param clients: Авторизованные клиенты (по одной сопрограмме на клиента).
+    :param requests: Общее количество запросов.
+    :param bulk_size: Количество записей в запросе entries_bulk.
+    :param password: Пароль пользователей.
+    :param seed: Начальное значение генератора случайных чисел.
+    :return: Результаты сценария.
+    """
+    issued = itertools.count()
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    before = await db_query_stats(http)
+
+    async def worker(client: Client, rnd: random.Random) -> None:
+        while next(issued) < requests:
+            method, path, kwargs = make_request(scenario, client, rnd, bulk_size, password)
+            started = time.perf_counter()
+            try:
+                response = await http.request(method, path, **kwargs)
+            except httpx.HTTPError as error:
+                statuses[type(error).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            statuses[str(response.status_code)] += 1
+            if scenario in ("login", "refresh"):
+                update_tokens(client, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(client, random.Random(seed + number)) for number, client in enumerate(clients)))
+    elapsed = time.perf_counter() - started
+
+    after = await db_query_stats(http)
+    total, count = after.get(ROUTES[scenario], (0.0, 0.0))
+    total_before, count_before = before.get(ROUTES[scenario], (0.0, 0.0))
+    return {
+        "scenario": scenario,
+        "route": ROUTES[scenario],
+        "requests": sum(statuses.values()),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+        "p50_ms": percentile_ms(latencies, 50),
+        "p95_ms": percentile_ms(latencies, 95),
+        "p99_ms": percentile_ms(latencies, 99),
+        "statuses": dict(statuses),
+        "db_queries_per_request": round((total - total_before) / (count - count_before), 2)
+        if count > count_before else None,
+    }
+
+
+async def run_mixed_pass(http: httpx.AsyncClient, clients: List[Client], requests: int, storm_clients: int,
+                         password: str, seed: int) -> dict:
+    """
+    Выполняет запросы MIXED_SCENARIOS (по очереди) конкурентными клиентами, пока storm_clients сопрограмм
+    непрерывно выполняют вход.
+
+    :param http: HTTP-клиент приложения.
+    :param clients: Авторизованные клиенты.
+    :param requests: Общее количество запросов MIXED_SCENARIOS.
+    :param storm_clients: Количество сопрограмм login-шторма (0 — без шторма).
+    :param password: Пароль пользователей.
+    :param seed: Начальное значение генератора случайных чисел.
+    :return: Задержки маршрутов, отличных от входа, и статистика входов.
+    """
+    issued = itertools.count()
+    latencies: Dict[str, List[float]] = {scenario: [] for scenario in MIXED_SCENARIOS}
+    statuses: Counter = Counter()
+    login_latencies: List[float] = []
+    login_statuses: Counter = Counter()
+    finished = asyncio.Event()
+
+    async def timed(scenario: str, client: Client, rnd: random.Random, sink: List[float], counter: Counter) -> None:
+        method, path, kwargs = make_request(scenario, client, rnd, 0, password)
+        started = time.perf_counter()
+        try:
+            response = await http.request(method, path, **kwargs)
+        except httpx.HTTPError as error:
+            counter[type(error).__name__] += 1
+            return
+        sink.append(time.perf_counter() - started)
+        counter[str(response.status_code)] += 1
+
+    async def worker(client: Client, rnd: random.Random) -> None:
+        while (number := next(issued)) < requests:
+            scenario = MIXED_SCENARIOS[number % len(MIXED_SCENARIOS)]
+            await timed(scenario, client, rnd, latencies[scenario], statuses)
+
+    async def storm(client: Client, rnd: random.Random) -> None:
+        # Токены клиента не обновляются: фоновые запросы продолжают использовать выданные при подготовке
+        while not finished.is_set():
+            await timed("login", client, rnd, login_latencies, login_statuses)
+
+    storms = [asyncio.create_task(storm(clients[number % len(clients)], random.Random(seed - number - 1)))
+              for number in range(storm_clients)]
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(client, random.Random(seed + number)) for number, client in enumerate(clients)))
+    finally:
+        finished.set()
+        await asyncio.gather(*storms)
+    elapsed = time.perf_counter() - started
+
+    background = [value for values in latencies.values() for value in values]
+    return {
+        "storm_clients": storm_clients,
+        "requests": sum(statuses.values()),
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(len(background) / elapsed, 1) if elapsed else None,
+        "p50_ms": percentile_ms(background, 50),
+        "p95_ms": percentile_ms(background, 95),
+        "p99_ms": percentile_ms(background, 99),
+        "p99_ms_by_scenario": {scenario: percentile_ms(values, 99) for scenario, values in latencies.items()},
+        "statuses": dict(statuses),
+        "logins": {
+            "requests": sum(login_statuses.values()),
+            "p99_ms": percentile_ms(login_latencies, 99),
+            "statuses": dict(login_statuses),
+        },
+    }
+
+
+async def run_mixed(http: httpx.AsyncClient, clients: List[Client], requests: int, storm_clients: int,
+                    password: str, seed: int) -> dict:
+    """
+    Сценарий mixed: p99 задержки маршрутов, отличных от входа, без login-шторма и во время него.
+    """
+    baseline = await run_mixed_pass(http, clients, requests, 0, password, seed)
+    storm = await run_mixed_pass(http, clients, requests, storm_clients, password, seed)
+    return {
+        "scenario": "mixed",
+        "routes": sorted({ROUTES[scenario] for scenario in MIXED_SCENARIOS}),
+        "baseline": baseline,
+        "login_storm": storm,
+        "p99_ms_increase": round(storm["p99_ms"] - baseline["p99_ms"], 2)
+        if storm["p99_ms"] is not None and baseline["p99_ms"] is not None else None,
+    }
+
+
+@asynccontextmanager
+async def asgi_client() -> AsyncIterator[httpx.AsyncClient]:
+    """
+    HTTP-клиент приложения в текущем процессе (с выполнением lifespan).
+    """
+    from src.main import app
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench",
+                                     timeout=60) as http:
+            yield http
+
+
+@asynccontextmanager
+async def uvicorn_client(concurrency: int, workers: int, env: Dict[str, str]) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    HTTP-клиент приложения, запущенного отдельным процессом uvicorn на свободном порту.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--no-access-log", "--log-level", "warning"],
+        env={**os.environ, **env},
+    )
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as http:
+            deadline = time.monotonic() + 30
+            while True:
+                try:
+                    await http.get("/")
+                    break
+                except httpx.TransportError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        raise SystemExit("Сервер uvicorn не запустился")
+                    await asyncio.sleep(0.2)
+            yield http
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, env: Dict[str, str]) -> dict:
+    from benchmarks.seed import SEED_PASSWORD
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+    if args.mode == "asgi":
+        connect = asgi_client()
+    else:
+        connect = uvicorn_client(args.concurrency, args.workers, env)
+    async with connect as http:
+        clients = await prepare_clients(http, args.concurrency, SEED_PASSWORD)
+        results = [
+            await run_mixed(http, clients, args.requests, args.storm_clients, SEED_PASSWORD, args.seed)
+            if scenario == "mixed" else
+            await run_scenario(http, scenario, clients, args.requests, args.bulk_size, SEED_PASSWORD, args.seed)
+            for scenario in args.scenarios
+        ]
+    return {
+        "started_at": started_at,
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "mode": args.mode,
+        "workers": args.workers if args.mode == "uvicorn" else 1,
+        "concurrency": args.concurrency,
+        "requests_per_scenario": args.requests,
+        "bulk_size": args.bulk_size,
+        "storm_clients": args.storm_clients,
+        "settings_overrides": env,
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Нагрузочный тест API")
+    parser.add_argument("--mode", choices=("asgi", "uvicorn"), default="asgi")
+    parser.add_argument("--workers", type=int, default=1, help="воркеры uvicorn")
+    parser.add_argument("--concurrency", type=int, default=16, help="конкурентные клиенты (пользователи)")
+    parser.add_argument("--requests", type=int, default=200, help="запросов на сценарий")
+    parser.add_argument("--bulk-size", type=int, default=20, help="записей в запросе entries_bulk")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda value: [name for name in value.split(",") if name])
+    parser.add_argument("--storm-clients", type=int, help="сопрограммы login-шторма в сценарии mixed "
+                                                           "(по умолчанию --concurrency)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-rate-limit", action="store_true", help="не снимать лимит частоты запросов")
+    parser.add_argument("--output", help="файл для результатов JSON")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"неизвестные сценарии: {', '.join(sorted(unknown))}")
+    if args.storm_clients is None:
+        args.storm_clients = args.concurrency
+    # Настройки читаются при импорте приложения, поэтому переопределяются до него (и для процесса uvicorn)
+    env = {} if args.keep_rate_limit else dict(UNLIMITED_RATE)
+    os.environ.update(env)
+
+    result = json.dumps(asyncio.run(run(args, env)), ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(result)
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
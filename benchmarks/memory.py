@@ -0,0 +1,107 @@
+"""
+Отчет tracemalloc для большого рейтингового запроса графика.
+
+Заполняет временную базу SQLite (пользователи с одной связанной активностью и записью за каждый день)
+и сравнивает способы чтения строк записей одной группы:
+- orm: ORM-экземпляры Entry (identity map, отслеживание изменений);
+- dicts: строки результата, преобразованные в словари (прежний путь рейтингового графика);
+- dto: BaseDAO.get_rows с ChartRow (__slots__), сразу передаваемые в make_dataset.
+
+Запуск: python -m benchmarks.memory [--users N] [--days N]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.activity.models import Activity
+from src.chart.service import ChartService
+from src.chart.utils import ChartRow, make_dataset
+from src.dao_base import BaseDAO
+from src.database import Base
+from src.entry.models import Entry
+from src.user.models import User
+
+
+async def seed(session_maker, users: int, days: int) -> list:
+    start = date.today() - timedelta(days=days - 1)
+    async with session_maker() as db:
+        await db.execute(insert(User), [
+            {"id": u, "name": f"user{u}", "username": f"user{u}", "password": "x"} for u in range(1, users + 1)
+        ])
+        await db.execute(insert(Activity), [
+            {"id": u, "name": "бег", "user_id": u, "notification_text": "", "status": True} for u in range(1, users + 1)
+        ])
+        await db.execute(insert(Entry), [
+            {"activity_id": u, "amount": (u * day) % 100, "description": "описание" if day % 5 == 0 else "",
+             "date_added": (start + timedelta(days=day)).isoformat()}
+            for u in range(1, users + 1) for day in range(days)
+        ])
+        await db.commit()
+    return list(range(1, users + 1))
+
+
+async def measure(session_maker, name: str, load) -> dict:
+    async with session_maker() as db:
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = await load(db)
+        elapsed = time.perf_counter() - started
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+        tracemalloc.stop()
+    del result
+    return {"path": name, "seconds": round(elapsed, 3), "retained_kib": current // 1024, "peak_kib": peak // 1024,
+            "retained_blocks": blocks}
+
+
+async def run(users: int, days: int) -> dict:
+    path = os.path.join(tempfile.mkdtemp(), "memory.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    activity_ids = await seed(session_maker, users, days)
+    query = ChartService._entries_query(activity_ids)
+
+    async def orm(db):
+        result = await db.execute(select(Entry).where(Entry.activity_id.in_(activity_ids)))
+        return result.scalars().all()
+
+    async def dicts(db):
+        result = await db.execute(query)
+        return [
+            {'id_user': row.user_id, 'id_entry': row.entry_id, 'name': row.user_name, 'amount': row.amount,
+             'date_added': str(row.date_added), 'description': row.description}
+            for row in result.all()
+        ]
+
+    async def dto(db):
+        return await BaseDAO(db, Entry).get_rows(query, dto=ChartRow)
+
+    async def dto_dataset(db):
+        return make_dataset(await BaseDAO(db, Entry).get_rows(query, dto=ChartRow))
+
+    results = [await measure(session_maker, name, load)
+               for name, load in (("orm", orm), ("dicts", dicts), ("dto", dto), ("dto + make_dataset", dto_dataset))]
+    await engine.dispose()
+    return {"users": users, "days": days, "rows": users * days, "results": results}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Отчет tracemalloc для рейтингового графика")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--days", type=int, default=730)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.users, args.days)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
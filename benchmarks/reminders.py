@@ -0,0 +1,147 @@
+"""
+Бенчмарк тика планировщика напоминаний (src.reminder.service.ReminderScheduler) со StubSender.
+
+Заполняет базу данных приложения (по настройкам; например DB_BACKEND=sqlite SQLITE_PATH=:memory:)
+детерминированным набором (--seed): пользователи с chat_id (доля --chat-share), у каждого --activities активных
+активностей, часть которых (--done) уже имеет запись за сегодня. Затем выполняет два тика:
+- первый отправляет все напоминания (выборка, группировка по чатам, пачки и отправка);
+- второй ничего не отправляет: все активности уже в self.sent (стоимость повторной выборки).
+
+Заполняется одна база данных (без шардирования); таблицы создаются по моделям, --reset удаляет и создает их заново.
+
+Запуск: python -m benchmarks.reminders [--users N] [--activities N] [--done P] [--chat-share P]
+        [--batch-size N] [--concurrency N] [--failure-rate P] [--reset]
+"""
+import argparse
+import asyncio
+import json
+import random
+import resource
+import time
+from datetime import date, datetime
+from typing import Iterator
+
+from sqlalchemy import func, select
+
+import src.models  # noqa: F401 (регистрация таблиц связей в метаданных)
+from benchmarks.seed import bulk_load
+from src.activity.models import Activity
+from src.config import settings
+from src.database import Base, engine
+from src.entry.models import Entry
+from src.reminder.service import ReminderScheduler
+from src.reminder.utils import StubSender
+from src.shard import shard_router
+from src.user.models import User
+
+
+class ReminderPlan:
+    """
+    Детерминированный набор данных для напоминаний.
+    Идентификаторы пользователей 1..users, активности пользователя u: (u - 1) * activities + 1 ... u * activities.
+    """
+
+    def __init__(self, users: int, activities: int, done: float, chat_share: float, seed: int):
+        self.users = users
+        self.activities = activities
+        self.done = done
+        self.chat_share = chat_share
+        self.seed = seed
+
+    def user_rows(self) -> Iterator[tuple]:
+        rnd = random.Random(self.seed)
+        for user_id in range(1, self.users + 1):
+            chat_id = str(100000000 + user_id) if rnd.random() < self.chat_share else None
+            yield user_id, f"Bench {user_id}", f"bench{user_id}", "x", f"bench{user_id}", chat_id
+
+    def activity_rows(self) -> Iterator[tuple]:
+        for activity_id in range(1, self.users * self.activities + 1):
+            yield activity_id, f"активность {activity_id}", (activity_id - 1) // self.activities + 1, "", True, 0
+
+    def entry_rows(self, day: date) -> Iterator[tuple]:
+        rnd = random.Random(self.seed + 1)
+        for activity_id in range(1, self.users * self.activities + 1):
+            if rnd.random() < self.done:
+                yield activity_id, 1, "", day.isoformat()
+
+
+async def seed(plan: ReminderPlan, day: date, reset: bool) -> dict:
+    started = time.perf_counter()
+    async with engine.begin() as connection:
+        if reset:
+            await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        if await connection.scalar(select(func.count()).select_from(User.__table__)):
+            raise SystemExit("Таблица user не пуста: используйте --reset или пустую базу данных")
+        loaded = {
+            "user": await bulk_load(connection, User.__table__,
+                                    ("id", "name", "username", "password", "nick", "chat_id"), plan.user_rows()),
+            "activity": await bulk_load(connection, Activity.__table__,
+                                        ("id", "name", "user_id", "notification_text", "status", "revision"),
+                                        plan.activity_rows()),
+            "entry": await bulk_load(connection, Entry.__table__,
+                                     ("activity_id", "amount", "description", "date_added"), plan.entry_rows(day)),
+        }
+    return {"rows": loaded, "seconds": round(time.perf_counter() - started, 2)}
+
+
+async def measure_tick(scheduler: ReminderScheduler, sender: StubSender, now: datetime) -> dict:
+    sent, batches = len(sender.sent), sender.batches
+    started = time.perf_counter()
+    delivered = await scheduler.tick(now)
+    elapsed = time.perf_counter() - started
+    return {
+        "seconds": round(elapsed, 3),
+        "delivered": delivered,
+        "reminders": len(sender.sent) - sent,
+        "batches": sender.batches - batches,
+        "reminders_per_second": round(delivered / elapsed) if elapsed else None,
+    }
+
+
+async def run(args) -> dict:
+    now = datetime.combine(date.today(), datetime.min.time()).replace(hour=max(args.start_hour, 0))
+    plan = ReminderPlan(args.users, args.activities, args.done, args.chat_share, args.seed)
+    seeded = await seed(plan, now.date(), args.reset)
+
+    sender = StubSender(failure_rate=args.failure_rate)
+    scheduler = ReminderScheduler(sender, batch_size=args.batch_size, concurrency=args.concurrency,
+                                  max_retries=args.max_retries, start_hour=args.start_hour, backoff=args.backoff)
+    first = await measure_tick(scheduler, sender, now)
+    second = await measure_tick(scheduler, sender, now)
+    await engine.dispose()
+    return {
+        "parameters": vars(args),
+        "backend": engine.dialect.name,
+        "shards": shard_router.count,
+        "seed": seeded,
+        "first_tick": first,
+        "repeated_tick": second,
+        "sent_activities": len(scheduler.sent),
+        "max_rss_mib": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк тика планировщика напоминаний")
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--activities", type=int, default=3, help="активностей на пользователя")
+    parser.add_argument("--done", type=float, default=0.5, help="доля активностей с записью за сегодня")
+    parser.add_argument("--chat-share", type=float, default=0.9, help="доля пользователей с chat_id")
+    parser.add_argument("--batch-size", type=int, default=settings.REMINDER_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=settings.REMINDER_CONCURRENCY)
+    parser.add_argument("--max-retries", type=int, default=settings.REMINDER_MAX_RETRIES)
+    parser.add_argument("--start-hour", type=int, default=settings.REMINDER_START_HOUR)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="доля неудачных отправок StubSender")
+    parser.add_argument("--backoff", type=float, default=0.01, help="начальная задержка повторных попыток")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true", help="удалить и создать таблицы заново")
+    args = parser.parse_args()
+
+    if shard_router.count > 1:
+        raise SystemExit("Заполнение шардированной базы данных не поддерживается")
+    print(json.dumps(asyncio.run(run(args)), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
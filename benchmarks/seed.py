@@ -0,0 +1,201 @@
+"""
+Заполнение базы данных для нагрузочных тестов (benchmarks.load).
+
+Данные генерируются детерминированно (--seed): пользователи bench1..benchN с паролем SEED_PASSWORD,
+симметричная дружба, активности пользователей, связи активностей с одноименными активностями друзей
+(рейтинговые графики) и записи за несколько лет. Загрузка выполняется пачками: в Postgres (asyncpg)
+через COPY, в остальных базах - многострочными INSERT.
+
+Заполняется одна база данных (без шардирования). Таблицы создаются по моделям, если их нет;
+--reset удаляет и создает их заново.
+
+Запуск: python -m benchmarks.seed [--database-url URL] [--users N] [--friends N] [--activities N]
+        [--links N] [--years N] [--density P] [--reset]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import date, timedelta
+from typing import Iterable, Iterator, List, Sequence
+
+from sqlalchemy import Table, func, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+import src.models  # noqa: F401 (регистрация таблиц связей в метаданных)
+from src.activity.models import Activity, activity_activity
+from src.database import DATABASE_URL, Base, create_engine
+from src.entry.models import Entry
+from src.models import user_friend
+from src.shard import shard_router
+from src.user.models import User
+from src.user.utils import pwd_context
+
+SEED_PASSWORD = "bench-password"
+ACTIVITY_NAMES = ("бег", "отжимания", "чтение", "вода", "сон", "медитация", "приседания", "шаги")
+CHUNK_SIZE = 10000
+
+
+def _chunks(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def bulk_load(connection: AsyncConnection, table: Table, columns: Sequence[str], rows: Iterable[tuple]) -> int:
+    """
+    Загружает строки в таблицу пачками: COPY для asyncpg, многострочный INSERT для остальных драйверов.
+
+    :param connection: Асинхронное соединение SQLAlchemy.
+    :param table: Таблица.
+    :param columns: Имена загружаемых столбцов (остальные получают значения по умолчанию базы данных).
+    :param rows: Строки - кортежи значений в порядке columns.
+    :return: Количество загруженных строк.
+    """
+    copy = None
+    if connection.dialect.driver == "asyncpg":
+        raw = await connection.get_raw_connection()
+        copy = raw.driver_connection.copy_records_to_table
+    loaded = 0
+    for chunk in _chunks(rows, CHUNK_SIZE):
+        if copy is not None:
+            await copy(table.name, records=chunk, columns=list(columns))
+        else:
+            await connection.execute(insert(table), [dict(zip(columns, row)) for row in chunk])
+        loaded += len(chunk)
+    return loaded
+
+
+class SeedPlan:
+    """
+    Детерминированный набор данных заданного масштаба.
+    Идентификаторы пользователей 1..users, активности пользователя u: (u - 1) * activities + 1 ... u * activities.
+    """
+
+    def __init__(self, users: int, friends: int, activities: int, links: int, years: int, density: float, seed: int):
+        self.users = users
+        self.friends = min(friends, users - 1)
+        self.activities = activities
+        self.links = links
+        self.days = 365 * years
+        self.density = density
+        self.seed = seed
+        self.friend_pairs = self._friend_pairs()
+
+    def activity_id(self, user_id: int, index: int) -> int:
+        return (user_id - 1) * self.activities + index + 1
+
+    def _friend_pairs(self) -> List[tuple]:
+        rnd = random.Random(self.seed)
+        pairs = set()
+        for user_id in range(1, self.users + 1):
+            candidates = rnd.sample(range(1, self.users + 1), min(self.users, self.friends + 1))
+            for friend_id in [candidate for candidate in candidates if candidate != user_id][:self.friends]:
+                pairs.add((user_id, friend_id))
+                pairs.add((friend_id, user_id))
+        return sorted(pairs)
+
+    def user_rows(self, password_hash: str) -> Iterator[tuple]:
+        for user_id in range(1, self.users + 1):
+            yield user_id, f"Bench {user_id}", f"bench{user_id}", password_hash, f"bench{user_id}"
+
+    def activity_rows(self) -> Iterator[tuple]:
+        for user_id in range(1, self.users + 1):
+            for index in range(self.activities):
+                name = ACTIVITY_NAMES[index % len(ACTIVITY_NAMES)]
+                yield self.activity_id(user_id, index), name, user_id, f"Не забудь: {name}", True, 0
+
+    def link_rows(self) -> Iterator[tuple]:
+        # Активность связывается с одноименными активностями первых друзей (одна строка на неориентированную связь)
+        friends = {}
+        for user_id, friend_id in self.friend_pairs:
+            friends.setdefault(user_id, []).append(friend_id)
+        seen = set()
+        for user_id in range(1, self.users + 1):
+            for friend_id in friends.get(user_id, [])[:self.links]:
+                for index in range(self.activities):
+                    one, two = self.activity_id(user_id, index), self.activity_id(friend_id, index)
+                    if (two, one) not in seen:
+                        seen.add((one, two))
+                        yield one, two
+
+    def entry_rows(self) -> Iterator[tuple]:
+        rnd = random.Random(self.seed + 1)
+        start = date.today() - timedelta(days=self.days - 1)
+        dates = [(start + timedelta(days=day)).isoformat() for day in range(self.days)]
+        for activity_id in range(1, self.users * self.activities + 1):
+            for day in dates:
+                if rnd.random() < self.density:
+                    yield activity_id, rnd.randint(1, 100), "заметка" if rnd.random() < 0.1 else "", day
+
+
+async def seed(database_url: str, plan: SeedPlan, reset: bool = False) -> dict:
+    """
+    Заполняет базу данных по плану.
+
+    :param database_url: Строка подключения SQLAlchemy (async).
+    :param plan: План данных.
+    :param reset: Удалить и создать таблицы заново.
+    :return: Количество загруженных строк по таблицам и время загрузки.
+    """
+    engine = create_engine(database_url)
+    started = time.perf_counter()
+    async with engine.begin() as connection:
+        if reset:
+            await connection.run_sync(Base.metadata.drop_all)
+        await connection.run_sync(Base.metadata.create_all)
+        if await connection.scalar(select(func.count()).select_from(User.__table__)):
+            raise SystemExit("Таблица user не пуста: используйте --reset или пустую базу данных")
+
+        # Один хеш на всех пользователей: bcrypt намеренно медленный
+        password_hash = pwd_context.hash(SEED_PASSWORD)
+        loaded = {
+            "user": await bulk_load(connection, User.__table__, ("id", "name", "username", "password", "nick"),
+                                    plan.user_rows(password_hash)),
+            "user_friend": await bulk_load(connection, user_friend, ("user_id", "friend_id"), plan.friend_pairs),
+            "activity": await bulk_load(connection, Activity.__table__,
+                                        ("id", "name", "user_id", "notification_text", "status", "revision"),
+                                        plan.activity_rows()),
+            "activity_activity": await bulk_load(connection, activity_activity,
+                                                 ("activity_one_id", "activity_two_id"), plan.link_rows()),
+            "entry": await bulk_load(connection, Entry.__table__,
+                                     ("activity_id", "amount", "description", "date_added"), plan.entry_rows()),
+        }
+        if connection.dialect.name == "postgresql":
+            # Идентификаторы заданы явно: последовательности продолжаются после загруженных значений
+            for table in (User.__table__, Activity.__table__):
+                await connection.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), (SELECT MAX(id) FROM \"{table.name}\"))"
+                ))
+    await engine.dispose()
+    return {"rows": loaded, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заполнение базы данных для нагрузочных тестов")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--friends", type=int, default=10, help="друзей на пользователя")
+    parser.add_argument("--activities", type=int, default=3, help="активностей на пользователя")
+    parser.add_argument("--links", type=int, default=5, help="друзей, с активностями которых связываются активности")
+    parser.add_argument("--years", type=int, default=1, help="лет записей")
+    parser.add_argument("--density", type=float, default=0.7, help="доля дней с записью")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true", help="удалить и создать таблицы заново")
+    args = parser.parse_args()
+
+    if args.database_url == DATABASE_URL and shard_router.count > 1:
+        raise SystemExit("Заполнение шардированной базы данных не поддерживается: укажите --database-url")
+    plan = SeedPlan(args.users, args.friends, args.activities, args.links, args.years, args.density, args.seed)
+    result = asyncio.run(seed(args.database_url, plan, args.reset))
+    print(json.dumps({"parameters": vars(args) | {"database_url": "<hidden>"}, **result}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Бенчмарк сериализации ответов по эндпоинтам.
+
+Сравнивает три пути для одних и тех же данных:
+- fastapi: проверка response_model, jsonable-представление и JSONResponse (стандартный json);
+- orjson: то же, но с ORJSONResponse (ответ по умолчанию в приложении);
+- adapter: AdapterResponse с заранее созданным TypeAdapter.
+
+Запуск: python -m benchmarks.serialization [--repeat N]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from src.activity.schemas import ActivityFull, activity_full_list_adapter
+from src.chart.schemas import ChartResponse, chart_response_adapter, chart_batch_adapter
+from src.chart.utils import make_compact_dataset, pack_compact_dataset
+from src.entry.schemas import Entry, entry_list_adapter
+from src.responses import AdapterResponse
+
+
+def make_activities(count: int) -> List[SimpleNamespace]:
+    # ORM-подобные объекты: атрибуты вместо ключей словаря
+    return [
+        SimpleNamespace(
+            id=i, name=f"activity {i}", user_id=1, notification_text="Не забудь отметить", status=True,
+            related_activities=[SimpleNamespace(id=i + 1000 + j, name=f"related {j}") for j in range(3)],
+            summary=SimpleNamespace(entry_count=365, total_amount=3650, last_entry_date="2026-10-19", today_amount=10),
+            streak=SimpleNamespace(current_streak=12, longest_streak=40, last_active_day=date(2026, 10, 19)),
+        )
+        for i in range(count)
+    ]
+
+
+def make_entries(count: int) -> List[SimpleNamespace]:
+    start = date(2024, 10, 19)
+    return [
+        SimpleNamespace(id=i, activity_id=1, amount=random.randint(0, 100), description=f"запись {i}",
+                        date_added=(start + timedelta(days=i % 730)).isoformat())
+        for i in range(count)
+    ]
+
+
+def make_chart(users: int, days: int, density: float = 1.0) -> Dict:
+    # density - доля дней с записью у каждого пользователя (1.0 - плотный график)
+    start = date(2024, 10, 19)
+    user_ids = list(range(1, users + 1))
+    filled = {u: [random.random() < density for _ in range(days)] for u in user_ids}
+    return {
+        "date": [(start + timedelta(days=i)).strftime("%m-%d") for i in range(days)],
+        "start_day": (start - date(1970, 1, 1)).days,
+        "amount": {u: [random.randint(1, 100) if filled[u][i] else 0 for i in range(days)] for u in user_ids},
+        "entry_id": {u: [u * 100000 + i if filled[u][i] else None for i in range(days)] for u in user_ids},
+        "description": {u: ["описание" if filled[u][i] and i % 3 == 0 else None for i in range(days)] for u in user_ids},
+        "user_id": user_ids,
+        "name": {u: f"user{u}" for u in user_ids},
+    }
+
+
+async def fastapi_body(response_class, field, content) -> bytes:
+    return response_class(await serialize_response(field=field, response_content=content)).body
+
+
+def measure(func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def run(repeat: int) -> List[Dict]:
+    cases = [
+        ("GET /api/activities/activities/ (100)", List[ActivityFull], activity_full_list_adapter, make_activities(100)),
+        ("POST /api/entries/entries/bulk/ (1000)", List[Entry], entry_list_adapter, make_entries(1000)),
+        ("POST /api/charts/data_for_chart (20 users, 2 years)", ChartResponse, chart_response_adapter, make_chart(20, 730)),
+        ("POST /api/charts/data_for_chart/batch (10 x 20 users, 2 years)", Dict[int, Optional[ChartResponse]],
+         chart_batch_adapter, {i: make_chart(20, 730) for i in range(10)}),
+    ]
+    loop = asyncio.new_event_loop()
+    results = []
+    for name, annotation, adapter, content in cases:
+        row = {"endpoint": name}
+        field = create_response_field(name="Response", type_=annotation, mode="serialization")
+        for label, response_class in (("fastapi", JSONResponse), ("orjson", ORJSONResponse)):
+            row[label + "_ms"] = measure(lambda: loop.run_until_complete(fastapi_body(response_class, field, content)), repeat)
+        row["adapter_ms"] = measure(lambda: AdapterResponse(adapter, content).body, repeat)
+        row["bytes"] = len(AdapterResponse(adapter, content).body)
+        results.append(row)
+    loop.close()
+    return results
+
+
+def chart_sizes() -> List[Dict]:
+    # Размеры ответа /data_for_chart в разных форматах (Accept)
+    results = []
+    for density in (1.0, 0.2):
+        chart = make_chart(20, 730, density)
+        compact = make_compact_dataset(chart)
+        started = time.perf_counter()
+        binary = pack_compact_dataset(compact)
+        results.append({
+            "chart": f"20 users, 2 years, density {density}",
+            "default_bytes": len(AdapterResponse(chart_response_adapter, chart).body),
+            "compact_json_bytes": len(ORJSONResponse(compact).body),
+            "compact_binary_bytes": len(binary),
+            "compact_binary_ms": (time.perf_counter() - started) * 1000,
+        })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк сериализации ответов")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    random.seed(0)
+    print(json.dumps({"serialization": run(args.repeat), "chart_formats": chart_sizes()}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Обслуживание активностей из командной строки.
+
+Запуск: python -m src.activity recompute-streaks [--batch-size N]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import src.models  # noqa: F401 (регистрация таблиц связей в метаданных)
+from src.activity.service import StreakService
+from src.shard import shard_router
+
+
+async def recompute_streaks(batch_size: int) -> dict:
+    """
+    Пересчитывает серии всех активностей на всех шардах.
+
+    :param batch_size: Количество активностей в пачке.
+    :return: Количество пересчитанных активностей по шардам и время выполнения.
+    """
+    started = time.perf_counter()
+    processed = {}
+    for shard_id in range(shard_router.count):
+        async with shard_router.session(shard_id) as db:
+            processed[shard_id] = await StreakService(db).recompute_all(batch_size)
+    return {"activities": processed, "seconds": round(time.perf_counter() - started, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m src.activity", description="Обслуживание активностей")
+    commands = parser.add_subparsers(dest="command", required=True)
+    recompute = commands.add_parser("recompute-streaks", help="Пересчитать серии всех активностей")
+    recompute.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    if args.command == "recompute-streaks":
+        print(json.dumps(asyncio.run(recompute_streaks(args.batch_size)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Table
+from datetime import date, timedelta
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Table, Date, Index, text
 from sqlalchemy.orm import relationship
 from src.database import Base
 from src.models import TimestampMixin
@@ -12,12 +13,18 @@ activity_activity = Table('activity_activity', Base.metadata,
 
 class Activity(Base, TimestampMixin):
     __tablename__ = 'activity'
+    __table_args__ = (
+        # Частичный индекс для выборки активных активностей (планировщик напоминаний)
+        Index('ix_activity_user_id_active', 'user_id', postgresql_where=text('status'), sqlite_where=text('status')),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String(50))
     user_id = Column(Integer, ForeignKey('user.id'))
     notification_text = Column(String(500), default='')
     status = Column(Boolean, default=True)
+    # Версия данных активности для ETag: увеличивается при изменении записей и связей
+    revision = Column(Integer, nullable=False, default=0, server_default='0')
     # entries = relationship("Entry", back_populates="activity")
 
     related_activities = relationship('Activity',
@@ -25,3 +32,25 @@ class Activity(Base, TimestampMixin):
                                       primaryjoin=id == activity_activity.c.activity_one_id,
                                       secondaryjoin=id == activity_activity.c.activity_two_id,
                                       backref='related_to')
+    streak = relationship('ActivityStreak', uselist=False, lazy='joined', passive_deletes=True)
+
+
+class ActivityStreak(Base):
+    """
+    Серия (последовательные дни с записями) активности. Поддерживается инкрементально при изменении записей.
+    """
+    __tablename__ = 'activity_streak'
+
+    activity_id = Column(Integer, ForeignKey('activity.id', ondelete='CASCADE'), primary_key=True)
+    # Последняя серия: длина, первый и последний день
+    run_length = Column(Integer, nullable=False, default=0)
+    run_start = Column(Date, nullable=True)
+    last_active_day = Column(Date, nullable=True)
+    longest_streak = Column(Integer, nullable=False, default=0)
+
+    @property
+    def current_streak(self) -> int:
+        # Серия считается текущей, если последний активный день - сегодня или вчера
+        if self.last_active_day is None or self.last_active_day < date.today() - timedelta(days=1):
+            return 0
+        return self.run_length
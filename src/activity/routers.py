@@ -1,16 +1,18 @@
-from fastapi import APIRouter, Depends, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
 from typing import List, Optional
-from src.activity.schemas import ActivityCreate, ActivityUpdate, Activity, ActivityFull
-from src.activity.service import ActivityService
+from src.activity.schemas import ActivityCreate, ActivityUpdate, Activity, ActivityFull, ActivityLink, \
+    activity_full_adapter, activity_full_list_adapter
+from src.activity.service import ActivityService, ActivityGraphService
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database import get_db
+from src.responses import AdapterResponse, make_etag, etag_headers, not_modified
+from src.shard import get_user_db
 from src.user.models import User
 from src.user.utils import get_current_user
 
 router = APIRouter()
 
 @router.post("/activities/", response_model=Activity)
-async def create_activity_endpoint(activity: ActivityCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_activity_endpoint(activity: ActivityCreate, db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для создания новой активности.
 
@@ -22,35 +24,96 @@ async def create_activity_endpoint(activity: ActivityCreate, db: AsyncSession =
     return await service.create_activity(activity, user_id=current_user.id)
 
 
+@router.post("/activities/links/")
+async def link_activities_endpoint(links: List[ActivityLink], db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для массового связывания активностей. В каждой паре хотя бы одна активность должна принадлежать
+    текущему пользователю.
+
+    :param links: Пары связываемых активностей.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Статус операции.
+    """
+    service = ActivityGraphService(db)
+    if not await service.check_link_ownership(links, current_user.id):
+        raise HTTPException(status_code=403, detail="Each link must include one of your activities")
+    await service.link_bulk(links)
+    return {"status": "linked"}
+
+
+@router.delete("/activities/links/")
+async def unlink_activities_endpoint(links: List[ActivityLink], db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для массового удаления связей активностей. В каждой паре хотя бы одна активность должна
+    принадлежать текущему пользователю.
+
+    :param links: Пары активностей, связь между которыми удаляется.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Статус операции.
+    """
+    service = ActivityGraphService(db)
+    if not await service.check_link_ownership(links, current_user.id):
+        raise HTTPException(status_code=403, detail="Each link must include one of your activities")
+    await service.unlink_bulk(links)
+    return {"status": "unlinked"}
+
+
+@router.get("/activities/{activity_id}/group", response_model=List[int])
+async def get_activity_group_endpoint(activity_id: int, db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для получения группы связанных активностей (все активности, связанные напрямую или через другие).
+
+    :param activity_id: Идентификатор активности.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Отсортированный список идентификаторов активностей группы.
+    """
+    service = ActivityGraphService(db)
+    return sorted(await service.get_group(activity_id))
+
+
 @router.get("/activities/{activity_id}", response_model=ActivityFull)
-async def get_activity_by_id_endpoint(activity_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_activity_by_id_endpoint(activity_id: int, request: Request, db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
-    Эндпоинт для получения активности по её идентификатору.
+    Эндпоинт для получения активности по её идентификатору. Поддерживает условный запрос (If-None-Match).
 
     :param activity_id: Идентификатор активности.
+    :param request: Запрос (заголовок If-None-Match).
     :param db: Асинхронная сессия SQLAlchemy.
     :return: Найденная активность.
     """
     service = ActivityService(db)
-    return await service.get_activity_by_id(activity_id)
+    version = await service.get_activity_version(activity_id)
+    etag = make_etag("activity", activity_id, version)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    return AdapterResponse(activity_full_adapter, await service.get_activity_by_id(activity_id), headers=etag_headers(etag))
 
 
 @router.get("/activities/", response_model=List[ActivityFull])
-async def get_activities_by_user_endpoint(db: AsyncSession = Depends(get_db), status: Optional[bool] = None, current_user: User = Depends(get_current_user)):
+async def get_activities_by_user_endpoint(request: Request, db: AsyncSession = Depends(get_user_db), status: Optional[bool] = None, summary: bool = False, current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для получения списка активностей с возможностью фильтрации по статусу.
+    Поддерживает условный запрос (If-None-Match).
 
+    :param request: Запрос (заголовок If-None-Match).
     :param db: Асинхронная сессия SQLAlchemy.
     :param status: Фильтр по статусу активности (опционально).
+    :param summary: Добавить сводную статистику по записям (количество, сумма, последняя дата, значение за сегодня).
     :return: Список активностей.
     """
     service = ActivityService(db)
-    activities = await service.get_activities_by_user(user_id=current_user.id, status=status)
-    return activities
+    version = await service.get_activities_version(user_id=current_user.id, status=status)
+    etag = make_etag("activities", current_user.id, status, summary, version)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    activities = await service.get_activities_by_user(user_id=current_user.id, status=status, summary=summary)
+    return AdapterResponse(activity_full_list_adapter, activities, headers=etag_headers(etag))
 
 
 @router.put("/activities/{activity_id}", response_model=ActivityFull)
-async def update_activity_endpoint(activity_id: int, activity: ActivityUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_activity_endpoint(activity_id: int, activity: ActivityUpdate, db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для обновления активности по её идентификатору.
 
@@ -60,11 +123,11 @@ async def update_activity_endpoint(activity_id: int, activity: ActivityUpdate, d
     :return: Обновленная активность.
     """
     service = ActivityService(db)
-    return await service.update_activity(activity_id, activity)
+    return AdapterResponse(activity_full_adapter, await service.update_activity(activity_id, activity))
 
 
 @router.delete("/activities/{activity_id}")
-async def delete_activity_endpoint(activity_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_activity_endpoint(activity_id: int, db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для удаления активности по её идентификатору.
 
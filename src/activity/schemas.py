@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from datetime import date
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
 
 # Схема для создания активности
@@ -15,6 +16,12 @@ class ActivityUpdate(BaseModel):
     status: Optional[bool] = None
 
 
+# Связь двух активностей (activity_activity)
+class ActivityLink(BaseModel):
+    activity_one_id: int
+    activity_two_id: int
+
+
 class RelatedActivity(BaseModel):
     id: int
     name: str
@@ -31,8 +38,33 @@ class Activity(BaseModel):
     status: bool
 
 
+# Сводная статистика по записям активности
+class ActivitySummary(BaseModel):
+    entry_count: int = 0
+    total_amount: int = 0
+    last_entry_date: Optional[str] = None
+    today_amount: int = 0
+
+
+# Серия активности (последовательные дни с записями)
+class Streak(BaseModel):
+    current_streak: int
+    longest_streak: int
+    last_active_day: Optional[date] = None
+
+    class Config:
+        from_attributes = True
+
+
 class ActivityFull(Activity):
     related_activities: List[RelatedActivity]
+    summary: Optional[ActivitySummary] = None
+    streak: Optional[Streak] = None
 
     class Config:
         from_attributes = True
+
+
+# Сериализаторы ответов, создаются один раз при импорте
+activity_full_adapter = TypeAdapter(ActivityFull)
+activity_full_list_adapter = TypeAdapter(List[ActivityFull])
@@ -1,8 +1,17 @@
-from typing import List, Dict, Optional
+from datetime import date
+from typing import List, Dict, Optional, Iterable, FrozenSet, Set
+from sqlalchemy import case, delete, func, literal, select, tuple_, union_all, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.dao_base import BaseDAO
-from src.activity.models import Activity
-from src.activity.schemas import ActivityCreate, ActivityUpdate
+from sqlalchemy.orm import joinedload
+from src.dao_base import BaseDAO, dialect_insert
+from src.activity.models import Activity, ActivityStreak, activity_activity
+from src.activity.schemas import ActivityCreate, ActivityUpdate, ActivitySummary, ActivityLink
+from src.activity.utils import StreakState, EMPTY_STREAK, compute_streak, extend_streak, shrink_streak, parse_entry_date, \
+    activity_group_cache
+from src.entry.models import Entry
+from src.entry.utils import EntryEvent
+from src.invalidation import publish_invalidation
+from src.shard import shard_router, ensure_activity_mirrors
 
 class ActivityService:
     """
@@ -15,6 +24,7 @@ class ActivityService:
 
         :param db: Асинхронная сессия SQLAlchemy.
         """
+        self.db = db
         self.dao = BaseDAO(db, Activity)
 
     async def create_activity(self, activity_data: ActivityCreate, user_id: int) -> Activity:
@@ -42,19 +52,101 @@ class ActivityService:
         """
         return await self.dao.get_by_id(activity_id, load_related=['related_activities'])
 
-    async def get_activities_by_user(self, user_id: int, status: Optional[bool] = None) -> List[Activity]:
+    async def get_activities_by_user(self, user_id: int, status: Optional[bool] = None, summary: bool = False) -> List[Activity]:
         """
         Получает список активностей для пользователя с опциональной фильтрацией по статусу.
 
         :param user_id: Идентификатор пользователя.
         :param status: Опциональный статус активности (True/False).
+        :param summary: Добавить к каждой активности сводную статистику по записям (атрибут summary).
         :return: Список активностей.
         """
         filters = [Activity.user_id == user_id]
         if status is not None:
             filters.append(Activity.status == status)
 
-        return await self.dao.get_all(filters=filters, load_related=['related_activities'])
+        if not summary:
+            return await self.dao.get_all(filters=filters, load_related=['related_activities'])
+        return await self._get_activities_with_summary(filters)
+
+    async def _get_activities_with_summary(self, filters: List) -> List[Activity]:
+        # Статистика по всем активностям пользователя считается одним GROUP BY,
+        # который присоединяется к выборке активностей в том же запросе
+        today = date.today().isoformat()
+        stats = (
+            select(
+                Entry.activity_id,
+                func.count(Entry.id).label('entry_count'),
+                func.coalesce(func.sum(Entry.amount), 0).label('total_amount'),
+                func.max(Entry.date_added).label('last_entry_date'),
+                func.coalesce(func.sum(case((Entry.date_added == today, Entry.amount), else_=0)), 0).label('today_amount'),
+            )
+            .join(Activity, Activity.id == Entry.activity_id)
+            .filter(*filters)
+            .group_by(Entry.activity_id)
+            .subquery()
+        )
+        query = (
+            select(Activity, stats.c.entry_count, stats.c.total_amount, stats.c.last_entry_date, stats.c.today_amount)
+            .outerjoin(stats, stats.c.activity_id == Activity.id)
+            .filter(*filters)
+            .options(joinedload(Activity.related_activities))
+        )
+        result = await self.db.execute(query)
+
+        activities = []
+        for activity, entry_count, total_amount, last_entry_date, today_amount in result.unique().all():
+            activity.summary = ActivitySummary(
+                entry_count=entry_count or 0,
+                total_amount=total_amount or 0,
+                last_entry_date=last_entry_date,
+                today_amount=today_amount or 0
+            )
+            activities.append(activity)
+        return activities
+
+    async def get_activities_version(self, user_id: int, status: Optional[bool] = None) -> tuple:
+        """
+        Получает версию списка активностей пользователя для ETag одним агрегирующим запросом.
+
+        :param user_id: Идентификатор пользователя.
+        :param status: Опциональный статус активности (True/False).
+        :return: Кортеж значений, меняющийся при любом изменении списка.
+        """
+        filters = [Activity.user_id == user_id]
+        if status is not None:
+            filters.append(Activity.status == status)
+        result = await self.db.execute(
+            select(func.count(Activity.id), func.sum(Activity.id), func.sum(Activity.revision), func.max(Activity.updated_at))
+            .filter(*filters)
+        )
+        # Текущая серия (и значение за сегодня в сводной статистике) зависит от текущего дня
+        return tuple(result.one()) + (date.today(),)
+
+    async def get_activity_version(self, activity_id: int) -> Optional[tuple]:
+        """
+        Получает версию активности для ETag.
+
+        :param activity_id: Идентификатор активности.
+        :return: Кортеж (revision, updated_at, текущий день) или None, если активности нет.
+        """
+        result = await self.db.execute(select(Activity.revision, Activity.updated_at).where(Activity.id == activity_id))
+        row = result.first()
+        # Текущая серия зависит от текущего дня
+        return tuple(row) + (date.today(),) if row else None
+
+    async def bump_revisions(self, activity_ids: Iterable[int]) -> None:
+        """
+        Увеличивает версии активностей (без фиксации транзакции).
+
+        :param activity_ids: Идентификаторы активностей.
+        """
+        await self.db.execute(
+            update(Activity)
+            .where(Activity.id.in_(list(activity_ids)))
+            .values(revision=Activity.revision + 1)
+            .execution_options(synchronize_session=False)
+        )
 
     async def update_activity(self, activity_id: int, activity_data: ActivityUpdate) -> Optional[Activity]:
         """
@@ -68,6 +160,12 @@ class ActivityService:
         if activity:
             for field, value in activity_data.dict(exclude_unset=True).items():
                 setattr(activity, field, value)
+            if 'name' in activity_data.model_fields_set:
+                # Имя показывается в related_activities активностей, связанных с этой
+                result = await self.db.execute(
+                    select(activity_activity.c.activity_one_id).where(activity_activity.c.activity_two_id == activity_id)
+                )
+                await self.bump_revisions(result.scalars().all())
             return await self.dao.update(activity)
         return None
 
@@ -80,3 +178,441 @@ class ActivityService:
         activity = await self.dao.get_by_id(activity_id)
         if activity:
             await self.dao.delete(activity)
+
+
+class ActivityGraphService:
+    """
+    Сервис для работы с графом связанных активностей (activity_activity). Связи считаются неориентированными,
+    группа активности - вся связная компонента графа. Группы вычисляются рекурсивным CTE и кэшируются.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Инициализация сервиса.
+
+        :param db: Асинхронная сессия SQLAlchemy.
+        """
+        self.db = db
+
+    async def get_group(self, activity_id: int) -> FrozenSet[int]:
+        """
+        Получает группу связанных активностей (включая саму активность).
+
+        :param activity_id: Идентификатор активности.
+        :return: Множество идентификаторов активностей группы.
+        """
+        groups = await self.get_groups([activity_id])
+        return groups[activity_id]
+
+    async def get_groups(self, activity_ids: Iterable[int]) -> Dict[int, FrozenSet[int]]:
+        """
+        Получает группы для нескольких активностей одним запросом (для тех, которых нет в кэше).
+
+        :param activity_ids: Идентификаторы активностей.
+        :return: Словарь activity_id -> множество активностей группы.
+        """
+        groups = {}
+        missing = []
+        for activity_id in set(activity_ids):
+            group = activity_group_cache.get(activity_id)
+            if group is None:
+                missing.append(activity_id)
+            else:
+                groups[activity_id] = group
+
+        if missing:
+            members: Dict[int, set] = {activity_id: {activity_id} for activity_id in missing}
+            if shard_router.count == 1:
+                result = await self.db.execute(self._group_query(missing))
+                for root, member in result.all():
+                    members[root].add(member)
+            else:
+                await self._expand_across_shards(members)
+            for activity_id, group in members.items():
+                groups[activity_id] = frozenset(group)
+                activity_group_cache.put(groups[activity_id])
+        return groups
+
+    async def _expand_across_shards(self, members: Dict[int, set]) -> None:
+        # Связи хранятся на шарде пользователя, который их создал, поэтому рекурсивный CTE одного шарда
+        # не видит всю компоненту: граф обходится в ширину, каждый шаг - одним запросом ко всем шардам
+        frontier = set().union(*members.values())
+        seen = set(frontier)
+        neighbours: Dict[int, set] = {}
+        while frontier:
+            rows = await shard_router.fetch_all(
+                select(activity_activity.c.activity_one_id, activity_activity.c.activity_two_id).where(
+                    activity_activity.c.activity_one_id.in_(frontier) | activity_activity.c.activity_two_id.in_(frontier)
+                ),
+                self.db
+            )
+            for one, two in rows:
+                neighbours.setdefault(one, set()).add(two)
+                neighbours.setdefault(two, set()).add(one)
+            frontier = {activity_id for one, two in rows for activity_id in (one, two)} - seen
+            seen |= frontier
+
+        for root, group in members.items():
+            stack = [root]
+            while stack:
+                for neighbour in neighbours.get(stack.pop(), ()):
+                    if neighbour not in group:
+                        group.add(neighbour)
+                        stack.append(neighbour)
+
+    @staticmethod
+    def _group_query(activity_ids: List[int]):
+        # Ребра в обе стороны, чтобы учитывать связи, созданные с любой стороны
+        edges = union_all(
+            select(activity_activity.c.activity_one_id.label('source'), activity_activity.c.activity_two_id.label('target')),
+            select(activity_activity.c.activity_two_id, activity_activity.c.activity_one_id),
+        ).subquery('edges')
+
+        group = (
+            select(Activity.id.label('root'), Activity.id.label('member'))
+            .where(Activity.id.in_(activity_ids))
+            .cte('activity_group', recursive=True)
+        )
+        # UNION (а не UNION ALL) гарантирует завершение рекурсии на циклах
+        group = group.union(
+            select(group.c.root, edges.c.target).join(edges, edges.c.source == group.c.member)
+        )
+        return select(group.c.root, group.c.member)
+
+    async def get_owned_ids(self, activity_ids: Iterable[int], user_id: int) -> set:
+        """
+        Возвращает идентификаторы активностей, принадлежащих пользователю (активности пользователя находятся
+        на его домашнем шарде).
+
+        :param activity_ids: Идентификаторы активностей.
+        :param user_id: Идентификатор пользователя.
+        :return: Множество идентификаторов активностей пользователя.
+        """
+        result = await self.db.execute(
+            select(Activity.id).where(Activity.id.in_(set(activity_ids)), Activity.user_id == user_id)
+        )
+        return set(result.scalars().all())
+
+    async def check_link_ownership(self, links: List[ActivityLink], user_id: int) -> bool:
+        """
+        Проверяет, что в каждой паре хотя бы одна активность принадлежит пользователю.
+
+        :param links: Пары активностей.
+        :param user_id: Идентификатор пользователя.
+        :return: True, если пользователь может изменять связи всех пар.
+        """
+        owned = await self.get_owned_ids(self._link_ids(links), user_id)
+        return all(link.activity_one_id in owned or link.activity_two_id in owned for link in links)
+
+    async def link_bulk(self, links: List[ActivityLink]) -> None:
+        """
+        Массово связывает активности одним запросом INSERT ... ON CONFLICT DO NOTHING.
+
+        :param links: Пары активностей.
+        """
+        values = [{'activity_one_id': link.activity_one_id, 'activity_two_id': link.activity_two_id}
+                  for link in links if link.activity_one_id != link.activity_two_id]
+        if not values:
+            return
+        # Связанные активности других пользователей могут находиться на других шардах
+        await ensure_activity_mirrors(self.db, self._link_ids(links))
+        await self.db.execute(dialect_insert(self.db, activity_activity).values(values).on_conflict_do_nothing())
+        await ActivityService(self.db).bump_revisions(self._link_ids(links))
+        await publish_invalidation(self.db, 'activity_activity', self._link_ids(links))
+        await self.db.commit()
+        activity_group_cache.invalidate(self._link_ids(links))
+
+    async def unlink_bulk(self, links: List[ActivityLink]) -> None:
+        """
+        Массово удаляет связи активностей одним запросом DELETE (в любом направлении).
+
+        :param links: Пары активностей.
+        """
+        if not links:
+            return
+        pairs = [(link.activity_one_id, link.activity_two_id) for link in links]
+        pairs += [(two, one) for one, two in pairs]
+        stmt = delete(activity_activity).where(
+            tuple_(activity_activity.c.activity_one_id, activity_activity.c.activity_two_id).in_(pairs)
+        )
+        if shard_router.count > 1:
+            # Обратная связь могла быть создана другим пользователем на его шарде
+            async def unlink(db: AsyncSession):
+                await db.execute(stmt)
+                await db.commit()
+
+            await shard_router.scatter_gather(unlink, db=self.db)
+        else:
+            await self.db.execute(stmt)
+        await ActivityService(self.db).bump_revisions(self._link_ids(links))
+        await publish_invalidation(self.db, 'activity_activity', self._link_ids(links))
+        await self.db.commit()
+        activity_group_cache.invalidate(self._link_ids(links))
+
+    @staticmethod
+    def _link_ids(links: List[ActivityLink]) -> set:
+        return {link.activity_one_id for link in links} | {link.activity_two_id for link in links}
+
+
+class StreakService:
+    """
+    Сервис для поддержки серий активностей. В обычном случае серия обновляется за O(1) при изменении записей,
+    при изменении дня в прошлом читается только серия, содержащая этот день.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Инициализация сервиса.
+
+        :param db: Асинхронная сессия SQLAlchemy.
+        """
+        self.db = db
+
+    async def apply_events(self, events: List[EntryEvent]) -> None:
+        """
+        Обновляет серии по событиям изменения записей. Вызывается в транзакции изменения записей до ее фиксации
+        (изменения уже отправлены в базу); транзакцию не фиксирует.
+
+        Строки серий блокируются (SELECT ... FOR UPDATE) до фиксации, поэтому транзакции, изменяющие записи
+        одной активности, обновляют серию по очереди: количество записей за день, прочитанное после блокировки,
+        содержит изменения всех ранее зафиксированных транзакций и текущей.
+
+        :param events: События изменения записей.
+        """
+        # Изменение количества записей по (активность, день) в текущей транзакции
+        deltas: Dict[tuple, int] = {}
+        for event in events:
+            key = (event.activity_id, event.date_added)
+            deltas[key] = deltas.get(key, 0) + (1 if event.op == 'create' else -1)
+        deltas = {key: delta for key, delta in deltas.items() if delta and parse_entry_date(key[1]) is not None}
+        if not deltas:
+            return
+
+        streaks = await self._lock_streaks({activity_id for activity_id, _ in deltas})
+        result = await self.db.execute(
+            select(Entry.activity_id, Entry.date_added, func.count(Entry.id))
+            .where(tuple_(Entry.activity_id, Entry.date_added).in_(list(deltas)))
+            .group_by(Entry.activity_id, Entry.date_added)
+        )
+        counts = {(activity_id, date_added): count for activity_id, date_added, count in result.tuples().all()}
+
+        # Дни, которые стали активными (True) или перестали быть активными (False)
+        transitions: Dict[int, List[tuple]] = {}
+        for (activity_id, date_added), delta in deltas.items():
+            count_after = counts.get((activity_id, date_added), 0)
+            count_before = count_after - delta
+            if (count_before > 0) != (count_after > 0):
+                transitions.setdefault(activity_id, []).append((parse_entry_date(date_added), count_after > 0))
+
+        for activity_id, changes in transitions.items():
+            streak = streaks.get(activity_id)
+            if streak is None:
+                # Активность удалена
+                continue
+            state = self._to_state(streak)
+            for day, active in sorted(changes):
+                updated = extend_streak(state, day) if active else shrink_streak(state, day)
+                if updated is None:
+                    # База уже содержит все изменения пакета: локальный пересчет корректен только для одного дня
+                    if len(changes) == 1:
+                        updated = await self._recompute_around(activity_id, state, day, active)
+                    else:
+                        updated = await self._compute(activity_id)
+                    state = updated
+                    break
+                state = updated
+            self._save(streak, activity_id, state)
+        await self.db.flush()
+
+    async def _lock_streaks(self, activity_ids: Set[int]) -> Dict[int, ActivityStreak]:
+        """
+        Создает отсутствующие строки серий и блокирует строки до конца транзакции
+        (в порядке идентификаторов, чтобы конкурентные подписчики не взаимоблокировались).
+
+        :param activity_ids: Идентификаторы активностей.
+        :return: Серии существующих активностей.
+        """
+        columns = ['activity_id', 'run_length', 'longest_streak']
+        await self.db.execute(
+            dialect_insert(self.db, ActivityStreak)
+            .from_select(columns, select(Activity.id, literal(0), literal(0)).where(Activity.id.in_(activity_ids)))
+            .on_conflict_do_nothing()
+        )
+        result = await self.db.execute(
+            select(ActivityStreak)
+            .where(ActivityStreak.activity_id.in_(activity_ids))
+            .order_by(ActivityStreak.activity_id)
+            .with_for_update()
+            .execution_options(populate_existing=True)
+        )
+        return {streak.activity_id: streak for streak in result.scalars().all()}
+
+    async def recompute(self, activity_id: int) -> None:
+        """
+        Пересчитывает серию одной активности по всем ее записям.
+
+        :param activity_id: Идентификатор активности.
+        """
+        streak = await self.db.get(ActivityStreak, activity_id)
+        self._save(streak, activity_id, await self._compute(activity_id))
+        await self.db.commit()
+
+    async def recompute_all(self, batch_size: int = 500) -> int:
+        """
+        Пересчитывает серии всех активностей пачками (используется после миграций данных,
+        `python -m src.activity recompute-streaks`).
+
+        :param batch_size: Количество активностей в пачке.
+        :return: Количество пересчитанных активностей.
+        """
+        processed = 0
+        last_id = 0
+        while True:
+            result = await self.db.execute(
+                select(Activity.id).where(Activity.id > last_id).order_by(Activity.id).limit(batch_size)
+            )
+            activity_ids = result.scalars().all()
+            if not activity_ids:
+                return processed
+
+            result = await self.db.execute(
+                select(Entry.activity_id, Entry.date_added)
+                .where(Entry.activity_id.in_(activity_ids))
+                .distinct()
+            )
+            days: Dict[int, list] = {activity_id: [] for activity_id in activity_ids}
+            for activity_id, date_added in result.all():
+                day = parse_entry_date(date_added)
+                if day is not None:
+                    days[activity_id].append(day)
+
+            result = await self.db.execute(select(ActivityStreak).where(ActivityStreak.activity_id.in_(activity_ids)))
+            streaks = {streak.activity_id: streak for streak in result.scalars().all()}
+            for activity_id in activity_ids:
+                self._save(streaks.get(activity_id), activity_id, compute_streak(days[activity_id]))
+            await self.db.commit()
+
+            processed += len(activity_ids)
+            last_id = activity_ids[-1]
+
+    async def _recompute_around(self, activity_id: int, state: StreakState, day: date, active: bool) -> StreakState:
+        """
+        Пересчитывает серию после изменения дня в прошлом, читая только серию, содержащую этот день.
+        Полный пересчет выполняется, только если удаленный день разорвал самую длинную серию.
+
+        :param activity_id: Идентификатор активности.
+        :param state: Состояние серии до изменения.
+        :param day: Измененный день (изменение уже зафиксировано в базе).
+        :param active: True, если день стал активным, False - если перестал.
+        :return: Новое состояние серии.
+        """
+        if state.last_active_day is None:
+            return await self._compute(activity_id)
+        previous = date.fromordinal(day.toordinal() - 1)
+        following = date.fromordinal(day.toordinal() + 1)
+
+        if active:
+            # Новый день соединяет соседние серии; более поздние серии не меняются
+            start = await self._run_edge(activity_id, day, -1)
+            end = await self._run_edge(activity_id, day, 1)
+            length = (end - start).days + 1
+            longest = max(state.longest_streak, length)
+            if end == state.last_active_day:
+                return StreakState(length, start, end, longest)
+            return StreakState(state.run_length, state.run_start, state.last_active_day, longest)
+
+        # День разрывает серию на левую и правую части
+        start = await self._run_edge(activity_id, previous, -1) if await self._is_active(activity_id, previous) \
+            else day
+        end = await self._run_edge(activity_id, following, 1) if await self._is_active(activity_id, following) \
+            else day
+        if day > state.last_active_day or (end - start).days + 1 >= state.longest_streak:
+            return await self._compute(activity_id)
+        if day < state.run_start:
+            return state
+        if day < state.last_active_day:
+            return StreakState((state.last_active_day - day).days, following, state.last_active_day,
+                               state.longest_streak)
+        if start < day:
+            return StreakState((day - start).days, start, previous, state.longest_streak)
+        # Удален единственный день последней серии: последней становится предыдущая серия
+        result = await self.db.execute(
+            select(func.max(Entry.date_added)).where(Entry.activity_id == activity_id,
+                                                     Entry.date_added < day.isoformat())
+        )
+        last = parse_entry_date(result.scalar())
+        if last is None:
+            return StreakState(0, None, None, state.longest_streak)
+        run_start = await self._run_edge(activity_id, last, -1)
+        return StreakState((last - run_start).days + 1, run_start, last, state.longest_streak)
+
+    async def _is_active(self, activity_id: int, day: date) -> bool:
+        result = await self.db.execute(
+            select(Entry.id).where(Entry.activity_id == activity_id, Entry.date_added == day.isoformat()).limit(1)
+        )
+        return result.first() is not None
+
+    async def _run_edge(self, activity_id: int, day: date, step: int) -> date:
+        """
+        Возвращает границу серии, содержащей активный день day, в направлении step (-1 - начало, 1 - конец).
+        Дни читаются окнами удваивающегося размера, пока не встретится пропуск.
+
+        :param activity_id: Идентификатор активности.
+        :param day: Активный день серии.
+        :param step: Направление поиска.
+        :return: Первый или последний день серии.
+        """
+        edge, window = day, 32
+        while True:
+            bound = date.fromordinal(edge.toordinal() + step * window)
+            low, high = sorted((date.fromordinal(edge.toordinal() + step), bound))
+            result = await self.db.execute(
+                select(Entry.date_added)
+                .where(Entry.activity_id == activity_id, Entry.date_added >= low.isoformat(),
+                       Entry.date_added <= high.isoformat())
+                .distinct()
+            )
+            days = {parse_entry_date(date_added) for date_added in result.scalars().all()}
+            for _ in range(window):
+                candidate = date.fromordinal(edge.toordinal() + step)
+                if candidate not in days:
+                    return edge
+                edge = candidate
+            window *= 2
+
+    async def _compute(self, activity_id: int) -> StreakState:
+        result = await self.db.execute(
+            select(Entry.date_added).where(Entry.activity_id == activity_id).distinct()
+        )
+        days = [parse_entry_date(date_added) for date_added in result.scalars().all()]
+        return compute_streak(day for day in days if day is not None)
+
+    @staticmethod
+    def _to_state(streak: Optional[ActivityStreak]) -> StreakState:
+        if streak is None:
+            return EMPTY_STREAK
+        return StreakState(streak.run_length, streak.run_start, streak.last_active_day, streak.longest_streak)
+
+    def _save(self, streak: Optional[ActivityStreak], activity_id: int, state: StreakState) -> None:
+        if streak is None:
+            streak = ActivityStreak(activity_id=activity_id)
+            self.db.add(streak)
+        streak.run_length = state.run_length
+        streak.run_start = state.run_start
+        streak.last_active_day = state.last_active_day
+        streak.longest_streak = state.longest_streak
+
+
+async def update_streaks(db: AsyncSession, events: List[EntryEvent]) -> None:
+    """
+    Подписчик на изменения записей, обновляющий серии активностей в транзакции изменения записей.
+    """
+    await StreakService(db).apply_events(events)
+
+
+async def bump_activity_revisions(db: AsyncSession, events: List[EntryEvent]) -> None:
+    """
+    Подписчик на изменения записей, увеличивающий версии активностей (ETag списков и графиков).
+    """
+    await ActivityService(db).bump_revisions({event.activity_id for event in events})
+    await db.commit()
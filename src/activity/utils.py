@@ -0,0 +1,137 @@
+from datetime import date
+from typing import Dict, FrozenSet, Iterable, NamedTuple, Optional
+
+from src.invalidation import register_invalidation_handler, register_resync_handler
+from src.metrics import counter
+
+group_cache_requests = counter("activity_group_cache_requests_total",
+                               "Обращения к кэшу групп связанных активностей", labels=("result",))
+
+
+class StreakState(NamedTuple):
+    """
+    Состояние серии активности.
+    """
+    run_length: int
+    run_start: Optional[date]
+    last_active_day: Optional[date]
+    longest_streak: int
+
+
+EMPTY_STREAK = StreakState(0, None, None, 0)
+
+
+def parse_entry_date(value) -> Optional[date]:
+    """
+    Преобразует дату записи ("%Y-%m-%d") в объект date.
+
+    :param value: Дата записи.
+    :return: Дата или None, если значение некорректно.
+    """
+    try:
+        return date.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def compute_streak(days: Iterable[date]) -> StreakState:
+    """
+    Вычисляет серию по полному набору активных дней.
+
+    :param days: Дни, в которые были записи.
+    :return: Состояние серии.
+    """
+    run_length, run_start, last, longest = 0, None, None, 0
+    for day in sorted(set(days)):
+        if last is not None and (day - last).days == 1:
+            run_length += 1
+        else:
+            run_length, run_start = 1, day
+        last = day
+        longest = max(longest, run_length)
+    return StreakState(run_length, run_start, last, longest)
+
+
+def extend_streak(state: StreakState, day: date) -> Optional[StreakState]:
+    """
+    Обновляет серию после появления первой записи в день day.
+
+    :param state: Текущее состояние серии.
+    :param day: Новый активный день.
+    :return: Новое состояние или None, если требуется пересчет (изменен день в прошлом).
+    """
+    if state.last_active_day is None:
+        return StreakState(1, day, day, max(state.longest_streak, 1))
+    gap = (day - state.last_active_day).days
+    if gap == 1:
+        run_length = state.run_length + 1
+        return StreakState(run_length, state.run_start, day, max(state.longest_streak, run_length))
+    if gap > 1:
+        return StreakState(1, day, day, max(state.longest_streak, 1))
+    return None
+
+
+def shrink_streak(state: StreakState, day: date) -> Optional[StreakState]:
+    """
+    Обновляет серию после удаления последней записи дня day.
+
+    :param state: Текущее состояние серии.
+    :param day: День, в котором больше нет записей.
+    :return: Новое состояние или None, если требуется пересчет.
+    """
+    if day == state.last_active_day and state.run_length > 1 and state.run_length < state.longest_streak:
+        return StreakState(state.run_length - 1, state.run_start, date.fromordinal(day.toordinal() - 1),
+                           state.longest_streak)
+    return None
+
+
+class ActivityGroupCache:
+    """
+    Кэш групп связанных активностей: activity_id -> множество активностей связной компоненты графа activity_activity.
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        """
+        Инициализация кэша.
+
+        :param maxsize: Максимальное количество кэшируемых активностей.
+        """
+        self.maxsize = maxsize
+        self.groups: Dict[int, FrozenSet[int]] = {}
+
+    def get(self, activity_id: int) -> Optional[FrozenSet[int]]:
+        group = self.groups.get(activity_id)
+        group_cache_requests.inc(result="miss" if group is None else "hit")
+        return group
+
+    def put(self, group: FrozenSet[int]) -> None:
+        """
+        Сохраняет группу для всех ее активностей.
+
+        :param group: Множество активностей группы.
+        """
+        if len(self.groups) + len(group) > self.maxsize:
+            self.groups.clear()
+        for activity_id in group:
+            self.groups[activity_id] = group
+
+    def invalidate(self, activity_ids: Iterable[int]) -> None:
+        """
+        Удаляет из кэша группы, в которые входят указанные активности.
+
+        :param activity_ids: Идентификаторы активностей.
+        """
+        for activity_id in activity_ids:
+            group = self.groups.pop(activity_id, None)
+            for member in group or ():
+                self.groups.pop(member, None)
+
+    def clear(self) -> None:
+        self.groups.clear()
+
+
+activity_group_cache = ActivityGroupCache()
+# Связи и активности могут измениться на других воркерах
+register_invalidation_handler('activity_activity', activity_group_cache.invalidate)
+register_invalidation_handler('activity', activity_group_cache.invalidate)
+register_resync_handler(activity_group_cache.clear)
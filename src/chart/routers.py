@@ -1,31 +1,123 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
-from src.chart.schemas import ChartDataRequest, ChartResponse
-from src.chart.service import ChartService
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Body, Request
+from fastapi.responses import Response, StreamingResponse
+from typing import List, Dict, Optional
+from src.chart.schemas import ChartDataRequest, ChartResponse, chart_response_adapter, chart_batch_adapter
+from src.chart.service import ChartService, chart_pubsub
+from src.chart.utils import CHART_COMPACT_BINARY, CHART_COMPACT_JSON, make_compact_dataset, pack_compact_dataset
+from src.config import settings
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
+from src.responses import AdapterResponse, ORJSONResponse, make_etag, etag_headers, not_modified, negotiate_media_type
 from src.user.models import User
 from src.user.utils import get_current_user
 
 router = APIRouter()
 
 @router.post("/data_for_chart", response_model=ChartResponse)
-async def process_chart_data_endpoint(data: ChartDataRequest, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def process_chart_data_endpoint(data: ChartDataRequest, request: Request, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для обработки данных графиков на основе запроса.
+    Компактный формат выбирается заголовком Accept: application/vnd.ultron.chart+json (JSON)
+    или application/vnd.ultron.chart (двоичный буфер), см. make_compact_dataset и pack_compact_dataset.
+    Тип выбирается по q-значениям (см. negotiate_media_type), по умолчанию - application/json.
 
     :param data: Запрос с данными для обработки.
+    :param request: Запрос (заголовок Accept).
     :param db: Асинхронная сессия SQLAlchemy.
     :return: Список обработанных данных для графиков.
     """
     service = ChartService(db)
 
+    media_type = negotiate_media_type(request.headers.get("accept", ""),
+                                      ("application/json", CHART_COMPACT_JSON, CHART_COMPACT_BINARY))
+
+    # Версия проверяется до построения графика: при совпадении ETag записи не выбираются
+    activity_ids = await service.get_related_activity_ids(data.id) if data.StatusView else [data.id]
+    etag = make_etag("chart", data.StatusView, media_type, await service.get_dataset_version(activity_ids))
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    # Вычисление выполняется в своей сессии: соединение запроса освобождается, чтобы запрос
+    # не удерживал одно соединение пула, ожидая второе
+    await db.close()
     if data.StatusView:
-        response_data = await service.formation_dataset_for_charts_rating(data.id)
+        response_data = await service.formation_dataset_for_charts_rating(data.id, activity_ids)
     else:
         response_data = await service.formation_dataset_for_charts_only_you(data.id)
 
     if not response_data:
         raise HTTPException(status_code=404, detail="Data not found")
 
-    return ChartResponse(**response_data)
\ No newline at end of file
+    headers = {"Vary": "Accept", **etag_headers(etag)}
+    if media_type == CHART_COMPACT_JSON:
+        return ORJSONResponse(make_compact_dataset(response_data), media_type=CHART_COMPACT_JSON, headers=headers)
+    if media_type == CHART_COMPACT_BINARY:
+        return Response(pack_compact_dataset(make_compact_dataset(response_data)), media_type=CHART_COMPACT_BINARY,
+                        headers=headers)
+    return AdapterResponse(chart_response_adapter, response_data, headers=headers)
+
+
+@router.post("/data_for_chart/batch", response_model=Dict[int, Optional[ChartResponse]])
+async def process_chart_data_batch_endpoint(data: List[ChartDataRequest] = Body(..., max_length=100), db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для получения данных графиков нескольких активностей одним запросом.
+
+    :param data: Список запросов графиков.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Словарь с ключами - идентификаторами активностей и значениями - данными графиков (null, если данных нет).
+    """
+    service = ChartService(db)
+    return AdapterResponse(chart_batch_adapter, await service.formation_datasets_batch(data))
+
+
+@router.get("/stream/{activity_id}")
+async def chart_stream_endpoint(activity_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для получения изменений записей группы связанных активностей в реальном времени (Server-Sent Events).
+    Клиент загружает график один раз через /data_for_chart, а затем применяет события entry:
+    {"op", "user_id", "activity_id", "entry_id", "date", "amount", "description"}.
+    Медленный клиент, не успевающий читать события, получает событие evicted и должен переподключиться.
+
+    :param activity_id: Идентификатор активности.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Поток событий text/event-stream.
+    """
+    service = ChartService(db)
+    activity_ids = await service.get_related_activity_ids(activity_id)
+    owners = await service.get_activity_owners(activity_ids)
+    # Соединение с базой не нужно на все время жизни потока
+    await db.close()
+
+    subscription = chart_pubsub.subscribe(activity_ids)
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), settings.CHART_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if event is None:
+                    yield "event: evicted\ndata: {}\n\n"
+                    return
+                payload = {
+                    "op": event.op,
+                    "user_id": owners.get(event.activity_id),
+                    "activity_id": event.activity_id,
+                    "entry_id": event.entry_id,
+                    "date": event.date_added,
+                    "amount": event.amount,
+                    "description": event.description,
+                }
+                yield f"event: entry\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+        finally:
+            chart_pubsub.unsubscribe(subscription)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
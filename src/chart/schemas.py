@@ -1,5 +1,5 @@
 from typing import List, Dict, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
 class ChartDataRequest(BaseModel):
     """
@@ -37,3 +37,8 @@ class ChartResponse(BaseModel):
 
     class Config:
         from_attributes = True  # Используется вместо orm_mode в Pydantic v2
+
+
+# Сериализаторы ответов, создаются один раз при импорте
+chart_response_adapter = TypeAdapter(ChartResponse)
+chart_batch_adapter = TypeAdapter(Dict[int, Optional[ChartResponse]])
@@ -1,15 +1,33 @@
+import logging
+
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
 from datetime import timedelta
-from typing import List, Dict
+from typing import List, Dict, Iterable, Optional
 
 from src.activity.models import Activity
-from src.chart.utils import make_dataset, make_dataset_only_you
+from src.activity.service import ActivityGraphService
+from src.chart.schemas import ChartDataRequest
+from src.chart.utils import ChartRow, make_dataset
 from src.dao_base import BaseDAO
+from src.database import async_session_maker
+from src.singleflight import SingleFlight
 from src.entry.models import Entry
+from src.entry.utils import EntryEvent
+from src.logger import Lazy
+from src.config import settings
+from src.pubsub import PubSub
+from src.shard import shard_router
 from src.user.models import User
 
+logger = logging.getLogger(__name__)
+# Одновременные одинаковые построения графиков выполняются один раз
+chart_flights = SingleFlight("chart")
+# Изменения записей для live-обновлений графиков; тема - идентификатор активности
+chart_pubsub = PubSub("chart", maxsize=settings.CHART_STREAM_QUEUE_SIZE)
+
 
 class ChartService:
     def __init__(self, db: AsyncSession):
@@ -18,71 +36,142 @@ class ChartService:
         self.activity_dao = BaseDAO(db, Activity)
 
     async def formation_dataset_for_charts_only_you(self, activity_id: int) -> Dict[str, List]:
-        print('только ты')
-        query = (
+        """
+        Формирует данные графика одной активности. Одновременные запросы одного графика объединяются.
+
+        :param activity_id: Идентификатор активности.
+        :return: Данные графика или пустой список, если записей нет.
+        """
+        return await chart_flights.do(('only_you', activity_id),
+                                      lambda: self._in_own_session('_build_dataset_only_you', activity_id))
+
+    async def formation_dataset_for_charts_rating(self, activity_id: int,
+                                                  activity_ids: Optional[Iterable[int]] = None) -> Dict[str, List]:
+        """
+        Формирует данные рейтингового графика по группе связанных активностей.
+        Одновременные запросы графика одной и той же группы объединяются.
+
+        :param activity_id: Идентификатор активности.
+        :param activity_ids: Группа активностей, если уже получена (тогда сессия сервиса не используется).
+        :return: Данные графика или пустой список, если записей нет.
+        """
+        if activity_ids is None:
+            activity_ids = await self.get_related_activity_ids(activity_id)
+        activity_ids = tuple(sorted(activity_ids))
+        return await chart_flights.do(('rating', activity_ids),
+                                      lambda: self._in_own_session('_build_dataset_rating', activity_ids))
+
+    @staticmethod
+    async def _in_own_session(method: str, *args):
+        # Общее вычисление не должно зависеть от сессии запроса, который его начал:
+        # этот запрос может быть отменен раньше остальных. Вызывающий код освобождает соединение
+        # своей сессии до ожидания вычисления (см. process_chart_data_endpoint)
+        async with async_session_maker() as db:
+            return await getattr(ChartService(db), method)(*args)
+
+    async def _build_dataset_only_you(self, activity_id: int) -> Dict[str, List]:
+        rows = await self._fetch_chart_rows(self._entries_query([activity_id]))
+        logger.debug("Построение графика 'только ты'", extra={"activity_id": activity_id, "rows": len(rows)})
+        return make_dataset(rows) if rows else []
+
+    async def _build_dataset_rating(self, activity_ids: List[int]) -> Dict[str, List]:
+        rows = await self._fetch_chart_rows(self._entries_query(activity_ids))
+        logger.debug("Построение графика 'рейтинг': активности %s", Lazy(lambda: sorted(activity_ids)),
+                     extra={"rows": len(rows)})
+        return make_dataset(rows) if rows else []
+
+    async def formation_datasets_batch(self, requests: List[ChartDataRequest]) -> Dict[int, Optional[Dict[str, List]]]:
+        """
+        Формирует данные графиков для нескольких активностей: группы связанных активностей разрешаются
+        одним запросом, все нужные записи выбираются одним запросом и раскладываются по активностям за один проход.
+
+        :param requests: Запросы графиков.
+        :return: Словарь activity_id -> данные графика (None, если записей нет).
+        """
+        rating_ids = [request.id for request in requests if request.StatusView]
+        groups = await ActivityGraphService(self.db).get_groups(rating_ids) if rating_ids else {}
+
+        activity_ids = {request.id for request in requests}
+        for group in groups.values():
+            activity_ids.update(group)
+
+        rows_by_activity: Dict[int, list] = {}
+        for row in await self._fetch_chart_rows(self._entries_query(activity_ids)):
+            rows_by_activity.setdefault(row.activity_id, []).append(row)
+
+        datasets = {}
+        for request in requests:
+            if request.StatusView:
+                rows = [row for activity_id in groups[request.id] for row in rows_by_activity.get(activity_id, ())]
+            else:
+                rows = rows_by_activity.get(request.id)
+            datasets[request.id] = make_dataset(rows) if rows else None
+        return datasets
+
+    async def _fetch_chart_rows(self, query) -> List[ChartRow]:
+        # Строки записей читаются без ORM-экземпляров и словарей и сразу передаются в make_dataset
+        if shard_router.count == 1:
+            return await self.entry_dao.get_rows(query, dto=ChartRow)
+        return [ChartRow(*row) for row in await shard_router.fetch_all(query, self.db)]
+
+    @staticmethod
+    def _entries_query(activity_ids: Iterable[int]):
+        # Порядок колонок совпадает с порядком полей ChartRow
+        return (
             select(
                 Entry.id.label('entry_id'),
                 User.username.label('user_name'),
                 User.id.label('user_id'),
                 Entry.amount,
                 Entry.date_added,
-                Entry.description
+                Entry.description,
+                Entry.activity_id
             )
             .join(Activity, Entry.activity_id == Activity.id)
-            .filter(Entry.activity_id == activity_id)
+            .filter(Entry.activity_id.in_(list(activity_ids)))
             .join(User, Activity.user_id == User.id)
         )
 
-        result = await self.db.execute(query)
-        data = result.all()
-        print(data)
-
-        dataset = make_dataset_only_you(data) if data else []
-        return dataset
-
-    async def formation_dataset_for_charts_rating(self, activity_id: int) -> Dict[str, List]:
-        print('рейтинг')
-        activity_ids = await self.get_related_activity_ids(activity_id)
-        print(activity_ids)
+    async def get_dataset_version(self, activity_ids: Iterable[int]) -> tuple:
+        """
+        Получает версию данных графика для ETag без выборки записей: версии активностей
+        и время изменения их владельцев (имена в графике).
 
+        :param activity_ids: Идентификаторы активностей графика.
+        :return: Кортеж значений, меняющийся при изменении данных графика.
+        """
+        activity_ids = sorted(activity_ids)
         query = (
-            select(
-                Entry.id.label('entry_id'),
-                User.username.label('user_name'),
-                User.id.label('user_id'),
-                Entry.amount,
-                Entry.date_added,
-                Entry.description
-            )
-            .join(Activity, Entry.activity_id == Activity.id)
-            .filter(Entry.activity_id.in_(activity_ids))
+            select(func.sum(Activity.revision), func.max(Activity.updated_at), func.max(User.updated_at))
             .join(User, Activity.user_id == User.id)
+            .where(Activity.id.in_(activity_ids))
         )
+        # В версию входят строки всех шардов; зеркальные копии активностей не меняются
+        return (tuple(activity_ids), tuple(tuple(row) for row in await shard_router.execute_all(self.db, query)))
 
-        result = await self.db.execute(query)
-        data = result.all()
+    async def get_related_activity_ids(self, activity_id: int) -> List[int]:
+        """
+        Получает идентификаторы всех активностей группы (связанных напрямую или через другие, в обе стороны).
 
-        formatted_data = [
-            {
-                'id_user': row.user_id,
-                'id_entry': row.entry_id,
-                'name': row.user_name,
-                'amount': row.amount,
-                'date_added': str(row.date_added),
-                'description': row.description
-            }
-            for row in data
-        ]
+        :param activity_id: Идентификатор активности.
+        :return: Список идентификаторов активностей группы, включая саму активность.
+        """
+        return list(await ActivityGraphService(self.db).get_group(activity_id))
 
-        dataset = make_dataset(formatted_data) if formatted_data else []
-        return dataset
+    async def get_activity_owners(self, activity_ids: Iterable[int]) -> Dict[int, int]:
+        """
+        Получает владельцев активностей.
 
-    async def get_related_activity_ids(self, activity_id: int) -> List[int]:
-        # Здесь нужно реализовать логику получения связанных активностей
-        # Предполагается, что будет возвращен список идентификаторов связанных активностей
-        activity = await self.activity_dao.get_by_id(activity_id, load_related=['related_activities'])
-        related_activities = []
-        if activity.related_activities:
-            for related_activity in activity.related_activities:
-                related_activities.append(related_activity)
-        return [activity.id for activity in related_activities] + [activity_id]
+        :param activity_ids: Идентификаторы активностей.
+        :return: Словарь activity_id -> user_id.
+        """
+        query = select(Activity.id, Activity.user_id).where(Activity.id.in_(list(activity_ids)))
+        return dict(await shard_router.execute_all(self.db, query))
+
+
+async def publish_chart_deltas(db: AsyncSession, events: List[EntryEvent]) -> None:
+    """
+    Подписчик на изменения записей, публикующий их для live-обновлений графиков.
+    """
+    for event in events:
+        chart_pubsub.publish(event.activity_id, event)
@@ -1,6 +1,34 @@
 from datetime import datetime, timedelta
 
-def make_dataset(data):
+# Начало отсчета дней в компактном формате графика
+EPOCH = datetime(1970, 1, 1)
+# Типы содержимого компактного формата графика (выбираются заголовком Accept)
+CHART_COMPACT_JSON = "application/vnd.ultron.chart+json"
+CHART_COMPACT_BINARY = "application/vnd.ultron.chart"
+
+class ChartRow:
+    """
+    Строка записи для построения графика. Легковесный объект только для чтения: создается напрямую
+    из строки результата запроса (см. BaseDAO.get_rows), без ORM-экземпляра и промежуточного словаря.
+    """
+    __slots__ = ('entry_id', 'user_name', 'user_id', 'amount', 'date_added', 'description', 'activity_id')
+
+    def __init__(self, entry_id, user_name, user_id, amount, date_added, description, activity_id=None):
+        self.entry_id = entry_id
+        self.user_name = user_name
+        self.user_id = user_id
+        self.amount = amount
+        self.date_added = date_added
+        self.description = description
+        self.activity_id = activity_id
+
+
+def make_dataset(rows):
+    """
+    Строит данные графика по строкам записей (ChartRow) за один проход: дни от первой до последней даты,
+    по каждому пользователю - значения, идентификаторы записей и описания по дням.
+    Если у пользователя несколько записей за день, используется последняя.
+    """
     dataset = {
         "date": [],
         "amount": {},
@@ -10,98 +38,107 @@ def make_dataset(data):
         "name": {}
     }
 
-    real_date = []
+    # Строки дат повторяются, поэтому каждая разбирается один раз
+    parsed = {}
+    for row in rows:
+        if row.date_added not in parsed:
+            parsed[row.date_added] = datetime.strptime(row.date_added, "%Y-%m-%d")
 
-    # Преобразование строк в datetime объекты
-    date_objects = [datetime.strptime(row['date_added'], "%Y-%m-%d") for row in data]
-
-    start_date = min(date_objects)
-    end_date = max(date_objects)
-
-    delta = end_date - start_date
-    dates = [start_date + timedelta(days=i) for i in range(delta.days + 1)]
+    start_date = min(parsed.values())
+    end_date = max(parsed.values())
+    days = (end_date - start_date).days + 1
+    dates = [start_date + timedelta(days=i) for i in range(days)]
 
     dataset["date"] = [d.strftime("%m-%d") for d in dates]
-
-    for row in data:
-        row_date = datetime.strptime(row['date_added'], "%Y-%m-%d")
-        real_date.append(row_date)
-
-        user_id = row['id_user']
-        if user_id not in dataset["entry_id"]:
-            dataset["entry_id"][user_id] = [None for _ in dates]
-            dataset["description"][user_id] = [None for _ in dates]
-        if user_id not in dataset["user_id"]:
+    # Полная дата начала нужна компактному формату: строки "%m-%d" не содержат года
+    dataset["start_day"] = (start_date - EPOCH).days
+
+    amounts, entry_ids, descriptions = dataset['amount'], dataset['entry_id'], dataset['description']
+    for row in rows:
+        user_id = row.user_id
+        if user_id not in amounts:
+            amounts[user_id] = [0] * days
+            entry_ids[user_id] = [None] * days
+            descriptions[user_id] = [None] * days
             dataset["user_id"].append(user_id)
-            dataset["name"][user_id] = row['name']
-        dataset['amount'][user_id] = [0 for _ in dates]
+            dataset["name"][user_id] = row.user_name
+        index = (parsed[row.date_added] - start_date).days
+        amounts[user_id][index] = row.amount
+        descriptions[user_id][index] = row.description if row.description else None
+        entry_ids[user_id][index] = row.entry_id if row.entry_id else None
 
-    dataset = enter_data(dataset, data, real_date, dates)
     dataset['user_id'].sort()
     return dataset
 
 
-def make_dataset_only_you(data):
-    dataset = {
-        "date": [],
-        "amount": {},
-        "entry_id": {},
-        "description": {},
-        "user_id": [],
-        "name": {}
+def make_compact_dataset(dataset):
+    """
+    Преобразует данные графика в компактный колоночный формат:
+    дни - номер первого дня от 1970-01-01 и количество дней, amount - плотная матрица
+    (строка на пользователя в порядке user_id), entry_id и description - разреженные пары
+    [индексы дней, значения] без пустых дней. Индексы передаются разностями с предыдущим
+    индексом (первый - с нулем), идентификаторы записей - разностями с предыдущим идентификатором.
+    """
+    user_ids = dataset['user_id']
+    compact = {
+        "start_day": dataset['start_day'],
+        "days": len(dataset['date']),
+        "user_id": user_ids,
+        "name": [dataset['name'][user_id] for user_id in user_ids],
+        "amount": [dataset['amount'][user_id] for user_id in user_ids],
+        "entry_id": [],
+        "description": [],
     }
-
-    real_date = []
-
-    # Преобразование строк в datetime объекты
-    date_objects = [datetime.strptime(row[4], "%Y-%m-%d") for row in data]
-
-    start_date = min(date_objects)
-    end_date = max(date_objects)
-
-    delta = end_date - start_date
-    dates = [start_date + timedelta(days=i) for i in range(delta.days + 1)]
-
-    dataset["date"] = [d.strftime("%m-%d") for d in dates]
-
-    for row in data:
-        row_date = datetime.strptime(row[4], "%Y-%m-%d")
-        real_date.append(row_date)
-
-        user_id = row[2]
-        if user_id not in dataset["entry_id"]:
-            dataset["entry_id"][user_id] = [None for _ in dates]
-            dataset["description"][user_id] = [None for _ in dates]
-        if user_id not in dataset["user_id"]:
-            dataset["user_id"].append(user_id)
-            dataset["name"][user_id] = row[1]
-        dataset['amount'][user_id] = [0 for _ in dates]
-
-    dataset = enter_data_only_you(dataset, data, real_date, dates)
-    dataset['user_id'].sort()
-    return dataset
-
-
-def enter_data(dataset, data, real_date, date_line):
-    for date in date_line:
-        if date in real_date:
-            for row in data:
-                row_date = datetime.strptime(row['date_added'], "%Y-%m-%d")
-                if row_date == date:
-                    user_id = row['id_user']
-                    dataset['amount'][user_id][date_line.index(date)] = row['amount']
-                    dataset['description'][user_id][date_line.index(date)] = row['description'] if row['description'] else None
-                    dataset['entry_id'][user_id][date_line.index(date)] = row['id_entry'] if row['id_entry'] else None
-    return dataset
-
-def enter_data_only_you(dataset, data, real_date, date_line):
-    for date in date_line:
-        if date in real_date:
-            for row in data:
-                row_date = datetime.strptime(row[4], "%Y-%m-%d")  # Индекс 4 соответствует 'date_added'
-                if row_date == date:
-                    user_id = row[2]  # Индекс 2 соответствует 'user_id'
-                    dataset['amount'][user_id][date_line.index(date)] = row[3]  # Индекс 3 соответствует 'amount'
-                    dataset['description'][user_id][date_line.index(date)] = row[5] if row[5] else None  # Индекс 5 соответствует 'description'
-                    dataset['entry_id'][user_id][date_line.index(date)] = row[0] if row[0] else None  # Индекс 0 соответствует 'id_entry'
-    return dataset
+    for user_id in user_ids:
+        entry_ids = dataset['entry_id'][user_id]
+        indexes = [i for i, value in enumerate(entry_ids) if value is not None]
+        compact['entry_id'].append([_deltas(indexes), _deltas([entry_ids[i] for i in indexes])])
+        descriptions = dataset['description'][user_id]
+        indexes = [i for i, value in enumerate(descriptions) if value is not None]
+        compact['description'].append([_deltas(indexes), [descriptions[i] for i in indexes]])
+    return compact
+
+
+def _deltas(values):
+    return [value - previous for previous, value in zip([0] + values, values)]
+
+
+def _pack_ints(values):
+    # Целые со знаком: zigzag и varint (LEB128), небольшие значения занимают один байт
+    buffer = bytearray()
+    for value in values:
+        value = (value << 1) ^ (value >> 63)
+        while value > 0x7f:
+            buffer.append((value & 0x7f) | 0x80)
+            value >>= 7
+        buffer.append(value)
+    return bytes(buffer)
+
+
+def _pack_strings(values):
+    encoded = [value.encode() for value in values]
+    return _pack_ints([len(value) for value in encoded]) + b"".join(encoded)
+
+
+def pack_compact_dataset(compact):
+    """
+    Упаковывает компактный формат графика в двоичный буфер: заголовок "UCH1", затем целые числа
+    в кодировке zigzag varint, строки - длиной (varint) и байтами UTF-8. Порядок полей:
+    start_day, days, users, user_id[users], имена, матрица amount[users * days]; для каждого
+    пользователя - количество и пары entry_id (разности индексов, разности идентификаторов),
+    затем для каждого пользователя - количество, разности индексов и строки описаний.
+    """
+    users = len(compact['user_id'])
+    parts = [
+        b"UCH1",
+        _pack_ints([compact['start_day'], compact['days'], users]),
+        _pack_ints(compact['user_id']),
+        _pack_strings(compact['name']),
+        _pack_ints([amount for row in compact['amount'] for amount in row]),
+    ]
+    for indexes, values in compact['entry_id']:
+        parts.append(_pack_ints([len(indexes)] + indexes + values))
+    for indexes, values in compact['description']:
+        parts.append(_pack_ints([len(indexes)] + indexes))
+        parts.append(_pack_strings(values))
+    return b"".join(parts)
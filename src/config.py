@@ -1,5 +1,6 @@
 import os
-from typing import Literal
+from typing import Literal, Optional
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,14 +8,24 @@ class Settings(BaseSettings):
     MODE: Literal["DEV", "TEST", "PROD", "DOCKER"]
     LOG_LEVEL: str
 
-    POSTGRES_DB: str
-    POSTGRES_USER: str
-    POSTGRES_PASSWORD: str
-    POSTGRES_HOST: str
-    POSTGRES_PORT: int
+    # Сервер базы данных: postgresql (asyncpg) или sqlite (aiosqlite, без сервера - для бенчмарков и тестов).
+    # Параметры POSTGRES_* и TEST_POSTGRES_* обязательны только для postgresql
+    DB_BACKEND: Literal["postgresql", "sqlite"] = "postgresql"
+    # Файлы SQLite; ":memory:" - временная база процесса: файл, удаляемый при завершении процесса
+    # (схема создается миграциями при старте приложения)
+    SQLITE_PATH: str = "ultron.db"
+    TEST_SQLITE_PATH: str = ":memory:"
+
+    POSTGRES_DB: Optional[str] = None
+    POSTGRES_USER: Optional[str] = None
+    POSTGRES_PASSWORD: Optional[str] = None
+    POSTGRES_HOST: Optional[str] = None
+    POSTGRES_PORT: Optional[int] = None
 
     @property
     def DATABASE_URL(self):
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite+aiosqlite:///{self.SQLITE_PATH}"
         return (f"postgresql+asyncpg://"
                 f"{self.POSTGRES_USER}:"
                 f"{self.POSTGRES_PASSWORD}@"
@@ -22,14 +33,16 @@ class Settings(BaseSettings):
                 f"{self.POSTGRES_PORT}/"
                 f"{self.POSTGRES_DB}")
 
-    TEST_POSTGRES_DB: str
-    TEST_POSTGRES_USER: str
-    TEST_POSTGRES_PASSWORD: str
-    TEST_POSTGRES_HOST: str
-    TEST_POSTGRES_PORT: int
+    TEST_POSTGRES_DB: Optional[str] = None
+    TEST_POSTGRES_USER: Optional[str] = None
+    TEST_POSTGRES_PASSWORD: Optional[str] = None
+    TEST_POSTGRES_HOST: Optional[str] = None
+    TEST_POSTGRES_PORT: Optional[int] = None
 
     @property
     def TEST_DATABASE_URL(self):
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite+aiosqlite:///{self.TEST_SQLITE_PATH}"
         return (f"postgresql+asyncpg://"
                 f"{self.TEST_POSTGRES_USER}:"
                 f"{self.TEST_POSTGRES_PASSWORD}@"
@@ -39,6 +52,8 @@ class Settings(BaseSettings):
 
     @property
     def SYNC_DATABASE_URL(self):
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite:///{self.SQLITE_PATH}"
         return (f"postgresql://"
                 f"{self.POSTGRES_USER}:"
                 f"{self.POSTGRES_PASSWORD}@"
@@ -46,11 +61,92 @@ class Settings(BaseSettings):
                 f"{self.POSTGRES_PORT}/"
                 f"{self.POSTGRES_DB}")
 
+    # Пул соединений с Postgres (в режиме TEST соединения не переиспользуются). Запрос занимает не больше
+    # одного соединения пула, поэтому по умолчанию пул вмещает все допущенные запросы (сумма ADMISSION_*_LIMIT):
+    # DB_MAX_OVERFLOW = сумма лимитов - DB_POOL_SIZE
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: Optional[int] = None
+    # Прогрев при старте: количество заранее открываемых соединений пула и ограничение времени прогрева (секунды)
+    WARMUP_CONNECTIONS: int = 5
+    WARMUP_TIMEOUT_SECONDS: float = 30.0
+
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
     REFRESH_TOKEN_EXPIRE_DAYS: int
 
+    # Количество потоков для хеширования и проверки паролей (bcrypt)
+    PASSWORD_HASH_WORKERS: int = 4
+    # Размер кэша проверенных JWT
+    JWT_CACHE_SIZE: int = 10000
+
+    # Ограничения одновременных запросов по классам маршрутов
+    ADMISSION_AUTH_LIMIT: int = 16
+    ADMISSION_CHART_LIMIT: int = 32
+    ADMISSION_WRITE_LIMIT: int = 64
+    ADMISSION_READ_LIMIT: int = 128
+    # Максимальное время ожидания в очереди (секунды), после которого запрос отклоняется
+    ADMISSION_QUEUE_TIMEOUT: float = 2.0
+    # Лимит запросов на пользователя (token bucket)
+    RATE_LIMIT_PER_SECOND: float = 20.0
+    RATE_LIMIT_BURST: int = 40
+
+    # Периодическая очистка истекших сессий (auth_session)
+    SESSION_SWEEP_INTERVAL_SECONDS: int = 600
+    SESSION_SWEEP_BATCH_SIZE: int = 1000
+
+    # Планировщик напоминаний
+    REMINDER_ENABLED: bool = False
+    REMINDER_SENDER: str = "stub"
+    REMINDER_TICK_SECONDS: int = 300
+    # Час (по времени сервера), начиная с которого отправляются напоминания
+    REMINDER_START_HOUR: int = 18
+    REMINDER_BATCH_SIZE: int = 100
+    REMINDER_CONCURRENCY: int = 8
+    REMINDER_MAX_RETRIES: int = 3
+
+    # Лидерборды: максимальное количество активностей в индексе и построенных рейтингов (LRU)
+    LEADERBOARD_MAX_ACTIVITIES: int = 100000
+    LEADERBOARD_MAX_BOARDS: int = 10000
+
+    # Live-обновления графиков: размер очереди подписчика и интервал keep-alive (секунды)
+    CHART_STREAM_QUEUE_SIZE: int = 100
+    CHART_STREAM_KEEPALIVE_SECONDS: int = 15
+
+    # Шина инвалидации кэшей между воркерами (Postgres LISTEN/NOTIFY)
+    INVALIDATION_ENABLED: bool = True
+
+    # Сжатие ответов
+    COMPRESSION_MINIMUM_SIZE: int = 1000
+    COMPRESSION_GZIP_LEVEL: int = 6
+
+    # Профилирование запросов: токен администратора (заголовки X-Profile и X-Admin-Token; пустой - выключено),
+    # доля случайно профилируемых запросов, интервал снимков стека и размер буфера профилей
+    PROFILE_TOKEN: str = ""
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_BUFFER_SIZE: int = 100
+
+    # Дополнительные шарды данных пользователей (activity, entry) - строки подключения через запятую.
+    # Шард 0 - основная база данных (DATABASE_URL); пустое значение - без шардирования
+    SHARD_URLS: str = ""
+
+    @property
+    def ADMISSION_TOTAL_LIMIT(self) -> int:
+        return (self.ADMISSION_AUTH_LIMIT + self.ADMISSION_CHART_LIMIT + self.ADMISSION_WRITE_LIMIT
+                + self.ADMISSION_READ_LIMIT)
+
+    @model_validator(mode="after")
+    def check_postgres_settings(self):
+        if self.DB_BACKEND == "postgresql":
+            missing = [name for name in ("POSTGRES_DB", "POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_HOST",
+                                         "POSTGRES_PORT", "TEST_POSTGRES_DB", "TEST_POSTGRES_USER",
+                                         "TEST_POSTGRES_PASSWORD", "TEST_POSTGRES_HOST", "TEST_POSTGRES_PORT")
+                       if getattr(self, name) is None]
+            if missing:
+                raise ValueError(f"Не заданы параметры Postgres: {', '.join(missing)}")
+        return self
+
     model_config = SettingsConfigDict(env_file=".env", extra="allow")
 
 
@@ -1,12 +1,29 @@
-from typing import Type, TypeVar, Generic, Optional, List, Any
+from typing import Type, TypeVar, Generic, Optional, List, Any, Callable
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session, joinedload, class_mapper
+from src.invalidation import publish_invalidation
 
 # Универсальный тип модели
 ModelType = TypeVar("ModelType")
 
+# Конструкторы INSERT с поддержкой ON CONFLICT (on_conflict_do_nothing, on_conflict_do_update, excluded)
+_DIALECT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def dialect_insert(db: AsyncSession, table):
+    """
+    Возвращает INSERT диалекта базы данных сессии с поддержкой ON CONFLICT (Postgres и SQLite).
+
+    :param db: Асинхронная сессия SQLAlchemy.
+    :param table: Таблица или модель.
+    :return: Конструкция INSERT.
+    """
+    return _DIALECT_INSERTS[db.bind.dialect.name](table)
+
+
 class BaseDAO(Generic[ModelType]):
     """
     Базовый класс для Data Access Object (DAO), который инкапсулирует базовые операции CRUD и
@@ -23,27 +40,36 @@ class BaseDAO(Generic[ModelType]):
         self.db = db
         self.model = model
 
-    async def create(self, obj: ModelType) -> ModelType:
+    async def _finish(self, commit: bool) -> None:
+        # Без фиксации изменения только отправляются в базу: вызывающий код продолжает транзакцию
+        if commit:
+            await self.db.commit()
+        else:
+            await self.db.flush()
+
+    async def create(self, obj: ModelType, commit: bool = True) -> ModelType:
         """
         Создает новый объект в базе данных.
 
         :param obj: Экземпляр модели для создания.
+        :param commit: Зафиксировать транзакцию (иначе изменения только отправляются в базу).
         :return: Созданный экземпляр модели.
         """
         self.db.add(obj)
-        await self.db.commit()
+        await self._finish(commit)
         await self.db.refresh(obj)
         return obj
 
-    async def create_bulk(self, objs: List[ModelType]) -> List[ModelType]:
+    async def create_bulk(self, objs: List[ModelType], commit: bool = True) -> List[ModelType]:
         """
         Массовое создание объектов в базе данных.
 
         :param objs: Список экземпляров моделей для создания.
+        :param commit: Зафиксировать транзакцию (иначе изменения только отправляются в базу).
         :return: Список созданных экземпляров моделей.
         """
         self.db.add_all(objs)
-        await self.db.commit()
+        await self._finish(commit)
         for obj in objs:
             await self.db.refresh(obj)
         return objs
@@ -83,39 +109,59 @@ class BaseDAO(Generic[ModelType]):
         result = result.scalars().unique().all()
         return result
 
-    async def update(self, obj: ModelType) -> ModelType:
+    async def get_rows(self, query: Any = None, filters: List[Any] = [], dto: Optional[Callable] = None) -> List[Any]:
+        """
+        Режим только для чтения: выбирает колонки без создания ORM-экземпляров (без identity map и отслеживания изменений).
+
+        :param query: Запрос с выбираемыми колонками (по умолчанию - все колонки таблицы модели).
+        :param filters: Список фильтров для применения к запросу.
+        :param dto: Класс (или функция), создающий объект из значений колонок строки, например, класс с __slots__.
+                    Если не задан, возвращаются строки результата (ведут себя как кортежи).
+        :return: Список объектов dto или строк.
+        """
+        if query is None:
+            query = select(*self.model.__table__.columns)
+        result = await self.db.execute(query.filter(*filters))
+        if dto is None:
+            return result.all()
+        return [dto(*row) for row in result]
+
+    async def update(self, obj: ModelType, commit: bool = True) -> ModelType:
         """
         Обновляет объект в базе данных.
 
         :param obj: Экземпляр модели для обновления.
+        :param commit: Зафиксировать транзакцию (иначе изменения только отправляются в базу).
         :return: Обновленный экземпляр модели.
         """
-        await self.db.commit()
+        await self._finish(commit)
         await self.db.refresh(obj)
         return obj
 
-    async def update_bulk(self, objs: List[ModelType]) -> List[ModelType]:
+    async def update_bulk(self, objs: List[ModelType], commit: bool = True) -> List[ModelType]:
         """
         Массовое обновление объектов в базе данных.
 
         :param objs: Список экземпляров моделей для обновления.
+        :param commit: Зафиксировать транзакцию (иначе изменения только отправляются в базу).
         :return: Список обновленных экземпляров моделей.
         """
         for obj in objs:
             self.db.add(obj)
-        await self.db.commit()
+        await self._finish(commit)
         for obj in objs:
             await self.db.refresh(obj)
         return objs
 
-    async def delete(self, obj: ModelType) -> None:
+    async def delete(self, obj: ModelType, commit: bool = True) -> None:
         """
         Удаляет объект из базы данных.
 
         :param obj: Экземпляр модели для удаления.
+        :param commit: Зафиксировать транзакцию (иначе изменения только отправляются в базу).
         """
         await self.db.delete(obj)
-        await self.db.commit()
+        await self._finish(commit)
 
     async def delete_bulk(self, objs: List[ModelType]) -> None:
         """
@@ -127,12 +173,26 @@ class BaseDAO(Generic[ModelType]):
             await self.db.delete(obj)
         await self.db.commit()
 
-    async def delete_by_ids(self, ids: List[int]) -> None:
+    async def delete_by_ids(self, ids: List[int], returning: Optional[List[Any]] = None,
+                            commit: bool = True) -> List[Any]:
         """
         Массовое удаление объектов по их идентификаторам.
 
         :param ids: Список идентификаторов для удаления.
-        """
-        stmt = delete(self.model).where(self.model.id.in_(ids))
-        await self.db.execute(stmt)
-        await self.db.commit()
+        :param returning: Список колонок, значения которых нужно вернуть для удаленных строк (DELETE ... RETURNING).
+        :param commit: Зафиксировать транзакцию.
+        :return: Строки с запрошенными колонками удаленных объектов или пустой список.
+        """
+        # Ключ инвалидации (по умолчанию id) возвращается вместе с запрошенными колонками
+        key_column = getattr(self.model, getattr(self.model, '__invalidation_key__', 'id'))
+        stmt = (
+            delete(self.model)
+            .where(self.model.id.in_(ids))
+            .returning(key_column.label('invalidation_key'), *(returning or []))
+        )
+        result = await self.db.execute(stmt)
+        rows = result.all()
+        await publish_invalidation(self.db, self.model.__tablename__, [row.invalidation_key for row in rows])
+        if commit:
+            await self.db.commit()
+        return rows if returning else []
@@ -1,20 +1,91 @@
-from sqlalchemy import NullPool
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine, AsyncSession
+import atexit
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import NullPool, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine, AsyncSession
 from sqlalchemy.orm import declarative_base
 
 from .config import settings
 
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 
 if settings.MODE == "TEST":
     DATABASE_URL = settings.TEST_DATABASE_URL
-    DATABASE_PARAMS = {"poolclass": NullPool}
 else:
     DATABASE_URL = settings.DATABASE_URL
-    DATABASE_PARAMS = {"poolclass": NullPool}
 
-engine = create_async_engine(DATABASE_URL, **DATABASE_PARAMS)
+ALEMBIC_DIRECTORY = Path(__file__).resolve().parent.parent / "alembic"
+
+
+def is_memory_database(url: str) -> bool:
+    """
+    Проверяет, что строка подключения указывает на базу SQLite в памяти.
+    """
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def private_database_url(url: str) -> str:
+    """
+    Заменяет базу SQLite в памяти временным файлом процесса. База в памяти существует в одном соединении,
+    и все сессии делили бы одну транзакцию: незафиксированные изменения одной сессии видны другим,
+    commit любой сессии фиксирует их, а rollback теряется. Файл удаляется при завершении процесса.
+    """
+    if not is_memory_database(url):
+        return url
+    directory = tempfile.mkdtemp(prefix="ultron-")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return make_url(url).set(database=os.path.join(directory, "db.sqlite3")).render_as_string(hide_password=False)
+
+
+def engine_params(url: str) -> dict:
+    """
+    Параметры движка для строки подключения. Соединения с Postgres переиспользуются из пула: вместе с ними
+    сохраняются подготовленные asyncpg запросы. Пул рассчитан на все допущенные запросы (admission control):
+    если он меньше, запросы ждут соединение до таймаута пула. База SQLite в памяти существует, пока открыто
+    соединение, поэтому заменяется временным файлом (см. private_database_url).
+    """
+    if make_url(url).get_backend_name() == "postgresql" and settings.MODE != "TEST":
+        max_overflow = settings.DB_MAX_OVERFLOW
+        if max_overflow is None:
+            max_overflow = max(0, settings.ADMISSION_TOTAL_LIMIT - settings.DB_POOL_SIZE)
+        elif settings.DB_POOL_SIZE + max_overflow < settings.ADMISSION_TOTAL_LIMIT:
+            logger.warning("Пул соединений (%s) меньше суммы лимитов admission control (%s)",
+                           settings.DB_POOL_SIZE + max_overflow, settings.ADMISSION_TOTAL_LIMIT)
+        return {"pool_size": settings.DB_POOL_SIZE, "max_overflow": max_overflow}
+    return {"poolclass": NullPool}
+
+
+def create_engine(url: str) -> AsyncEngine:
+    """
+    Создает асинхронный движок; для SQLite включает проверку внешних ключей (как в Postgres)
+    и журнал WAL, чтобы чтение не блокировалось записью.
+    """
+    url = private_database_url(url)
+    engine = create_async_engine(url, **engine_params(url))
+    if engine.dialect.name == "sqlite":
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _configure_sqlite(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA foreign_keys=ON")
+            # Писатели SQLite не встают в очередь, а повторяют попытки: при многих конкурентных записях
+            # (серии обновляются в транзакции изменения записей) ожидание может превышать несколько секунд
+            cursor.execute("PRAGMA busy_timeout=30000")
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.close()
+    return engine
+
+
+engine = create_engine(DATABASE_URL)
 
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
@@ -23,3 +94,22 @@ async def get_db() -> AsyncSession:
     async with async_session_maker() as session:
         yield session
 
+
+async def upgrade_schema(target: AsyncEngine = engine) -> None:
+    """
+    Применяет миграции Alembic через соединение движка. Используется для базы SQLite в памяти
+    (временного файла процесса): внешняя команда alembic upgrade к ней не подключится.
+
+    :param target: Асинхронный движок.
+    """
+    from alembic import command
+    from alembic.config import Config
+
+    def upgrade(connection):
+        config = Config()
+        config.set_main_option("script_location", str(ALEMBIC_DIRECTORY))
+        config.attributes["connection"] = connection
+        command.upgrade(config, "head")
+
+    async with target.begin() as connection:
+        await connection.run_sync(upgrade)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from src.database import Base
 from src.models import TimestampMixin
@@ -7,6 +7,11 @@ from src.models import TimestampMixin
 
 class Entry(Base, TimestampMixin):
     __tablename__ = 'entry'
+    __table_args__ = (
+        Index('ix_entry_activity_id_date_added', 'activity_id', 'date_added'),
+    )
+    # Кэши записей ключуются по активности, поэтому сообщения инвалидации содержат activity_id
+    __invalidation_key__ = 'activity_id'
 
     id = Column(Integer, primary_key=True)
     activity_id = Column(Integer, ForeignKey('activity.id'))
@@ -1,16 +1,17 @@
 from fastapi import APIRouter, Depends, Path
 from typing import List
-from src.entry.schemas import EntryCreate, EntryUpdate, Entry
+from src.entry.schemas import EntryCreate, EntryUpdate, Entry, entry_adapter, entry_list_adapter
 from src.entry.service import EntryService
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.database import get_db
+from src.responses import AdapterResponse
+from src.shard import get_user_db
 from src.user.models import User
 from src.user.utils import get_current_user
 
 router = APIRouter()
 
 @router.post("/entries/", response_model=Entry)
-async def create_entry_endpoint(entry: EntryCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_entry_endpoint(entry: EntryCreate, db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для создания новой записи.
 
@@ -19,10 +20,10 @@ async def create_entry_endpoint(entry: EntryCreate, db: AsyncSession = Depends(g
     :return: Созданная запись.
     """
     service = EntryService(db)
-    return await service.create_entry(entry, activity_id=entry.activity_id)
+    return AdapterResponse(entry_adapter, await service.create_entry(entry, activity_id=entry.activity_id))
 
 @router.post("/entries/bulk/", response_model=List[Entry])
-async def create_entries_bulk_endpoint(entries: List[EntryCreate], db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_entries_bulk_endpoint(entries: List[EntryCreate], db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для массового создания записей.
 
@@ -31,10 +32,10 @@ async def create_entries_bulk_endpoint(entries: List[EntryCreate], db: AsyncSess
     :return: Список созданных записей.
     """
     service = EntryService(db)
-    return await service.create_entries_bulk(entries, activity_id=entries[0].activity_id)
+    return AdapterResponse(entry_list_adapter, await service.create_entries_bulk(entries, activity_id=entries[0].activity_id))
 
 @router.put("/entries/{entry_id}", response_model=Entry)
-async def update_entry_endpoint(entry_id: int, entry: EntryUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_entry_endpoint(entry_id: int, entry: EntryUpdate, db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для обновления записи по её идентификатору.
 
@@ -44,10 +45,10 @@ async def update_entry_endpoint(entry_id: int, entry: EntryUpdate, db: AsyncSess
     :return: Обновленная запись.
     """
     service = EntryService(db)
-    return await service.update_entry(entry_id, entry)
+    return AdapterResponse(entry_adapter, await service.update_entry(entry_id, entry))
 
 @router.put("/entries/bulk/", response_model=List[Entry])
-async def update_entries_bulk_endpoint(entries: List[EntryUpdate], entry_ids: List[int], db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def update_entries_bulk_endpoint(entries: List[EntryUpdate], entry_ids: List[int], db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для массового обновления записей.
 
@@ -57,10 +58,10 @@ async def update_entries_bulk_endpoint(entries: List[EntryUpdate], entry_ids: Li
     :return: Список обновленных записей.
     """
     service = EntryService(db)
-    return await service.update_entries_bulk(entries, entry_ids)
+    return AdapterResponse(entry_list_adapter, await service.update_entries_bulk(entries, entry_ids))
 
 @router.delete("/entries/{entry_id}")
-async def delete_entry_endpoint(entry_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_entry_endpoint(entry_id: int, db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для удаления записи по её идентификатору.
 
@@ -73,7 +74,7 @@ async def delete_entry_endpoint(entry_id: int, db: AsyncSession = Depends(get_db
     return {"status": "deleted"}
 
 @router.delete("/entries/bulk/")
-async def delete_entries_bulk_endpoint(entry_ids: List[int], db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def delete_entries_bulk_endpoint(entry_ids: List[int], db: AsyncSession = Depends(get_user_db), current_user: User = Depends(get_current_user)):
     """
     Эндпоинт для массового удаления записей.
 
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Optional
 
 
 # Схема для создания записи (Entry)
@@ -26,3 +26,8 @@ class Entry(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# Сериализаторы ответов, создаются один раз при импорте
+entry_adapter = TypeAdapter(Entry)
+entry_list_adapter = TypeAdapter(List[Entry])
@@ -3,6 +3,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from src.dao_base import BaseDAO
 from src.entry.models import Entry
 from src.entry.schemas import EntryCreate, EntryUpdate
+from src.entry.utils import EntryEvent, make_entry_event, notify_entry_listeners
 
 class EntryService:
     """
@@ -15,8 +16,15 @@ class EntryService:
 
         :param db: Асинхронная сессия SQLAlchemy.
         """
+        self.db = db
         self.dao = BaseDAO(db, Entry)
 
+    async def _commit(self, events: List[EntryEvent]) -> None:
+        # Подписчики в транзакции видят изменения записей и фиксируются вместе с ними, остальные - после фиксации
+        await notify_entry_listeners(self.db, events, in_transaction=True)
+        await self.db.commit()
+        await notify_entry_listeners(self.db, events)
+
     async def create_entry(self, entry_data: EntryCreate, activity_id: int) -> Entry:
         """
         Создает новую запись.
@@ -31,7 +39,9 @@ class EntryService:
             description=entry_data.description,
             date_added=entry_data.date_added
         )
-        return await self.dao.create(new_entry)
+        new_entry = await self.dao.create(new_entry, commit=False)
+        await self._commit([make_entry_event('create', new_entry)])
+        return new_entry
 
     async def create_entries_bulk(self, entries_data: List[EntryCreate], activity_id: int) -> List[Entry]:
         """
@@ -49,7 +59,9 @@ class EntryService:
                 date_added=data.date_added
             ) for data in entries_data
         ]
-        return await self.dao.create_bulk(entries)
+        entries = await self.dao.create_bulk(entries, commit=False)
+        await self._commit([make_entry_event('create', entry) for entry in entries])
+        return entries
 
     async def get_entry_by_id(self, entry_id: int) -> Entry:
         """
@@ -70,9 +82,13 @@ class EntryService:
         """
         entry = await self.dao.get_by_id(entry_id)
         if entry:
+            events = [make_entry_event('delete', entry)]
             for field, value in entry_data.dict(exclude_unset=True).items():
                 setattr(entry, field, value)
-            return await self.dao.update(entry)
+            entry = await self.dao.update(entry, commit=False)
+            events.append(make_entry_event('create', entry))
+            await self._commit(events)
+            return entry
         return None
 
     async def update_entries_bulk(self, entries_data: List[EntryUpdate], entry_ids: List[int]) -> List[Entry]:
@@ -84,13 +100,18 @@ class EntryService:
         :return: Список обновленных записей.
         """
         entries = []
+        events = []
         for i, entry_id in enumerate(entry_ids):
             entry = await self.dao.get_by_id(entry_id)
             if entry:
+                events.append(make_entry_event('delete', entry))
                 for field, value in entries_data[i].dict(exclude_unset=True).items():
                     setattr(entry, field, value)
                 entries.append(entry)
-        return await self.dao.update_bulk(entries)
+        entries = await self.dao.update_bulk(entries, commit=False)
+        events.extend(make_entry_event('create', entry) for entry in entries)
+        await self._commit(events)
+        return entries
 
     async def delete_entry(self, entry_id: int) -> None:
         """
@@ -100,7 +121,9 @@ class EntryService:
         """
         entry = await self.dao.get_by_id(entry_id)
         if entry:
-            await self.dao.delete(entry)
+            event = make_entry_event('delete', entry)
+            await self.dao.delete(entry, commit=False)
+            await self._commit([event])
 
     async def delete_entries_bulk(self, entry_ids: List[int]) -> None:
         """
@@ -108,4 +131,7 @@ class EntryService:
 
         :param entry_ids: Список идентификаторов записей для удаления.
         """
-        await self.dao.delete_by_ids(entry_ids)
+        rows = await self.dao.delete_by_ids(entry_ids, returning=[
+            Entry.id, Entry.activity_id, Entry.date_added, Entry.amount, Entry.description
+        ], commit=False)
+        await self._commit([make_entry_event('delete', row) for row in rows])
@@ -0,0 +1,64 @@
+from typing import Awaitable, Callable, List, NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class EntryEvent(NamedTuple):
+    """
+    Событие изменения записи. Обновление записи передается парой событий: удаление старого
+    состояния и создание нового.
+    """
+    op: str  # 'create' или 'delete'
+    entry_id: int
+    activity_id: int
+    date_added: str
+    amount: int
+    description: Optional[str]
+
+
+EntryListener = Callable[[AsyncSession, List[EntryEvent]], Awaitable[None]]
+
+# Подписчики на изменения записей (лидерборды, live-обновления графиков и т.д.)
+_entry_listeners: List[EntryListener] = []
+# Подписчики, выполняемые в транзакции изменения записей до ее фиксации (серии)
+_entry_transaction_listeners: List[EntryListener] = []
+
+
+def make_entry_event(op: str, entry) -> EntryEvent:
+    """
+    Создает событие по текущему состоянию записи.
+
+    :param op: Тип события ('create' или 'delete').
+    :param entry: Запись (модель Entry или строка с теми же полями).
+    :return: Событие изменения записи.
+    """
+    return EntryEvent(op, entry.id, entry.activity_id, entry.date_added, entry.amount or 0, entry.description)
+
+
+def register_entry_listener(listener: EntryListener, in_transaction: bool = False) -> None:
+    """
+    Регистрирует подписчика на изменения записей.
+
+    :param listener: Асинхронная функция, принимающая сессию и список событий.
+    :param in_transaction: Вызывать подписчика в транзакции изменения записей до ее фиксации. Такой подписчик
+                           видит изменения записей и фиксируется (или откатывается) вместе с ними, сам он
+                           транзакцию не фиксирует.
+    """
+    listeners = _entry_transaction_listeners if in_transaction else _entry_listeners
+    if listener not in listeners:
+        listeners.append(listener)
+
+
+async def notify_entry_listeners(db: AsyncSession, events: List[EntryEvent], in_transaction: bool = False) -> None:
+    """
+    Передает события подписчикам. Вызывается после фиксации транзакции, а с in_transaction -
+    до фиксации, после отправки изменений записей в базу.
+
+    :param db: Асинхронная сессия SQLAlchemy.
+    :param events: Список событий.
+    :param in_transaction: Вызвать подписчиков, выполняемых в транзакции изменения записей.
+    """
+    if not events:
+        return
+    for listener in _entry_transaction_listeners if in_transaction else _entry_listeners:
+        await listener(db, events)
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from src.friend.schemas import FriendPage
+from src.friend.service import FriendService
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.database import get_db
+from src.user.models import User
+from src.user.utils import get_current_user
+
+router = APIRouter()
+
+
+def make_page(rows, limit: int) -> FriendPage:
+    # Следующая страница начинается после последнего друга текущей
+    next_after = rows[-1].id if len(rows) == limit else None
+    return FriendPage(items=rows, next_after=next_after)
+
+
+@router.get("/", response_model=FriendPage)
+async def get_friends_endpoint(after: Optional[int] = None, limit: int = Query(50, ge=1, le=500),
+                               db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для получения списка друзей текущего пользователя с keyset-пагинацией.
+
+    :param after: Идентификатор последнего друга предыдущей страницы.
+    :param limit: Размер страницы.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Страница друзей.
+    """
+    service = FriendService(db)
+    rows = await service.get_friends(current_user.id, after=after, limit=limit)
+    return make_page(rows, limit)
+
+
+@router.get("/mutual/{other_id}", response_model=FriendPage)
+async def get_mutual_friends_endpoint(other_id: int, after: Optional[int] = None, limit: int = Query(50, ge=1, le=500),
+                                      db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для получения общих друзей текущего пользователя и другого пользователя.
+
+    :param other_id: Идентификатор другого пользователя.
+    :param after: Идентификатор последнего друга предыдущей страницы.
+    :param limit: Размер страницы.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Страница общих друзей.
+    """
+    service = FriendService(db)
+    rows = await service.get_mutual_friends(current_user.id, other_id, after=after, limit=limit)
+    return make_page(rows, limit)
+
+
+@router.post("/{friend_id}")
+async def add_friend_endpoint(friend_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для добавления друга.
+
+    :param friend_id: Идентификатор добавляемого друга.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Статус операции.
+    """
+    if friend_id == current_user.id:
+        raise HTTPException(status_code=400, detail="Cannot add yourself as a friend")
+    service = FriendService(db)
+    if not await service.add_friend(current_user.id, friend_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    return {"status": "added"}
+
+
+@router.delete("/{friend_id}")
+async def remove_friend_endpoint(friend_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для удаления друга.
+
+    :param friend_id: Идентификатор удаляемого друга.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Статус операции.
+    """
+    service = FriendService(db)
+    await service.remove_friend(current_user.id, friend_id)
+    return {"status": "deleted"}
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+# Схема для отображения друга
+class Friend(BaseModel):
+    id: int
+    name: Optional[str] = None
+    username: str
+    nick: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+# Страница списка друзей (keyset-пагинация по идентификатору пользователя)
+class FriendPage(BaseModel):
+    items: List[Friend]
+    next_after: Optional[int] = None
@@ -0,0 +1,117 @@
+from typing import List, Optional
+from sqlalchemy import delete, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from src.dao_base import dialect_insert
+from src.models import user_friend
+from src.user.models import User
+
+
+class FriendService:
+    """
+    Сервис для управления друзьями. Все операции выполняются множественными запросами к таблице user_friend,
+    без загрузки списков друзей в память, поэтому их стоимость не зависит от количества друзей.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Инициализация сервиса.
+
+        :param db: Асинхронная сессия SQLAlchemy.
+        """
+        self.db = db
+
+    async def add_friend(self, user_id: int, friend_id: int) -> bool:
+        """
+        Добавляет дружбу в обе стороны одним запросом INSERT ... ON CONFLICT DO NOTHING.
+
+        :param user_id: Идентификатор пользователя.
+        :param friend_id: Идентификатор друга.
+        :return: True, если дружба существует после операции, False, если друг не найден.
+        """
+        stmt = (
+            dialect_insert(self.db, user_friend)
+            .values([
+                {'user_id': user_id, 'friend_id': friend_id},
+                {'user_id': friend_id, 'friend_id': user_id},
+            ])
+            .on_conflict_do_nothing()
+        )
+        try:
+            await self.db.execute(stmt)
+            await self._bump_revisions(user_id, friend_id)
+            await self.db.commit()
+        except IntegrityError:
+            await self.db.rollback()
+            return False
+        return True
+
+    async def remove_friend(self, user_id: int, friend_id: int) -> None:
+        """
+        Удаляет дружбу в обе стороны одним запросом DELETE.
+
+        :param user_id: Идентификатор пользователя.
+        :param friend_id: Идентификатор друга.
+        """
+        stmt = delete(user_friend).where(
+            tuple_(user_friend.c.user_id, user_friend.c.friend_id).in_([(user_id, friend_id), (friend_id, user_id)])
+        )
+        await self.db.execute(stmt)
+        await self._bump_revisions(user_id, friend_id)
+        await self.db.commit()
+
+    async def _bump_revisions(self, user_id: int, friend_id: int) -> None:
+        # Версии списков друзей обоих пользователей (ETag пользователя)
+        await self.db.execute(
+            update(User)
+            .where(User.id.in_([user_id, friend_id]))
+            .values(friends_revision=User.friends_revision + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def get_friends(self, user_id: int, after: Optional[int] = None, limit: int = 50) -> List[User]:
+        """
+        Получает страницу друзей пользователя, упорядоченных по идентификатору.
+
+        :param user_id: Идентификатор пользователя.
+        :param after: Идентификатор последнего друга предыдущей страницы.
+        :param limit: Размер страницы.
+        :return: Список друзей.
+        """
+        query = (
+            select(User.id, User.name, User.username, User.nick)
+            .join(user_friend, user_friend.c.friend_id == User.id)
+            .where(user_friend.c.user_id == user_id)
+        )
+        if after is not None:
+            query = query.where(user_friend.c.friend_id > after)
+        query = query.order_by(user_friend.c.friend_id).limit(limit)
+
+        result = await self.db.execute(query)
+        return result.all()
+
+    async def get_mutual_friends(self, user_id: int, other_id: int, after: Optional[int] = None, limit: int = 50) -> List[User]:
+        """
+        Получает страницу общих друзей двух пользователей.
+
+        :param user_id: Идентификатор пользователя.
+        :param other_id: Идентификатор другого пользователя.
+        :param after: Идентификатор последнего друга предыдущей страницы.
+        :param limit: Размер страницы.
+        :return: Список общих друзей.
+        """
+        mine = aliased(user_friend)
+        theirs = aliased(user_friend)
+        query = (
+            select(User.id, User.name, User.username, User.nick)
+            .join(mine, mine.c.friend_id == User.id)
+            .join(theirs, theirs.c.friend_id == mine.c.friend_id)
+            .where(mine.c.user_id == user_id, theirs.c.user_id == other_id)
+        )
+        if after is not None:
+            query = query.where(mine.c.friend_id > after)
+        query = query.order_by(mine.c.friend_id).limit(limit)
+
+        result = await self.db.execute(query)
+        return result.all()
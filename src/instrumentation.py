@@ -0,0 +1,145 @@
+"""
+Встроенная телеметрия: метрики HTTP-запросов по шаблонам маршрутов, запросов к базе данных,
+пула соединений и задержки цикла событий. Метрики отдаются эндпоинтом /metrics в текстовом формате Prometheus.
+
+Запись метрик не использует блокировок: все обновления выполняются в потоке цикла событий
+(обработчики событий SQLAlchemy вызываются в том же потоке через greenlet).
+"""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from src.metrics import counter, gauge, histogram, render_prometheus
+
+http_requests = counter("http_requests_total", "Количество HTTP-запросов", labels=("method", "route", "status"))
+http_request_duration = histogram("http_request_duration_seconds", "Длительность HTTP-запросов",
+                                  labels=("method", "route"))
+http_requests_in_progress = gauge("http_requests_in_progress", "Количество выполняющихся HTTP-запросов")
+http_request_db_queries = histogram("http_request_db_queries", "Количество запросов к базе данных на HTTP-запрос",
+                                    labels=("route",), buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100))
+http_request_db_duration = histogram("http_request_db_duration_seconds",
+                                     "Время запросов к базе данных на HTTP-запрос", labels=("route",))
+db_queries = counter("db_queries_total", "Количество запросов к базе данных")
+db_query_duration = histogram("db_query_duration_seconds", "Длительность запросов к базе данных")
+db_connections_checked_out = gauge("db_pool_checked_out", "Количество выданных соединений пула")
+db_connections_opened = counter("db_pool_connections_opened_total", "Количество открытых соединений с базой данных")
+db_connection_checkouts = counter("db_pool_checkouts_total", "Количество выдач соединений из пула")
+event_loop_lag = gauge("event_loop_lag_seconds", "Последняя измеренная задержка цикла событий")
+event_loop_lag_histogram = histogram("event_loop_lag_distribution_seconds", "Распределение задержки цикла событий",
+                                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+
+# Статистика запросов к базе данных текущего HTTP-запроса: [количество, время]
+_request_db_stats: ContextVar[Optional[list]] = ContextVar("request_db_stats", default=None)
+
+
+class InstrumentationMiddleware:
+    """
+    Записывает количество, длительность и статусы HTTP-запросов по шаблону маршрута
+    (например, /api/activities/activities/{activity_id}), а также число и время запросов к базе данных.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = [0, 0.0]
+        token = _request_db_stats.set(stats)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_db_stats.reset(token)
+            http_requests_in_progress.dec()
+            # Шаблон маршрута известен после маршрутизации; неизвестные пути объединяются, чтобы не плодить метки
+            route = scope.get("route")
+            template = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests.inc(method=method, route=template, status=status)
+            http_request_duration.observe(elapsed, method=method, route=template)
+            http_request_db_queries.observe(stats[0], route=template)
+            http_request_db_duration.observe(stats[1], route=template)
+
+
+# Время начала хранится в контексте выполнения: контекст живет ровно один запрос,
+# поэтому запрос, завершившийся ошибкой (after_cursor_execute не вызывается), ничего не оставляет
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._instrumentation_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_instrumentation_started", None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    db_queries.inc()
+    db_query_duration.observe(elapsed)
+    stats = _request_db_stats.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+@event.listens_for(Pool, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    db_connections_opened.inc()
+
+
+@event.listens_for(Pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    db_connection_checkouts.inc()
+    db_connections_checked_out.inc()
+
+
+@event.listens_for(Pool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    db_connections_checked_out.dec()
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """
+    Фоновая задача, измеряющая задержку цикла событий: насколько позже запланированного просыпается sleep.
+
+    :param interval: Интервал измерения в секундах.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        event_loop_lag.set(lag)
+        event_loop_lag_histogram.observe(lag)
+
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """
+    Эндпоинт с метриками процесса в текстовом формате Prometheus.
+    """
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
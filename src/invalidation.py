@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List
+
+from sqlalchemy import event, select, func
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.metrics import counter, gauge
+
+CHANNEL = "ultron_invalidate"
+# Максимальный размер payload NOTIFY в Postgres - 8000 байт; ключи отправляются частями
+MAX_KEYS_PER_MESSAGE = 500
+WORKER_ID = uuid.uuid4().hex[:12]
+
+logger = logging.getLogger(__name__)
+
+invalidation_published = counter("invalidation_published_total", "Количество опубликованных сообщений инвалидации")
+invalidation_received = counter("invalidation_received_total", "Количество полученных сообщений инвалидации",
+                                labels=("topic",))
+invalidation_lag = gauge("invalidation_lag_seconds", "Задержка доставки последнего сообщения инвалидации")
+invalidation_reconnects = counter("invalidation_reconnects_total", "Количество переподключений LISTEN")
+invalidation_connected = gauge("invalidation_listener_connected", "Подключено ли соединение LISTEN")
+
+InvalidationHandler = Callable[[List[int]], None]
+
+_handlers: Dict[str, List[InvalidationHandler]] = {}
+_resync_handlers: List[Callable[[], None]] = []
+
+
+def register_invalidation_handler(topic: str, handler: InvalidationHandler) -> None:
+    """
+    Регистрирует обработчик сообщений инвалидации темы (обычно - имени таблицы).
+
+    :param topic: Тема.
+    :param handler: Функция, принимающая список ключей.
+    """
+    _handlers.setdefault(topic, []).append(handler)
+
+
+def register_resync_handler(handler: Callable[[], None]) -> None:
+    """
+    Регистрирует обработчик полного сброса локального кэша. Вызывается после (пере)подключения LISTEN,
+    так как сообщения, отправленные во время разрыва, потеряны.
+
+    :param handler: Функция без аргументов.
+    """
+    _resync_handlers.append(handler)
+
+
+def _messages(topic: str, keys: Iterable[int]) -> List[str]:
+    keys = sorted(set(keys))
+    return [
+        json.dumps({"t": topic, "k": keys[i:i + MAX_KEYS_PER_MESSAGE], "ts": time.time(), "w": WORKER_ID},
+                   separators=(",", ":"))
+        for i in range(0, len(keys), MAX_KEYS_PER_MESSAGE)
+    ]
+
+
+def _notify(connection, topic: str, keys: Iterable[int]) -> None:
+    if not settings.INVALIDATION_ENABLED or connection.dialect.name != "postgresql":
+        return
+    for payload in _messages(topic, keys):
+        # NOTIFY транзакционен: сообщение будет доставлено только после фиксации транзакции
+        connection.execute(select(func.pg_notify(CHANNEL, payload)))
+        invalidation_published.inc()
+
+
+async def publish_invalidation(db, topic: str, keys: Iterable[int]) -> None:
+    """
+    Публикует сообщение инвалидации в текущей транзакции сессии (для изменений, сделанных не через ORM).
+
+    :param db: Асинхронная сессия SQLAlchemy.
+    :param topic: Тема (имя таблицы).
+    :param keys: Ключи измененных объектов.
+    """
+    keys = list(keys)
+    if keys:
+        connection = await db.connection()
+        await connection.run_sync(_notify, topic, keys)
+
+
+@event.listens_for(Session, "after_flush")
+def _publish_flushed(session: Session, flush_context) -> None:
+    # Изменения через ORM публикуются автоматически. Модель может указать в __invalidation_key__
+    # атрибут, значение которого используется как ключ (например, activity_id для записей)
+    changed: Dict[str, set] = {}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        key = getattr(obj, getattr(obj, "__invalidation_key__", "id"), None)
+        if table is not None and key is not None:
+            changed.setdefault(table, set()).add(key)
+    if not changed:
+        return
+    connection = session.connection()
+    for topic, keys in changed.items():
+        _notify(connection, topic, keys)
+
+
+def _dispatch(payload: str) -> None:
+    message = json.loads(payload)
+    invalidation_lag.set(max(0.0, time.time() - message["ts"]))
+    invalidation_received.inc(topic=message["t"])
+    # Собственные изменения уже применены локально
+    if message.get("w") == WORKER_ID:
+        return
+    for handler in _handlers.get(message["t"], ()):
+        handler(message["k"])
+
+
+def _resync() -> None:
+    for handler in _resync_handlers:
+        handler()
+
+
+class InvalidationListener:
+    """
+    Выделенное соединение LISTEN, получающее сообщения инвалидации от всех воркеров и удаляющее
+    локальные ключи кэша. При разрыве соединение восстанавливается с экспоненциальной задержкой,
+    после восстановления локальные кэши сбрасываются полностью.
+    """
+
+    def __init__(self, dsn: str, health_check_interval: float = 30.0, max_backoff: float = 30.0):
+        """
+        Инициализация.
+
+        :param dsn: Строка подключения к Postgres (формат libpq/asyncpg).
+        :param health_check_interval: Интервал проверки соединения в секундах.
+        :param max_backoff: Максимальная задержка перед переподключением в секундах.
+        """
+        self.dsn = dsn
+        self.health_check_interval = health_check_interval
+        self.max_backoff = max_backoff
+
+    async def run(self) -> None:
+        """
+        Поддерживает соединение LISTEN до отмены задачи.
+        """
+        import asyncpg
+
+        backoff = 0.5
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                await connection.add_listener(CHANNEL, lambda conn, pid, channel, payload: _dispatch(payload))
+                invalidation_connected.set(1)
+                _resync()
+                backoff = 0.5
+                while True:
+                    await asyncio.sleep(self.health_check_interval)
+                    await connection.fetchval("SELECT 1")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Соединение LISTEN потеряно, переподключение через %.1f с", backoff, exc_info=True)
+                invalidation_connected.set(0)
+                invalidation_reconnects.inc()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
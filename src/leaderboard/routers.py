@@ -0,0 +1,70 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Literal
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.chart.service import ChartService
+from src.database import get_db
+from src.leaderboard.schemas import Leaderboard, LeaderboardEntry
+from src.leaderboard.service import leaderboard_index
+from src.leaderboard.utils import RankedBoard
+from src.models import user_friend
+from src.user.models import User
+from src.user.utils import get_current_user
+
+router = APIRouter()
+
+Metric = Literal["total", "average", "streak"]
+Window = Literal["7d", "30d", "all"]
+
+
+def make_leaderboard(board: RankedBoard, metric: str, window: str, limit: int, user_id: int) -> Leaderboard:
+    entries = [LeaderboardEntry(rank=rank, user_id=uid, score=score) for rank, uid, score in board.top(limit)]
+    rank = board.rank(user_id)
+    me = LeaderboardEntry(rank=rank, user_id=user_id, score=board.scores[user_id]) if rank else None
+    return Leaderboard(metric=metric, window=window, entries=entries, me=me)
+
+
+@router.get("/activity/{activity_id}", response_model=Leaderboard)
+async def activity_leaderboard_endpoint(activity_id: int, metric: Metric = "total", window: Window = "7d",
+                                        limit: int = Query(10, ge=1, le=100),
+                                        db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для получения лидерборда по группе связанных активностей.
+
+    :param activity_id: Идентификатор активности.
+    :param metric: Показатель: total, average или streak.
+    :param window: Окно: 7d, 30d или all.
+    :param limit: Количество мест в ответе.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Лидерборд с местом текущего пользователя.
+    """
+    group = await ChartService(db).get_related_activity_ids(activity_id)
+    # Индекс загружается в своей сессии: соединение запроса к этому моменту не нужно
+    await db.close()
+    await leaderboard_index.ensure_loaded(group)
+    board = leaderboard_index.board(group, metric, window)
+    return make_leaderboard(board, metric, window, limit, current_user.id)
+
+
+@router.get("/friends/{activity_id}", response_model=Leaderboard)
+async def friends_leaderboard_endpoint(activity_id: int, metric: Metric = "total", window: Window = "7d",
+                                       limit: int = Query(10, ge=1, le=100),
+                                       db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Эндпоинт для получения лидерборда среди друзей текущего пользователя по группе связанных активностей.
+
+    :param activity_id: Идентификатор активности.
+    :param metric: Показатель: total, average или streak.
+    :param window: Окно: 7d, 30d или all.
+    :param limit: Количество мест в ответе.
+    :param db: Асинхронная сессия SQLAlchemy.
+    :return: Лидерборд друзей с местом текущего пользователя.
+    """
+    group = await ChartService(db).get_related_activity_ids(activity_id)
+    result = await db.execute(select(user_friend.c.friend_id).where(user_friend.c.user_id == current_user.id))
+    user_ids = set(result.scalars().all())
+    user_ids.add(current_user.id)
+    await db.close()
+    await leaderboard_index.ensure_loaded(group)
+    board = leaderboard_index.board(group, metric, window).filtered(user_ids)
+    return make_leaderboard(board, metric, window, limit, current_user.id)
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+
+# Место пользователя в лидерборде
+class LeaderboardEntry(BaseModel):
+    rank: int
+    user_id: int
+    score: float
+
+
+# Схема для ответа с лидербордом
+class Leaderboard(BaseModel):
+    metric: Literal["total", "average", "streak"]
+    window: Literal["7d", "30d", "all"]
+    entries: List[LeaderboardEntry]
+    me: Optional[LeaderboardEntry] = None
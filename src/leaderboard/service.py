@@ -0,0 +1,277 @@
+import asyncio
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.activity.models import Activity
+from src.config import settings
+from src.database import async_session_maker
+from src.entry.models import Entry
+from src.entry.utils import EntryEvent
+from src.invalidation import register_invalidation_handler, register_resync_handler
+from src.leaderboard.utils import RankedBoard, WINDOWS, compute_score, parse_day
+from src.shard import shard_router
+
+BoardKey = Tuple[Tuple[int, ...], str, str]
+
+
+class LeaderboardIndex:
+    """
+    Внутрипроцессный индекс лидербордов. Хранит суммы записей по дням для активностей запрошенных групп,
+    строит отсортированные рейтинги для групп связанных активностей и обновляет их инкрементально
+    при изменении записей. Активности группы загружаются одним агрегирующим запросом при первом обращении;
+    активности и рейтинги вытесняются по LRU сверх max_activities и max_boards.
+    """
+
+    def __init__(self, max_activities: int = 100000, max_boards: int = 10000):
+        """
+        Инициализация индекса.
+
+        :param max_activities: Максимальное количество активностей в индексе.
+        :param max_boards: Максимальное количество построенных рейтингов.
+        """
+        self.max_activities = max_activities
+        self.max_boards = max_boards
+        # activity_id -> (user_id владельца, {день: сумма}), в порядке последнего использования
+        self.activities: "OrderedDict[int, Tuple[int, Dict[int, int]]]" = OrderedDict()
+        # ключ рейтинга -> (день построения, рейтинг), в порядке последнего использования
+        self.boards: "OrderedDict[BoardKey, Tuple[int, RankedBoard]]" = OrderedDict()
+        # activity_id -> ключи рейтингов, в которые входит активность
+        self.activity_boards: Dict[int, Set[BoardKey]] = {}
+        # Активности, записи которых изменились на других воркерах
+        self.stale: Set[int] = set()
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    async def ensure_loaded(self, group: Iterable[int] = ()) -> None:
+        """
+        Сбрасывает индекс после потери событий, перечитывает устаревшие активности и загружает
+        отсутствующие активности группы.
+
+        :param group: Идентификаторы активностей, которые понадобятся для построения рейтинга.
+        """
+        async with self._lock:
+            if not self.loaded:
+                self.rebuild()
+            group = set(group)
+            for activity_id in group & self.activities.keys():
+                self.activities.move_to_end(activity_id)
+            missing = group - self.activities.keys()
+            if self.stale or missing:
+                async with async_session_maker() as db:
+                    if self.stale:
+                        await self.refresh(db, self.stale)
+                    if missing:
+                        await self.load(db, missing)
+            self._evict_activities(protected=group)
+
+    def mark_stale(self, activity_ids: Iterable[int]) -> None:
+        """
+        Помечает активности как устаревшие; они будут перечитаны при следующем обращении.
+
+        :param activity_ids: Идентификаторы активностей.
+        """
+        if self.loaded:
+            self.stale.update(activity_ids)
+
+    def invalidate(self) -> None:
+        """
+        Помечает весь индекс как устаревший.
+        """
+        self.loaded = False
+
+    def _activities_query(self, activity_ids: Iterable[int]):
+        return (
+            select(Entry.activity_id, Activity.user_id, Entry.date_added, func.sum(Entry.amount))
+            .join(Activity, Entry.activity_id == Activity.id)
+            .where(Entry.activity_id.in_(activity_ids))
+            .group_by(Entry.activity_id, Activity.user_id, Entry.date_added)
+        )
+
+    @staticmethod
+    def _collect(rows) -> Dict[int, Tuple[int, Dict[int, int]]]:
+        activities: Dict[int, Tuple[int, Dict[int, int]]] = {}
+        for activity_id, user_id, date_added, amount in rows:
+            day = parse_day(date_added)
+            if day is None:
+                continue
+            activities.setdefault(activity_id, (user_id, {}))[1][day] = amount or 0
+        return activities
+
+    async def refresh(self, db: AsyncSession, activity_ids: Iterable[int]) -> None:
+        """
+        Перечитывает суммы по дням для указанных активностей и обновляет рейтинги, в которые они входят.
+
+        :param db: Асинхронная сессия SQLAlchemy.
+        :param activity_ids: Идентификаторы активностей.
+        """
+        activity_ids = set(activity_ids)
+        self.stale -= activity_ids
+        # Активности, которых нет в индексе, будут прочитаны целиком при следующем обращении к их группе
+        activity_ids &= self.activities.keys()
+        if not activity_ids:
+            return
+        fresh = self._collect(await shard_router.execute_all(db, self._activities_query(activity_ids)))
+        owners = {}
+        for activity_id in activity_ids:
+            previous = self.activities.pop(activity_id, None)
+            if activity_id in fresh:
+                self.activities[activity_id] = fresh[activity_id]
+            current = previous or fresh.get(activity_id)
+            if current is not None:
+                owners[activity_id] = current[0]
+        self._update_boards(owners)
+
+    async def load(self, db: AsyncSession, activity_ids: Iterable[int]) -> None:
+        """
+        Загружает суммы по дням для активностей, отсутствующих в индексе.
+
+        :param db: Асинхронная сессия SQLAlchemy.
+        :param activity_ids: Идентификаторы активностей.
+        """
+        activity_ids = set(activity_ids)
+        fresh = self._collect(await shard_router.execute_all(db, self._activities_query(activity_ids)))
+        # Активности без записей тоже запоминаются, чтобы не перечитывать их при каждом обращении
+        empty = activity_ids - fresh.keys()
+        if empty:
+            owners = await shard_router.execute_all(db, select(Activity.id, Activity.user_id).where(Activity.id.in_(empty)))
+            for activity_id, user_id in owners:
+                fresh.setdefault(activity_id, (user_id, {}))
+        self.activities.update(fresh)
+
+    def rebuild(self) -> None:
+        """
+        Сбрасывает индекс: активности будут загружены заново при обращении к их группам.
+        """
+        self.activities = OrderedDict()
+        self.boards = OrderedDict()
+        self.activity_boards = {}
+        self.stale = set()
+        self.loaded = True
+
+    async def apply_events(self, db: AsyncSession, events: List[EntryEvent]) -> None:
+        """
+        Применяет изменения записей к индексу и затронутым рейтингам.
+
+        :param db: Асинхронная сессия SQLAlchemy.
+        :param events: События изменения записей.
+        """
+        # До загрузки индекса события не нужны: загрузка прочитает актуальное состояние базы.
+        # Активности, которых нет в индексе, также прочитаются целиком при обращении к их группе
+        if not self.loaded:
+            return
+
+        touched: Dict[int, int] = {}
+        deleted: Set[Tuple[int, str]] = set()
+        for event in events:
+            day = parse_day(event.date_added)
+            if day is None or event.activity_id not in self.activities:
+                continue
+            days = self.activities[event.activity_id][1]
+            sign = 1 if event.op == 'create' else -1
+            days[day] = days.get(day, 0) + sign * event.amount
+            if event.op == 'delete':
+                deleted.add((event.activity_id, event.date_added))
+            touched[event.activity_id] = self.activities[event.activity_id][0]
+
+        if deleted:
+            # День без записей удаляется, чтобы не учитываться в сериях и средних. События применяются после
+            # фиксации изменений, поэтому один запрос возвращает итоговое количество записей по всем дням
+            result = await db.execute(
+                select(Entry.activity_id, Entry.date_added, func.count(Entry.id))
+                .where(tuple_(Entry.activity_id, Entry.date_added).in_(deleted))
+                .group_by(Entry.activity_id, Entry.date_added)
+            )
+            remaining = {(activity_id, date_added) for activity_id, date_added, count in result.all() if count}
+            for activity_id, date_added in deleted - remaining:
+                self.activities[activity_id][1].pop(parse_day(date_added), None)
+
+        self._update_boards(touched)
+
+    def _update_boards(self, owners: Dict[int, int]) -> None:
+        # Пересчитывает показатели владельцев активностей во всех построенных рейтингах с этими активностями
+        for activity_id, user_id in owners.items():
+            for key in self.activity_boards.get(activity_id, ()):
+                built_on, board = self.boards[key]
+                group, metric, window = key
+                board.update(user_id, compute_score(self._user_days(group, user_id), metric, WINDOWS[window], built_on))
+
+    def _user_days(self, group: Iterable[int], user_id: int) -> Dict[int, int]:
+        # Объединяет дни всех активностей пользователя в группе
+        merged: Dict[int, int] = {}
+        for activity_id in group:
+            owner, days = self.activities.get(activity_id, (None, None))
+            if owner != user_id:
+                continue
+            for day, amount in days.items():
+                merged[day] = merged.get(day, 0) + amount
+        return merged
+
+    def board(self, group: Iterable[int], metric: str, window: str) -> RankedBoard:
+        """
+        Возвращает рейтинг для группы активностей, строя его при первом обращении и при смене дня.
+
+        :param group: Идентификаторы активностей группы.
+        :param metric: Показатель: total, average или streak.
+        :param window: Окно: 7d, 30d или all.
+        :return: Рейтинг.
+        """
+        group = tuple(sorted(set(group)))
+        key = (group, metric, window)
+        today = date.today().toordinal()
+        for activity_id in group:
+            if activity_id in self.activities:
+                self.activities.move_to_end(activity_id)
+
+        cached = self.boards.get(key)
+        if cached is not None and cached[0] == today:
+            self.boards.move_to_end(key)
+            return cached[1]
+
+        board = RankedBoard()
+        users = {self.activities[activity_id][0] for activity_id in group if activity_id in self.activities}
+        for user_id in users:
+            board.update(user_id, compute_score(self._user_days(group, user_id), metric, WINDOWS[window], today))
+
+        self.boards[key] = (today, board)
+        self.boards.move_to_end(key)
+        for activity_id in group:
+            self.activity_boards.setdefault(activity_id, set()).add(key)
+        while len(self.boards) > self.max_boards:
+            self._drop_board(next(iter(self.boards)))
+        return board
+
+    def _evict_activities(self, protected: Set[int]) -> None:
+        # Вытесняет давно не использованные активности вместе с рейтингами, в которые они входят
+        while len(self.activities) > self.max_activities:
+            activity_id = next(iter(self.activities))
+            if activity_id in protected:
+                # Активности запрошенной группы находятся в конце: группа больше лимита, но нужна целиком
+                break
+            del self.activities[activity_id]
+            for key in list(self.activity_boards.get(activity_id, ())):
+                self._drop_board(key)
+
+    def _drop_board(self, key: BoardKey) -> None:
+        self.boards.pop(key, None)
+        for activity_id in key[0]:
+            keys = self.activity_boards.get(activity_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.activity_boards[activity_id]
+
+
+leaderboard_index = LeaderboardIndex(settings.LEADERBOARD_MAX_ACTIVITIES, settings.LEADERBOARD_MAX_BOARDS)
+register_invalidation_handler('entry', leaderboard_index.mark_stale)
+register_resync_handler(leaderboard_index.invalidate)
+
+
+async def update_leaderboards(db: AsyncSession, events: List[EntryEvent]) -> None:
+    """
+    Подписчик на изменения записей, обновляющий лидерборды.
+    """
+    await leaderboard_index.apply_events(db, events)
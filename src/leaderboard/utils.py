@@ -0,0 +1,110 @@
+from bisect import bisect_left, insort
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+# Окна лидерборда в днях (None - за все время)
+WINDOWS = {"7d": 7, "30d": 30, "all": None}
+METRICS = ("total", "average", "streak")
+
+
+def parse_day(value: str) -> Optional[int]:
+    """
+    Преобразует дату записи ("%Y-%m-%d") в порядковый номер дня.
+
+    :param value: Дата записи.
+    :return: Порядковый номер дня или None, если дата некорректна.
+    """
+    try:
+        return date.fromisoformat(str(value)).toordinal()
+    except ValueError:
+        return None
+
+
+def compute_score(days: Dict[int, int], metric: str, window: Optional[int], today: int) -> float:
+    """
+    Вычисляет показатель пользователя за окно по суммам записей по дням.
+
+    :param days: Суммы записей по порядковым номерам дней.
+    :param metric: Показатель: total, average или streak.
+    :param window: Длина окна в днях или None для всего времени.
+    :param today: Порядковый номер текущего дня.
+    :return: Значение показателя.
+    """
+    start = today - window + 1 if window else None
+
+    if metric == "streak":
+        # Текущая серия заканчивается сегодня или вчера
+        day = today if today in days else today - 1
+        streak = 0
+        while day in days and (start is None or day >= start):
+            streak += 1
+            day -= 1
+        return streak
+
+    total = 0
+    active_days = 0
+    for day, amount in days.items():
+        if start is None or day >= start:
+            total += amount
+            active_days += 1
+    if metric == "average":
+        return total / active_days if active_days else 0
+    return total
+
+
+class RankedBoard:
+    """
+    Отсортированный по убыванию показателя список пользователей. Обновление показателя одного пользователя
+    выполняется бинарным поиском, запросы top-N и места пользователя - за O(log n) + N.
+    """
+
+    def __init__(self):
+        self.keys: List[Tuple[float, int]] = []
+        self.scores: Dict[int, float] = {}
+
+    def update(self, user_id: int, score: float) -> None:
+        """
+        Устанавливает показатель пользователя. Пользователи с нулевым показателем в рейтинг не попадают.
+
+        :param user_id: Идентификатор пользователя.
+        :param score: Новое значение показателя.
+        """
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            del self.keys[bisect_left(self.keys, (-old, user_id))]
+        if score:
+            self.scores[user_id] = score
+            insort(self.keys, (-score, user_id))
+
+    def top(self, limit: int) -> List[Tuple[int, int, float]]:
+        """
+        Возвращает первые места рейтинга.
+
+        :param limit: Количество мест.
+        :return: Список (место, user_id, показатель).
+        """
+        return [(self.rank(user_id), user_id, -score) for score, user_id in self.keys[:limit]]
+
+    def rank(self, user_id: int) -> Optional[int]:
+        """
+        Возвращает место пользователя. Пользователи с равными показателями делят место.
+
+        :param user_id: Идентификатор пользователя.
+        :return: Место (начиная с 1) или None, если пользователя нет в рейтинге.
+        """
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self.keys, (-score, float('-inf'))) + 1
+
+    def filtered(self, user_ids) -> "RankedBoard":
+        """
+        Возвращает рейтинг, ограниченный набором пользователей (например, друзьями).
+
+        :param user_ids: Множество идентификаторов пользователей.
+        :return: Новый рейтинг.
+        """
+        board = RankedBoard()
+        board.keys = [key for key in self.keys if key[1] in user_ids]
+        board.scores = {user_id: -score for score, user_id in board.keys}
+        return board
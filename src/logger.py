@@ -0,0 +1,105 @@
+"""
+Структурированное логирование.
+
+Записи передаются через QueueHandler в отдельный поток (QueueListener), который форматирует их в JSON
+и пишет в stdout, поэтому запись лога не блокирует цикл событий. Сообщение форматируется в потоке
+слушателя: аргументы записи не должны изменяться после вызова логгера. Для дорогих значений
+используется Lazy - функция вызывается, только если запись проходит по уровню.
+
+Каждая запись содержит request_id текущего запроса (заголовок X-Request-ID, см. RequestIdMiddleware).
+"""
+import json
+import logging
+import queue
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable
+
+# Идентификатор текущего запроса; наследуется фоновыми задачами, созданными во время запроса
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Стандартные атрибуты LogRecord; остальные (переданные через extra) выводятся как поля записи
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class Lazy:
+    """
+    Значение, вычисляемое только при форматировании записи лога.
+
+    Пример: logger.debug("Строки: %s", Lazy(lambda: [tuple(row) for row in rows]))
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func: Callable[[], object]):
+        self.func = func
+
+    def __str__(self) -> str:
+        return str(self.func())
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Добавляет к записи идентификатор текущего запроса (в потоке, где создана запись).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись в одну строку JSON: время, уровень, логгер, request_id, сообщение и поля из extra.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler, не форматирующий сообщение в потоке вызова (стандартный форматирует его сразу).
+    Трассировка исключения форматируется сразу: кадры стека изменятся после возврата из обработчика.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(level: str) -> QueueListener:
+    """
+    Настраивает корневой логгер: уровень из настроек и очередь записей.
+    Записи пишутся в stdout после запуска возвращаемого слушателя (до запуска они накапливаются в очереди).
+
+    :param level: Уровень логирования (например, INFO или DEBUG).
+    :return: QueueListener (запускается и останавливается вместе с приложением).
+    """
+    records: queue.Queue = queue.Queue(-1)
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    listener = QueueListener(records, handler, respect_handler_level=True)
+
+    queue_handler = DeferredQueueHandler(records)
+    queue_handler.addFilter(RequestIdFilter())
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(level.upper())
+    return listener
@@ -1,12 +1,114 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from src.activity.routers import router as activity_router
 from src.entry.routers import router as entry_router
 from src.user.routers import router as user_router
 from src.pages.routers import router as pages_router
 from src.chart.routers import router as chart_router
+from src.friend.routers import router as friend_router
+from src.leaderboard.routers import router as leaderboard_router
+from src.leaderboard.service import leaderboard_index, update_leaderboards
+from src.entry.utils import register_entry_listener
+from src.activity.service import bump_activity_revisions, update_streaks
+from src.chart.service import publish_chart_deltas
+from src.reminder.service import ReminderScheduler
+from src.reminder.utils import get_sender
+from src.invalidation import InvalidationListener
+from src.database import DATABASE_URL, is_memory_database, upgrade_schema
+from src.middleware import AdmissionControlMiddleware, CompressionMiddleware, RequestIdMiddleware
+from src.logger import setup_logging
+from src.instrumentation import InstrumentationMiddleware, monitor_event_loop_lag, router as metrics_router
+from src.profiling import ProfilingMiddleware, router as profiling_router
+from src.warmup import readiness, warm_up, router as warmup_router
+from src.responses import ORJSONResponse
+from src.config import settings
+from src.user.service import sweep_expired_sessions
 from fastapi.security import OAuth2PasswordBearer
 
-app = FastAPI()
+
+# Структурированное логирование: записи пишутся в stdout отдельным потоком слушателя
+log_listener = setup_logging(settings.LOG_LEVEL)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    started = time.perf_counter()
+    log_listener.start()
+    # База SQLite в памяти создается пустой при каждом запуске
+    if is_memory_database(DATABASE_URL):
+        await upgrade_schema()
+    # Фоновые задачи приложения
+    tasks = [
+        asyncio.create_task(sweep_expired_sessions(settings.SESSION_SWEEP_INTERVAL_SECONDS,
+                                                   settings.SESSION_SWEEP_BATCH_SIZE)),
+        asyncio.create_task(leaderboard_index.ensure_loaded()),
+        asyncio.create_task(monitor_event_loop_lag()),
+    ]
+    # Изменения публикуются в базе, в которой они сделаны, поэтому слушаются все шарды
+    for url in [DATABASE_URL] + [url.strip() for url in settings.SHARD_URLS.split(",") if url.strip()]:
+        if settings.INVALIDATION_ENABLED and url.startswith("postgresql"):
+            listener = InvalidationListener(url.replace("postgresql+asyncpg", "postgresql", 1))
+            tasks.append(asyncio.create_task(listener.run()))
+    if settings.REMINDER_ENABLED:
+        scheduler = ReminderScheduler(
+            sender=get_sender(settings.REMINDER_SENDER),
+            batch_size=settings.REMINDER_BATCH_SIZE,
+            concurrency=settings.REMINDER_CONCURRENCY,
+            max_retries=settings.REMINDER_MAX_RETRIES,
+            start_hour=settings.REMINDER_START_HOUR,
+        )
+        tasks.append(asyncio.create_task(scheduler.run(settings.REMINDER_TICK_SECONDS)))
+    # Сервер начинает принимать запросы после выхода из этой части lifespan, то есть после прогрева
+    await warm_up(app, started)
+    yield
+    readiness.set(False)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    # Дописываем записи, оставшиеся в очереди
+    log_listener.stop()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
+
+# Подписчики на изменения записей
+register_entry_listener(bump_activity_revisions)
+register_entry_listener(update_streaks, in_transaction=True)
+register_entry_listener(update_leaderboards)
+register_entry_listener(publish_chart_deltas)
+
+# Профилирование запросов по требованию (внутренний слой: время ожидания допуска не учитывается)
+app.add_middleware(ProfilingMiddleware, token=settings.PROFILE_TOKEN, sample_rate=settings.PROFILE_SAMPLE_RATE)
+
+# Ограничение одновременных запросов и частоты запросов пользователей
+app.add_middleware(
+    AdmissionControlMiddleware,
+    limits={
+        "auth": settings.ADMISSION_AUTH_LIMIT,
+        "chart": settings.ADMISSION_CHART_LIMIT,
+        "write": settings.ADMISSION_WRITE_LIMIT,
+        "read": settings.ADMISSION_READ_LIMIT,
+    },
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT,
+    rate=settings.RATE_LIMIT_PER_SECOND,
+    burst=settings.RATE_LIMIT_BURST,
+)
+
+# Метрики запросов (время ожидания допуска входит в длительность запроса)
+app.add_middleware(InstrumentationMiddleware)
+
+# Сжатие ответов
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+)
+
+# Идентификатор запроса для логов (внешний слой: доступен всем остальным)
+app.add_middleware(RequestIdMiddleware)
 
 # Стандартная схема авторизации через Bearer токен
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
@@ -47,6 +149,11 @@ app.include_router(entry_router, prefix="/api/entries", tags=["Entries"])
 app.include_router(user_router, prefix="/api/users", tags=["Users"])
 app.include_router(pages_router, prefix="/api/pages", tags=["Pages"])
 app.include_router(chart_router, prefix="/api/charts", tags=["Charts"])
+app.include_router(friend_router, prefix="/api/friends", tags=["Friends"])
+app.include_router(leaderboard_router, prefix="/api/leaderboards", tags=["Leaderboards"])
+app.include_router(metrics_router)
+app.include_router(profiling_router)
+app.include_router(warmup_router)
 
 @app.get("/")
 async def root():
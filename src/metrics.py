@@ -0,0 +1,194 @@
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Sequence, Union
+
+
+class Counter:
+    """
+    Монотонно растущий счетчик с необязательными метками.
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = ()):
+        """
+        Инициализация счетчика.
+
+        :param name: Имя метрики.
+        :param description: Описание метрики.
+        :param labels: Имена меток.
+        """
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """
+        Увеличивает значение счетчика.
+
+        :param amount: Величина увеличения.
+        :param labels: Значения меток.
+        """
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        """
+        Возвращает текущее значение для набора меток.
+
+        :param labels: Значения меток.
+        :return: Значение метрики.
+        """
+        return self.values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    """
+    Метрика, значение которой может как расти, так и уменьшаться.
+    """
+
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        """
+        Уменьшает значение метрики.
+
+        :param amount: Величина уменьшения.
+        :param labels: Значения меток.
+        """
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        """
+        Устанавливает значение метрики.
+
+        :param value: Новое значение.
+        :param labels: Значения меток.
+        """
+        self.values[self._key(labels)] = value
+
+
+class Histogram(Counter):
+    """
+    Распределение наблюдаемых значений по корзинам (например, длительность запросов).
+    """
+
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name: str, description: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Инициализация гистограммы.
+
+        :param name: Имя метрики.
+        :param description: Описание метрики.
+        :param labels: Имена меток.
+        :param buckets: Верхние границы корзин по возрастанию (корзина +Inf добавляется автоматически).
+        """
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+        # Для каждого набора меток: [количество в каждой корзине (не накопительное) ..., сумма, количество]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Добавляет наблюдение.
+
+        :param value: Наблюдаемое значение.
+        :param labels: Значения меток.
+        """
+        key = self._key(labels)
+        state = self.values.get(key)
+        if state is None:
+            state = self.values[key] = [0] * (len(self.buckets) + 3)
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        raise TypeError("Histogram supports observe() only")
+
+    def get(self, **labels) -> float:
+        """
+        Возвращает количество наблюдений для набора меток.
+        """
+        state = self.values.get(self._key(labels))
+        return state[-1] if state else 0
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+# Реестр всех метрик процесса
+REGISTRY: Dict[str, Metric] = {}
+
+
+def counter(name: str, description: str, labels: Sequence[str] = ()) -> Counter:
+    """
+    Возвращает счетчик из реестра, создавая его при первом обращении.
+    """
+    if name not in REGISTRY:
+        REGISTRY[name] = Counter(name, description, labels)
+    return REGISTRY[name]
+
+
+def gauge(name: str, description: str, labels: Sequence[str] = ()) -> Gauge:
+    """
+    Возвращает датчик из реестра, создавая его при первом обращении.
+    """
+    if name not in REGISTRY:
+        REGISTRY[name] = Gauge(name, description, labels)
+    return REGISTRY[name]
+
+
+def histogram(name: str, description: str, labels: Sequence[str] = (),
+              buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS) -> Histogram:
+    """
+    Возвращает гистограмму из реестра, создавая ее при первом обращении.
+    """
+    if name not in REGISTRY:
+        REGISTRY[name] = Histogram(name, description, labels, buckets)
+    return REGISTRY[name]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """
+    Формирует текстовое представление всех метрик реестра в формате Prometheus (text exposition 0.0.4).
+
+    :return: Текст для ответа /metrics.
+    """
+    lines = []
+    for metric in list(REGISTRY.values()):
+        lines.append(f"# HELP {metric.name} {_escape(metric.description)}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for key, value in list(metric.values.items()):
+            if isinstance(metric, Histogram):
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-2]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _format_value(float(bound))
+                    bucket = _format_labels(metric.labels, key, 'le="%s"' % le)
+                    lines.append(f"{metric.name}_bucket{bucket} {cumulative}")
+                lines.append(f"{metric.name}_sum{_format_labels(metric.labels, key)} {_format_value(value[-2])}")
+                lines.append(f"{metric.name}_count{_format_labels(metric.labels, key)} {value[-1]}")
+            else:
+                lines.append(f"{metric.name}{_format_labels(metric.labels, key)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,303 @@
+import asyncio
+import math
+import re
+import time
+import uuid
+import zlib
+from typing import Dict, Optional
+
+from fastapi.responses import JSONResponse
+from jose import JWTError
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него ответы сжимаются только gzip
+    brotli = None
+
+from src.logger import request_id_var
+from src.metrics import gauge, counter
+from src.user.utils import decode_token
+
+
+admission_queue_depth = gauge("admission_queue_depth",
+                              "Количество запросов, ожидающих допуска", labels=("route_class",))
+admission_in_flight = gauge("admission_in_flight",
+                            "Количество выполняющихся запросов", labels=("route_class",))
+admission_shed = counter("admission_shed_total",
+                         "Количество отклоненных запросов", labels=("route_class", "reason"))
+
+AUTH_PATHS = ("/api/users/login", "/api/users/refresh", "/api/users/register")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+def classify_request(scope) -> str:
+    """
+    Определяет класс маршрута для запроса: auth, stream, chart, write или read.
+
+    :param scope: ASGI scope запроса.
+    :return: Имя класса маршрута.
+    """
+    path = scope["path"]
+    if path.startswith(AUTH_PATHS):
+        return "auth"
+    # Долгоживущие потоки обновлений не должны занимать слоты графиков
+    if path.startswith("/api/charts/stream"):
+        return "stream"
+    if path.startswith("/api/charts"):
+        return "chart"
+    if scope["method"] in WRITE_METHODS:
+        return "write"
+    return "read"
+
+
+class TokenBucketLimiter:
+    """
+    Ограничитель частоты запросов по алгоритму token bucket, хранящий корзины в памяти процесса.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 100000):
+        """
+        Инициализация ограничителя.
+
+        :param rate: Скорость пополнения корзины (токенов в секунду).
+        :param burst: Емкость корзины.
+        :param max_keys: Максимальное количество хранимых корзин.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.buckets: Dict[str, list] = {}
+
+    def acquire(self, key: str) -> Optional[float]:
+        """
+        Пытается списать токен из корзины.
+
+        :param key: Ключ корзины (пользователь или адрес клиента).
+        :return: None, если запрос разрешен, иначе время в секундах до появления токена.
+        """
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.max_keys:
+                self._evict(now)
+            bucket = self.buckets[key] = [float(self.burst), now]
+
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return None
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate
+
+    def _evict(self, now: float) -> None:
+        # Удаляем корзины, которые уже успели полностью наполниться
+        full_after = self.burst / self.rate
+        for key in [key for key, (_, updated) in self.buckets.items() if now - updated >= full_after]:
+            del self.buckets[key]
+        if len(self.buckets) >= self.max_keys:
+            self.buckets.clear()
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware, ограничивающее количество одновременно выполняющихся запросов по классам маршрутов
+    и частоту запросов каждого пользователя. Запросы ждут допуска ограниченное время,
+    после чего отклоняются с кодом 503 и заголовком Retry-After.
+    """
+
+    def __init__(self, app, limits: Dict[str, int], queue_timeout: float, rate: float, burst: int):
+        """
+        Инициализация middleware.
+
+        :param app: ASGI-приложение.
+        :param limits: Лимиты одновременных запросов по классам маршрутов.
+        :param queue_timeout: Максимальное время ожидания допуска в секундах.
+        :param rate: Лимит запросов пользователя в секунду.
+        :param burst: Допустимый всплеск запросов пользователя.
+        """
+        self.app = app
+        self.semaphores = {route_class: asyncio.Semaphore(limit) for route_class, limit in limits.items()}
+        self.queue_timeout = queue_timeout
+        self.limiter = TokenBucketLimiter(rate, burst)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify_request(scope)
+
+        retry_after = self.limiter.acquire(self._client_key(scope))
+        if retry_after is not None:
+            admission_shed.inc(route_class=route_class, reason="rate_limit")
+            response = JSONResponse({"detail": "Too many requests"}, status_code=429,
+                                    headers={"Retry-After": str(math.ceil(retry_after))})
+            await response(scope, receive, send)
+            return
+
+        semaphore = self.semaphores.get(route_class)
+        if semaphore is None:
+            await self.app(scope, receive, send)
+            return
+
+        admission_queue_depth.inc(route_class=route_class)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            admission_shed.inc(route_class=route_class, reason="queue_timeout")
+            response = JSONResponse({"detail": "Server is overloaded"}, status_code=503,
+                                    headers={"Retry-After": str(math.ceil(self.queue_timeout))})
+            await response(scope, receive, send)
+            return
+        finally:
+            admission_queue_depth.dec(route_class=route_class)
+
+        admission_in_flight.inc(route_class=route_class)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission_in_flight.dec(route_class=route_class)
+            semaphore.release()
+
+    @staticmethod
+    def _client_key(scope) -> str:
+        # Пользователь определяется по токену (из кэша проверенных JWT), иначе по адресу клиента
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    try:
+                        username = decode_token(token).get("sub")
+                    except JWTError:
+                        break
+                    if username:
+                        return f"user:{username}"
+                break
+        client = scope.get("client")
+        return f"ip:{client[0]}" if client else "ip:unknown"
+
+
+class CompressionMiddleware:
+    """
+    Сжатие ответов (brotli, если установлен и поддерживается клиентом, иначе gzip).
+
+    Ответы меньше minimum_size, уже сжатые ответы и потоки событий (text/event-stream) передаются без изменений.
+    К ETag сжатого ответа добавляется суффикс кодировки, чтобы разные представления имели разные строгие ETag.
+    """
+
+    EXCLUDED_CONTENT_TYPES = ("text/event-stream",)
+
+    def __init__(self, app, minimum_size: int = 1000, gzip_level: int = 6, brotli_quality: int = 4):
+        """
+        :param app: ASGI-приложение.
+        :param minimum_size: Минимальный размер тела ответа для сжатия (байты).
+        :param gzip_level: Уровень сжатия gzip.
+        :param brotli_quality: Качество сжатия brotli.
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compress = None
+
+        async def send_compressed(message):
+            nonlocal start, compress
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                # Решение о сжатии принимается по заголовкам и первой части тела
+                headers = MutableHeaders(raw=start["headers"])
+                if not ("content-encoding" in headers
+                        or headers.get("content-type", "").startswith(self.EXCLUDED_CONTENT_TYPES)
+                        or (not more_body and len(body) < self.minimum_size)):
+                    compress = self._compressor(encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    if "content-length" in headers:
+                        del headers["content-length"]
+                    etag = headers.get("etag")
+                    if etag and etag.endswith('"'):
+                        headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+                await send(start)
+                start = None
+
+            if compress is None:
+                await send(message)
+            else:
+                await send({"type": "http.response.body", "body": compress(body, more_body), "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _select_encoding(accept_encoding: str) -> Optional[str]:
+        accepted = set()
+        for item in accept_encoding.split(","):
+            name, _, params = item.strip().partition(";")
+            if params.strip().replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                accepted.add(name.strip().lower())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    def _compressor(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            return lambda data, more: compressor.process(data) + (b"" if more else compressor.finish())
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return lambda data, more: compressor.compress(data) + (b"" if more else compressor.flush())
+
+
+class RequestIdMiddleware:
+    """
+    Идентификатор запроса для сквозной корреляции логов: берется из заголовка X-Request-ID
+    (если его передал клиент или балансировщик) или генерируется, сохраняется в request_id_var
+    и возвращается в заголовке ответа.
+    """
+
+    # Принимаются только короткие идентификаторы из безопасных символов: значение попадает в логи
+    VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id", "")
+        if not self.VALID_REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -1,5 +1,5 @@
 from src.database import Base
-from sqlalchemy import Column, Integer, Boolean, ForeignKey, Table, DateTime, func
+from sqlalchemy import Column, Integer, Boolean, ForeignKey, Table, DateTime, func, Index, CheckConstraint
 from sqlalchemy.ext.declarative import declared_attr
 
 
@@ -20,10 +20,18 @@ user_activity = Table('user_activity', Base.metadata,
     Column('add_entry', Boolean, default=False)
 )
 
+# Дружба хранится симметрично: для каждой пары (user_id, friend_id) существует пара (friend_id, user_id).
+# Обе строки добавляются и удаляются одним запросом в FriendService.
 user_friend = Table('user_friend', Base.metadata,
     Column('user_id', Integer, ForeignKey('user.id'), primary_key=True),
-    Column('friend_id', Integer, ForeignKey('user.id'), primary_key=True)
+    Column('friend_id', Integer, ForeignKey('user.id'), primary_key=True),
+    Index('ix_user_friend_friend_id', 'friend_id'),
+    CheckConstraint('user_id <> friend_id', name='ck_user_friend_not_self')
 )
 
-
-
+# Каталог шардов: явное размещение пользователя на шарде (хранится в основной базе данных).
+# Пользователи, которых нет в каталоге (созданные до ввода шардов), живут на шарде 0
+shard_directory = Table('shard_directory', Base.metadata,
+    Column('user_id', Integer, ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    Column('shard_id', Integer, nullable=False)
+)
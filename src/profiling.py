@@ -0,0 +1,276 @@
+"""
+Профилирование отдельных запросов по требованию.
+
+Профилирование включается заголовком X-Profile со значением PROFILE_TOKEN (для администраторов)
+или случайной выборкой с вероятностью PROFILE_SAMPLE_RATE. Отдельный поток с заданным интервалом
+снимает стек задачи запроса: если задача выполняется - стек потока цикла событий, если ожидает -
+цепочку ожидающих корутин (cr_await). Так учитывается время ожидания (например, ответа базы данных),
+а не только процессорное время, и не смешиваются одновременные запросы.
+
+Сводка по категориям (sql, dataset, serialization, other) добавляется к ответу заголовком Server-Timing,
+полный профиль сохраняется в ограниченном кольцевом буфере и доступен эндпоинтами /api/admin/profiles.
+"""
+import asyncio
+import hmac
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+from fastapi import APIRouter, Header, HTTPException
+
+from src.config import settings
+from src.middleware import classify_request
+
+# Категории времени по файлам кадров стека (проверяются от внутреннего кадра к внешнему)
+CATEGORIES = (
+    ("sql", ("/sqlalchemy/", "/asyncpg/", "/aiosqlite/")),
+    ("dataset", ("/src/chart/utils.py",)),
+    ("serialization", ("/pydantic/", "/pydantic_core/", "/orjson", "/src/responses.py", "/fastapi/encoders.py")),
+)
+
+
+class RequestProfile:
+    """
+    Профиль одного запроса: количество снимков по стекам.
+    """
+
+    def __init__(self, method: str, path: str, interval: float):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.interval = interval
+        self.status: Optional[int] = None
+        self.started = time.perf_counter()
+        self.duration = 0.0
+        self.stacks: Counter = Counter()
+        self.running_samples = 0
+        self.waiting_samples = 0
+
+    def add_sample(self, stack: tuple, running: bool) -> None:
+        self.stacks[stack] += 1
+        if running:
+            self.running_samples += 1
+        else:
+            self.waiting_samples += 1
+
+    def categories(self) -> Dict[str, float]:
+        """
+        Время по категориям в миллисекундах (оценка: количество снимков * интервал).
+        """
+        totals = {name: 0.0 for name, _ in CATEGORIES}
+        totals["other"] = 0.0
+        for stack, count in list(self.stacks.items()):
+            totals[_categorize(stack)] += count * self.interval * 1000
+        return totals
+
+    def summary(self, top: int = 20) -> dict:
+        """
+        Сводка профиля: время по категориям, самые частые стеки и функции.
+
+        :param top: Количество стеков и функций в сводке.
+        """
+        stacks = list(self.stacks.items())
+        leaves = Counter()
+        for stack, count in stacks:
+            if stack:
+                leaves[stack[-1]] += count
+        to_ms = self.interval * 1000
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 2),
+            "interval_ms": to_ms,
+            "samples": self.running_samples + self.waiting_samples,
+            "running_ms": round(self.running_samples * to_ms, 2),
+            "waiting_ms": round(self.waiting_samples * to_ms, 2),
+            "categories_ms": {name: round(value, 2) for name, value in self.categories().items()},
+            "top_stacks": [{"stack": ";".join(stack), "ms": round(count * to_ms, 2)}
+                           for stack, count in sorted(stacks, key=lambda item: -item[1])[:top]],
+            "top_functions": [{"function": function, "ms": round(count * to_ms, 2)}
+                              for function, count in leaves.most_common(top)],
+        }
+
+
+def _categorize(stack: tuple) -> str:
+    for frame in reversed(stack):
+        for name, markers in CATEGORIES:
+            if any(marker in frame for marker in markers):
+                return name
+    return "other"
+
+
+def _describe(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+
+
+def _coroutine_frames(coro) -> List:
+    # Цепочка ожидающих корутин от внешней к внутренней
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+def _thread_frames(frame, root) -> List:
+    # Стек потока от кадра профилирующего middleware к текущему кадру (кадры цикла событий и внешних слоев отбрасываются)
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        if frame is root:
+            break
+        frame = frame.f_back
+    frames.reverse()
+    return frames
+
+
+class StackSampler:
+    """
+    Поток, периодически снимающий стеки профилируемых задач.
+    """
+
+    def __init__(self, interval: float):
+        """
+        :param interval: Интервал между снимками в секундах.
+        """
+        self.interval = interval
+        self.active: Dict[asyncio.Task, tuple] = {}
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, task: asyncio.Task, profile: RequestProfile, root) -> None:
+        """
+        Начинает профилирование задачи.
+
+        :param task: Задача запроса.
+        :param profile: Профиль, в который записываются снимки.
+        :param root: Кадр, с которого начинаются снимаемые стеки.
+        """
+        self.active[task] = (profile, asyncio.get_running_loop(), threading.get_ident(), root)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+        self._wakeup.set()
+
+    def remove(self, task: asyncio.Task) -> None:
+        self.active.pop(task, None)
+
+    def _run(self) -> None:
+        while True:
+            if not self.active:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for task, (profile, loop, thread_id, root) in list(self.active.items()):
+                running = asyncio.current_task(loop) is task
+                if running:
+                    stack = _thread_frames(frames.get(thread_id), root)
+                else:
+                    stack = _coroutine_frames(task.get_coro())
+                    stack = stack[stack.index(root):] if root in stack else stack
+                profile.add_sample(tuple(_describe(frame) for frame in stack), running)
+
+
+sampler = StackSampler(settings.PROFILE_INTERVAL_MS / 1000)
+# Последние профили (кольцевой буфер)
+profiles: deque = deque(maxlen=settings.PROFILE_BUFFER_SIZE)
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запросы с заголовком X-Profile (значение - PROFILE_TOKEN) и случайную долю запросов.
+    К ответу добавляются заголовки X-Profile-Id и Server-Timing.
+    """
+
+    def __init__(self, app, token: str = "", sample_rate: float = 0.0):
+        """
+        :param app: ASGI-приложение.
+        :param token: Токен администратора для заголовка X-Profile (пустой - профилирование по заголовку выключено).
+        :param sample_rate: Доля запросов, профилируемых случайно.
+        """
+        self.app = app
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+
+    def _enabled(self, scope) -> bool:
+        if scope["type"] != "http" or classify_request(scope) == "stream":
+            return False
+        # Сравнение за постоянное время, чтобы токен нельзя было подобрать по времени ответа
+        if self.token and any(name == b"x-profile" and hmac.compare_digest(value, self.token)
+                              for name, value in scope["headers"]):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if not self._enabled(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], sampler.interval)
+        task = asyncio.current_task()
+
+        async def send_with_profile(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                timing = ", ".join(f"{name};dur={value:.1f}" for name, value in profile.categories().items())
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.id.encode()),
+                    (b"server-timing", timing.encode()),
+                ]
+            await send(message)
+
+        sampler.add(task, profile, sys._getframe())
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            sampler.remove(task)
+            profile.duration = time.perf_counter() - profile.started
+            profiles.append(profile)
+
+
+router = APIRouter()
+
+
+def check_admin(token: Optional[str]) -> None:
+    if not settings.PROFILE_TOKEN or token is None or \
+            not hmac.compare_digest(token.encode(), settings.PROFILE_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get("/api/admin/profiles", include_in_schema=False)
+async def list_profiles_endpoint(x_admin_token: Optional[str] = Header(None)):
+    """
+    Эндпоинт со списком последних профилей (без стеков). Требует заголовок X-Admin-Token.
+    """
+    check_admin(x_admin_token)
+    return [
+        {key: value for key, value in profile.summary().items() if key not in ("top_stacks", "top_functions")}
+        for profile in reversed(profiles)
+    ]
+
+
+@router.get("/api/admin/profiles/{profile_id}", include_in_schema=False)
+async def get_profile_endpoint(profile_id: str, top: int = 20, x_admin_token: Optional[str] = Header(None)):
+    """
+    Эндпоинт с полной сводкой профиля. Требует заголовок X-Admin-Token.
+
+    :param profile_id: Идентификатор профиля (заголовок X-Profile-Id ответа).
+    :param top: Количество стеков и функций в сводке.
+    """
+    check_admin(x_admin_token)
+    for profile in profiles:
+        if profile.id == profile_id:
+            return profile.summary(top)
+    raise HTTPException(status_code=404, detail="Profile not found")
@@ -0,0 +1,100 @@
+import asyncio
+from typing import Any, Dict, Hashable, Iterable, Optional, Set
+
+from src.metrics import counter, gauge
+
+pubsub_subscribers = gauge("pubsub_subscribers", "Количество активных подписок", labels=("name",))
+pubsub_published = counter("pubsub_messages_total", "Количество доставленных в очереди сообщений", labels=("name",))
+pubsub_evicted = counter("pubsub_evicted_total", "Количество отключенных медленных подписчиков", labels=("name",))
+
+
+class Subscription:
+    """
+    Подписка на набор тем с ограниченной очередью сообщений.
+    """
+
+    def __init__(self, topics: Iterable[Hashable], maxsize: int):
+        self.topics = frozenset(topics)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.evicted = False
+
+    async def get(self) -> Optional[Any]:
+        """
+        Ожидает следующее сообщение.
+
+        :return: Сообщение или None, если подписчик был отключен из-за переполнения очереди.
+        """
+        if self.evicted and self.queue.empty():
+            return None
+        return await self.queue.get()
+
+
+class PubSub:
+    """
+    Внутрипроцессная публикация/подписка. Публикация не блокируется: если очередь подписчика переполнена,
+    подписчик считается медленным и отключается.
+    """
+
+    def __init__(self, name: str, maxsize: int = 100):
+        """
+        Инициализация.
+
+        :param name: Имя для метрик.
+        :param maxsize: Размер очереди каждого подписчика.
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self.topics: Dict[Hashable, Set[Subscription]] = {}
+
+    def subscribe(self, topics: Iterable[Hashable]) -> Subscription:
+        """
+        Создает подписку на набор тем.
+
+        :param topics: Темы.
+        :return: Подписка.
+        """
+        subscription = Subscription(topics, self.maxsize)
+        for topic in subscription.topics:
+            self.topics.setdefault(topic, set()).add(subscription)
+        pubsub_subscribers.inc(name=self.name)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Удаляет подписку.
+
+        :param subscription: Подписка.
+        """
+        removed = False
+        for topic in subscription.topics:
+            subscribers = self.topics.get(topic)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                removed = True
+                if not subscribers:
+                    del self.topics[topic]
+        if removed:
+            pubsub_subscribers.dec(name=self.name)
+
+    def publish(self, topic: Hashable, message: Any) -> None:
+        """
+        Публикует сообщение всем подписчикам темы.
+
+        :param topic: Тема.
+        :param message: Сообщение.
+        """
+        for subscription in list(self.topics.get(topic, ())):
+            try:
+                subscription.queue.put_nowait(message)
+                pubsub_published.inc(name=self.name)
+            except asyncio.QueueFull:
+                self._evict(subscription)
+
+    def _evict(self, subscription: Subscription) -> None:
+        self.unsubscribe(subscription)
+        subscription.evicted = True
+        # Освобождаем очередь и будим подписчика, чтобы он узнал об отключении
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(None)
+        pubsub_evicted.inc(name=self.name)
@@ -0,0 +1,165 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import date, datetime
+from typing import AsyncIterator, List, Set
+
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.activity.models import Activity
+from src.shard import shard_router
+from src.entry.models import Entry
+from src.metrics import counter, gauge
+from src.reminder.utils import Reminder, ReminderSender, make_reminder_text
+from src.user.models import User
+
+logger = logging.getLogger(__name__)
+reminders_sent = counter("reminders_sent_total", "Количество отправленных напоминаний")
+reminders_failed = counter("reminders_failed_total", "Количество напоминаний, которые не удалось отправить")
+reminder_tick_seconds = gauge("reminder_tick_duration_seconds", "Длительность последнего тика планировщика напоминаний")
+
+
+class ReminderService:
+    """
+    Сервис для выборки напоминаний, которые нужно отправить.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Инициализация сервиса.
+
+        :param db: Асинхронная сессия SQLAlchemy.
+        """
+        self.db = db
+
+    async def iter_due_reminders(self, day: date, exclude: Set[int]) -> AsyncIterator[Reminder]:
+        """
+        Выбирает одним запросом активные активности без записей за день и группирует их по chat_id.
+
+        :param day: День, для которого проверяется наличие записей.
+        :param exclude: Активности, по которым напоминание за этот день уже отправлено.
+        :return: Асинхронный итератор напоминаний (по одному на чат).
+        """
+        has_entry_today = exists().where(Entry.activity_id == Activity.id, Entry.date_added == day.isoformat())
+        query = (
+            select(User.chat_id, Activity.id, Activity.name, Activity.notification_text)
+            .join(User, Activity.user_id == User.id)
+            .where(Activity.status.is_(True), User.chat_id.isnot(None), User.chat_id != '', ~has_entry_today)
+            .order_by(User.chat_id, Activity.id)
+            .execution_options(yield_per=1000)
+        )
+        result = await self.db.stream(query)
+        # Строки упорядочены по chat_id; группа одного чата может оказаться на границе двух партиций
+        chat_id, rows = None, []
+        async for partition in result.partitions():
+            for row in partition:
+                if row.id in exclude:
+                    continue
+                if rows and row.chat_id != chat_id:
+                    yield Reminder(chat_id, [row.id for row in rows], make_reminder_text(rows))
+                    rows = []
+                chat_id = row.chat_id
+                rows.append(row)
+        if rows:
+            yield Reminder(chat_id, [row.id for row in rows], make_reminder_text(rows))
+
+
+class ReminderScheduler:
+    """
+    Планировщик напоминаний: на каждом тике выбирает напоминания и отправляет их пачками
+    с ограниченной параллельностью и повторными попытками с экспоненциальной задержкой.
+    """
+
+    def __init__(self, sender: ReminderSender, batch_size: int, concurrency: int, max_retries: int,
+                 start_hour: int = 0, backoff: float = 0.5):
+        """
+        Инициализация планировщика.
+
+        :param sender: Отправитель напоминаний.
+        :param batch_size: Количество напоминаний в пачке.
+        :param concurrency: Максимальное количество одновременно отправляемых пачек.
+        :param max_retries: Количество повторных попыток отправки.
+        :param start_hour: Час, начиная с которого отправляются напоминания.
+        :param backoff: Начальная задержка между повторными попытками в секундах.
+        """
+        self.sender = sender
+        self.batch_size = batch_size
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.max_retries = max_retries
+        self.start_hour = start_hour
+        self.backoff = backoff
+        # Активности, по которым напоминание уже отправлено в текущий день
+        self.day = None
+        self.sent: Set[int] = set()
+
+    async def run(self, interval: int) -> None:
+        """
+        Выполняет тики планировщика с заданным интервалом.
+
+        :param interval: Интервал между тиками в секундах.
+        """
+        while True:
+            try:
+                await self.tick()
+            except Exception:
+                # Ошибка одного тика не должна останавливать планировщик
+                logger.exception("Ошибка тика планировщика напоминаний")
+            await asyncio.sleep(interval)
+
+    async def tick(self, now: datetime = None) -> int:
+        """
+        Отправляет все напоминания, которые нужно отправить в данный момент.
+
+        :param now: Текущее время (для тестов).
+        :return: Количество отправленных напоминаний.
+        """
+        now = now or datetime.now()
+        if now.date() != self.day:
+            self.day = now.date()
+            self.sent = set()
+        if now.hour < self.start_hour:
+            return 0
+
+        started = time.perf_counter()
+        tasks = []
+        batch: List[Reminder] = []
+        # Активности пользователя находятся на его домашнем шарде, поэтому чат не встречается на двух шардах
+        for shard_id in range(shard_router.count):
+            async with shard_router.session(shard_id) as db:
+                async for reminder in ReminderService(db).iter_due_reminders(self.day, self.sent):
+                    batch.append(reminder)
+                    if len(batch) >= self.batch_size:
+                        tasks.append(asyncio.create_task(self._send_with_retries(batch)))
+                        batch = []
+        if batch:
+            tasks.append(asyncio.create_task(self._send_with_retries(batch)))
+
+        delivered = sum(await asyncio.gather(*tasks))
+        reminder_tick_seconds.set(time.perf_counter() - started)
+        return delivered
+
+    async def _send_with_retries(self, batch: List[Reminder]) -> int:
+        delivered = 0
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    failed = await self.sender.send_batch(batch)
+                except Exception:
+                    logger.warning("Ошибка отправки пачки напоминаний (попытка %d)", attempt + 1, exc_info=True)
+                    failed = batch
+                for reminder in batch:
+                    if reminder not in failed:
+                        self.sent.update(reminder.activity_ids)
+                delivered += len(batch) - len(failed)
+                if not failed:
+                    break
+                batch = failed
+                if attempt < self.max_retries:
+                    # Экспоненциальная задержка со случайным разбросом
+                    await asyncio.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+            else:
+                reminders_failed.inc(len(batch))
+        reminders_sent.inc(delivered)
+        return delivered
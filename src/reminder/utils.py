@@ -0,0 +1,89 @@
+import random
+from typing import Callable, Dict, List, NamedTuple, Protocol
+
+
+class Reminder(NamedTuple):
+    """
+    Напоминание для одного чата: все активности пользователя без записей за сегодня.
+    """
+    chat_id: str
+    activity_ids: List[int]
+    text: str
+
+
+class ReminderSender(Protocol):
+    """
+    Интерфейс отправителя напоминаний.
+    """
+
+    async def send_batch(self, reminders: List[Reminder]) -> List[Reminder]:
+        """
+        Отправляет пачку напоминаний.
+
+        :param reminders: Напоминания для отправки.
+        :return: Напоминания, которые не удалось отправить (будут отправлены повторно).
+        """
+        ...
+
+
+class StubSender:
+    """
+    Локальный отправитель для тестов и бенчмарков: сохраняет напоминания в памяти
+    и может имитировать ошибки доставки.
+    """
+
+    def __init__(self, failure_rate: float = 0.0):
+        """
+        Инициализация отправителя.
+
+        :param failure_rate: Доля напоминаний, доставка которых завершается ошибкой.
+        """
+        self.failure_rate = failure_rate
+        self.sent: List[Reminder] = []
+        self.batches = 0
+
+    async def send_batch(self, reminders: List[Reminder]) -> List[Reminder]:
+        self.batches += 1
+        failed = []
+        for reminder in reminders:
+            if self.failure_rate and random.random() < self.failure_rate:
+                failed.append(reminder)
+            else:
+                self.sent.append(reminder)
+        return failed
+
+
+# Реестр отправителей, выбираемых через settings.REMINDER_SENDER
+_senders: Dict[str, Callable[[], ReminderSender]] = {"stub": StubSender}
+
+
+def register_sender(name: str, factory: Callable[[], ReminderSender]) -> None:
+    """
+    Регистрирует фабрику отправителя напоминаний.
+
+    :param name: Имя отправителя.
+    :param factory: Функция, создающая отправителя.
+    """
+    _senders[name] = factory
+
+
+def get_sender(name: str) -> ReminderSender:
+    """
+    Создает отправителя по имени.
+
+    :param name: Имя отправителя.
+    :return: Отправитель напоминаний.
+    """
+    if name not in _senders:
+        raise ValueError(f"Unknown reminder sender: {name}")
+    return _senders[name]()
+
+
+def make_reminder_text(rows) -> str:
+    """
+    Формирует текст напоминания по активностям одного чата.
+
+    :param rows: Строки с полями name и notification_text.
+    :return: Текст напоминания.
+    """
+    return "\n".join(row.notification_text or f"Не забудьте отметить: {row.name}" for row in rows)
@@ -0,0 +1,120 @@
+import hashlib
+import re
+from typing import Any, Optional, Sequence
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import TypeAdapter
+
+
+class AdapterResponse(Response):
+    """
+    JSON-ответ, сериализованный заранее созданным TypeAdapter.
+
+    Валидация ORM-объектов и кодирование в JSON выполняются pydantic за один вызов, минуя
+    проверку response_model и кодирование FastAPI. response_model маршрута остается для документации.
+    """
+    media_type = "application/json"
+
+    def __init__(self, adapter: TypeAdapter, content: Any, **kwargs):
+        """
+        :param adapter: TypeAdapter схемы ответа.
+        :param content: Объекты ответа (ORM-объекты, словари или модели pydantic).
+        """
+        self.adapter = adapter
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        return self.adapter.dump_json(self.adapter.validate_python(content, from_attributes=True))
+
+
+# Суффикс кодировки, добавляемый к ETag сжатого ответа (см. CompressionMiddleware)
+_ENCODING_SUFFIX = re.compile(r'-(gzip|br)"$')
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    Формирует строгий ETag из версии данных и параметров представления.
+
+    :param parts: Значения, от которых зависит ответ (версии данных, параметры запроса, формат).
+    :return: ETag в кавычках.
+    """
+    return '"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def etag_headers(etag: str) -> dict:
+    """
+    Заголовки ответа с ETag: клиент хранит ответ и перепроверяет его при каждом запросе.
+    """
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """
+    Проверяет If-None-Match запроса.
+
+    :param request: Запрос.
+    :param etag: Текущий ETag ресурса.
+    :return: Ответ 304, если у клиента актуальная версия, иначе None.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    tags = {_ENCODING_SUFFIX.sub('"', tag.strip().removeprefix("W/")) for tag in header.split(",")}
+    if etag in tags or "*" in tags:
+        return Response(status_code=304, headers=etag_headers(etag))
+    return None
+
+
+
+def negotiate_media_type(accept: str, offered: Sequence[str]) -> str:
+    """
+    Выбирает тип содержимого ответа по заголовку Accept с учетом q-значений: для каждого предлагаемого типа
+    берется q самого точного подходящего диапазона (type/subtype, затем type/* и */*), выбирается тип
+    с наибольшим q > 0. При равных q предпочтение отдается типу, указанному точнее, затем - порядку в offered.
+
+    :param accept: Значение заголовка Accept.
+    :param offered: Предлагаемые типы содержимого; первый используется, если заголовка нет или ни один не подходит.
+    :return: Выбранный тип содержимого.
+    """
+    ranges = []
+    for item in accept.split(","):
+        media_range, *params = item.split(";")
+        media_range = media_range.strip().lower()
+        if media_range.count("/") != 1:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value.strip()), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        ranges.append((media_range, quality))
+
+    best, best_key = offered[0], None
+    for position, media_type in enumerate(offered):
+        main_type = media_type.split("/")[0]
+        matched = None
+        for media_range, quality in ranges:
+            if media_range == media_type:
+                specificity = 2
+            elif media_range == f"{main_type}/*":
+                specificity = 1
+            elif media_range == "*/*":
+                specificity = 0
+            else:
+                continue
+            if matched is None or specificity > matched[0]:
+                matched = (specificity, quality)
+        if matched is None or matched[1] == 0:
+            continue
+        key = (matched[1], matched[0], -position)
+        if best_key is None or key > best_key:
+            best, best_key = media_type, key
+    return best
+
+
+__all__ = ["AdapterResponse", "ORJSONResponse", "make_etag", "etag_headers", "not_modified",
+           "negotiate_media_type"]
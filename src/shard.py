@@ -0,0 +1,402 @@
+"""
+Шардирование данных пользователей по user_id.
+
+Основная база данных (шард 0) хранит пользователей, друзей, сессии и каталог шардов.
+Активности, записи и серии пользователя хранятся на его домашнем шарде. Все шарды создаются одними
+и теми же миграциями; чтобы внешние ключи оставались корректными, строки, на которые ссылаются данные
+шарда (пользователь-владелец, связанные активности других пользователей), копируются на шард как зеркала.
+Зеркальные активности не имеют записей, поэтому запросы по всем шардам (scatter-gather) возвращают
+записи только с домашнего шарда активности.
+
+Пользователь без строки в каталоге шардов живет на шарде 0: все пользователи, созданные до ввода шардов,
+остаются на основной базе. Новым пользователям шард назначается при регистрации (user_id по модулю
+количества шардов). Зеркала пользователя обновляются при изменении пользователя.
+
+Идентификаторы активностей и записей должны быть уникальны между шардами: перед вводом шардов
+в эксплуатацию выполните `python -m src.shard init-sequences`.
+
+Локальная проверка с несколькими базами: SHARD_URLS со строками подключения SQLite
+(например, sqlite+aiosqlite:///shard1.db), схема создается командой `python -m src.shard migrate`.
+SQLite не поддерживает шаг последовательностей, поэтому идентификаторы на таких шардах могут совпасть
+после создания зеркал - конфигурация подходит только для функциональной проверки.
+"""
+import argparse
+import asyncio
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from fastapi import Depends
+from sqlalchemy import delete, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.activity.models import Activity, ActivityStreak, activity_activity
+from src.config import settings
+from src.dao_base import dialect_insert
+from src.database import async_session_maker, create_engine, get_db, upgrade_schema
+from src.entry.models import Entry
+from src.invalidation import publish_invalidation, register_invalidation_handler, register_resync_handler
+from src.models import shard_directory
+from src.user.models import User
+from src.user.utils import get_current_user
+
+
+class ShardRouter:
+    """
+    Маршрутизатор шардов: определяет домашний шард пользователя и выдает сессии шардов.
+    """
+
+    def __init__(self, urls: List[str]):
+        """
+        Инициализация маршрутизатора.
+
+        :param urls: Строки подключения дополнительных шардов (шард 0 - основная база данных).
+        """
+        self.session_makers = [async_session_maker] + [
+            async_sessionmaker(create_engine(url), expire_on_commit=False)
+            for url in urls
+        ]
+        # Кэш каталога: user_id -> шард
+        self.directory: Dict[int, int] = {}
+        # Пользователи, зеркала которых уже созданы на шардах: (шард, user_id)
+        self.mirrored_users: Set[tuple] = set()
+
+    @property
+    def count(self) -> int:
+        return len(self.session_makers)
+
+    def session(self, shard_id: int) -> AsyncSession:
+        """
+        Создает сессию шарда.
+
+        :param shard_id: Номер шарда.
+        :return: Асинхронная сессия SQLAlchemy.
+        """
+        session = self.session_makers[shard_id]()
+        session.info['shard_id'] = shard_id
+        return session
+
+    async def shard_for_user(self, user_id: int, db: Optional[AsyncSession] = None) -> int:
+        """
+        Определяет домашний шард пользователя по каталогу шардов. Пользователь без строки в каталоге
+        (созданный до ввода шардов) живет на шарде 0.
+
+        :param user_id: Идентификатор пользователя.
+        :param db: Сессия основной базы данных вызывающего кода (иначе открывается своя).
+        :return: Номер шарда.
+        """
+        if self.count == 1:
+            return 0
+        shard_id = self.directory.get(user_id)
+        if shard_id is None:
+            query = select(shard_directory.c.shard_id).where(shard_directory.c.user_id == user_id)
+            if db is not None:
+                shard_id = await db.scalar(query)
+            else:
+                async with async_session_maker() as db:
+                    shard_id = await db.scalar(query)
+            if shard_id is None or shard_id >= self.count:
+                shard_id = 0
+            self.directory[user_id] = shard_id
+        return shard_id
+
+    async def assign_shard(self, db: AsyncSession, user_id: int) -> None:
+        """
+        Назначает домашний шард новому пользователю (в транзакции его создания на основной базе).
+
+        :param db: Сессия основной базы данных.
+        :param user_id: Идентификатор пользователя.
+        """
+        if self.count == 1:
+            return
+        shard_id = user_id % self.count
+        await db.execute(dialect_insert(db, shard_directory).values(user_id=user_id, shard_id=shard_id)
+                         .on_conflict_do_nothing())
+        self.directory[user_id] = shard_id
+
+    def evict_directory(self, user_ids: Iterable[int]) -> None:
+        for user_id in user_ids:
+            self.directory.pop(user_id, None)
+
+    def clear_directory(self) -> None:
+        self.directory.clear()
+        self.mirrored_users.clear()
+
+    def evict_mirrors(self, user_ids: Iterable[int]) -> None:
+        # Зеркало пересоздается при следующем ensure_user с актуальными данными пользователя
+        user_ids = set(user_ids)
+        self.mirrored_users = {key for key in self.mirrored_users if key[1] not in user_ids}
+
+    async def scatter_gather(self, func: Callable[[AsyncSession], Awaitable], shard_ids: Optional[Iterable[int]] = None,
+                             db: Optional[AsyncSession] = None) -> List:
+        """
+        Выполняет функцию на нескольких шардах параллельно, каждую - в своей сессии.
+
+        :param func: Асинхронная функция, принимающая сессию шарда.
+        :param shard_ids: Номера шардов (по умолчанию - все).
+        :param db: Сессия вызывающего кода: на ее шарде функция выполняется в ней. Запрос, уже занявший
+                   соединение пула, не должен ждать второе соединение из того же пула - при исчерпании пула
+                   такие запросы ждут друг друга до таймаута.
+        :return: Список результатов в порядке шардов.
+        """
+        async def run(shard_id: int):
+            if db is not None and shard_id == db.info.get('shard_id', 0):
+                return await func(db)
+            async with self.session(shard_id) as session:
+                return await func(session)
+
+        shard_ids = list(range(self.count)) if shard_ids is None else list(shard_ids)
+        return await asyncio.gather(*(run(shard_id) for shard_id in shard_ids))
+
+    async def fetch_all(self, query, db: Optional[AsyncSession] = None) -> list:
+        """
+        Выполняет запрос на всех шардах и объединяет строки результатов.
+
+        :param query: Запрос SQLAlchemy.
+        :param db: Сессия вызывающего кода (используется для ее шарда, см. scatter_gather).
+        :return: Строки со всех шардов.
+        """
+        async def fetch(session: AsyncSession):
+            result = await session.execute(query)
+            return result.all()
+
+        rows = []
+        for shard_rows in await self.scatter_gather(fetch, db=db):
+            rows.extend(shard_rows)
+        return rows
+
+    async def execute_all(self, db: AsyncSession, query) -> list:
+        """
+        Выполняет запрос чтения в переданной сессии, а при нескольких шардах - на всех шардах.
+
+        :param db: Асинхронная сессия SQLAlchemy.
+        :param query: Запрос SQLAlchemy.
+        :return: Строки результата.
+        """
+        if self.count == 1:
+            result = await db.execute(query)
+            return result.all()
+        return await self.fetch_all(query, db)
+
+    async def ensure_user(self, db: AsyncSession, user_id: int, row: Optional[dict] = None) -> None:
+        """
+        Создает или обновляет зеркало пользователя на шарде сессии (нужно для внешних ключей и join с user).
+        Фиксирует транзакцию сессии.
+
+        :param db: Сессия шарда.
+        :param user_id: Идентификатор пользователя.
+        :param row: Строка пользователя, если уже загружена (иначе читается из основной базы данных).
+        """
+        shard_id = db.info.get('shard_id', 0)
+        if shard_id == 0 or (shard_id, user_id) in self.mirrored_users:
+            return
+        if row is None:
+            async with async_session_maker() as primary:
+                result = await primary.execute(select(User.__table__).where(User.id == user_id))
+                row = result.mappings().first()
+            if row is None:
+                return
+        await _upsert(db, User.__table__, [dict(row)])
+        await db.commit()
+        self.mirrored_users.add((shard_id, user_id))
+
+    async def refresh_user_mirrors(self, user_ids: Iterable[int]) -> None:
+        """
+        Обновляет существующие зеркала пользователей на всех шардах (имена в рейтинговых графиках).
+        Остальные воркеры получают изменение пользователя через шину инвалидации и сбрасывают кэш зеркал.
+
+        :param user_ids: Идентификаторы измененных пользователей.
+        """
+        user_ids = list(user_ids)
+        self.evict_mirrors(user_ids)
+        if self.count == 1 or not user_ids:
+            return
+        async with async_session_maker() as db:
+            result = await db.execute(select(User.__table__).where(User.id.in_(user_ids)))
+            rows = [dict(row) for row in result.mappings().all()]
+
+        async def refresh(db: AsyncSession):
+            for row in rows:
+                await db.execute(update(User.__table__).where(User.id == row['id'])
+                                 .values({key: value for key, value in row.items() if key != 'id'}))
+            await db.commit()
+
+        await self.scatter_gather(refresh, range(1, self.count))
+
+
+async def _upsert(db: AsyncSession, table, rows: List[dict]) -> None:
+    if not rows:
+        return
+    stmt = dialect_insert(db, table).values(rows)
+    columns = [column.name for column in table.primary_key.columns]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=columns,
+        set_={column.name: stmt.excluded[column.name] for column in table.columns if column.name not in columns}
+    )
+    await db.execute(stmt)
+
+
+shard_router = ShardRouter([url.strip() for url in settings.SHARD_URLS.split(",") if url.strip()])
+register_invalidation_handler('shard_directory', shard_router.evict_directory)
+register_invalidation_handler('user', shard_router.evict_mirrors)
+register_resync_handler(shard_router.clear_directory)
+
+
+async def get_user_db(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)) -> AsyncSession:
+    """
+    Зависимость, выдающая сессию домашнего шарда текущего пользователя. Для шарда 0 это сессия запроса
+    (в ней уже загружен пользователь), иначе соединение основной базы освобождается до открытия сессии шарда:
+    запрос не удерживает два соединения одновременно.
+    """
+    shard_id = await shard_router.shard_for_user(current_user.id, db)
+    if shard_id == 0:
+        yield db
+        return
+    row = {column.name: getattr(current_user, column.key) for column in User.__table__.columns}
+    await db.close()
+    async with shard_router.session(shard_id) as session:
+        await shard_router.ensure_user(session, current_user.id, row)
+        yield session
+
+
+async def ensure_activity_mirrors(db: AsyncSession, activity_ids: Iterable[int]) -> None:
+    """
+    Копирует на шард сессии зеркала активностей (и их владельцев), которых на нем нет, например,
+    перед созданием связи с активностью другого пользователя. Фиксирует транзакцию сессии.
+
+    :param db: Сессия шарда.
+    :param activity_ids: Идентификаторы активностей.
+    """
+    if shard_router.count == 1:
+        return
+    activity_ids = list(set(activity_ids))
+    result = await db.execute(select(Activity.id).where(Activity.id.in_(activity_ids)))
+    missing = set(activity_ids) - set(result.scalars().all())
+    if not missing:
+        return
+
+    rows = {}
+    for row in await shard_router.fetch_all(select(Activity.__table__).where(Activity.id.in_(missing)), db):
+        # Зеркало неактивно, чтобы не попадать в списки активностей и напоминания на чужом шарде
+        rows[row.id] = dict(row._mapping, status=False)
+    for row in rows.values():
+        await shard_router.ensure_user(db, row['user_id'])
+    await _upsert(db, Activity.__table__, list(rows.values()))
+    await db.commit()
+
+
+async def rebalance_user(user_id: int, target: int, batch_size: int = 5000) -> None:
+    """
+    Переносит данные пользователя (активности, серии, записи, исходящие связи) на другой шард
+    и обновляет каталог. На исходном шарде активности остаются зеркалами без записей, чтобы не нарушать
+    связи других пользователей. Записи, сделанные пользователем во время переноса, могут быть потеряны,
+    поэтому перенос выполняется в период обслуживания.
+
+    :param user_id: Идентификатор пользователя.
+    :param target: Номер целевого шарда.
+    :param batch_size: Размер пачки при копировании записей.
+    """
+    # Источник определяется тем же каталогом, что и маршрутизация запросов (без строки - шард 0)
+    shard_router.evict_directory([user_id])
+    source = await shard_router.shard_for_user(user_id)
+    if source == target:
+        return
+
+    async with shard_router.session(source) as src, shard_router.session(target) as dst:
+        await shard_router.ensure_user(dst, user_id)
+        result = await src.execute(select(Activity.__table__).where(Activity.user_id == user_id))
+        activities = [dict(row) for row in result.mappings().all()]
+        activity_ids = [row['id'] for row in activities]
+        await _upsert(dst, Activity.__table__, activities)
+
+        if activity_ids:
+            result = await src.execute(select(activity_activity).where(activity_activity.c.activity_one_id.in_(activity_ids)))
+            links = [dict(row) for row in result.mappings().all()]
+            await dst.commit()
+            await ensure_activity_mirrors(dst, [link['activity_two_id'] for link in links])
+            if links:
+                await dst.execute(dialect_insert(dst, activity_activity).values(links).on_conflict_do_nothing())
+
+            result = await src.execute(select(ActivityStreak.__table__).where(ActivityStreak.activity_id.in_(activity_ids)))
+            await _upsert(dst, ActivityStreak.__table__, [dict(row) for row in result.mappings().all()])
+
+            last_id = 0
+            while True:
+                result = await src.execute(
+                    select(Entry.__table__)
+                    .where(Entry.activity_id.in_(activity_ids), Entry.id > last_id)
+                    .order_by(Entry.id)
+                    .limit(batch_size)
+                )
+                entries = [dict(row) for row in result.mappings().all()]
+                if not entries:
+                    break
+                await _upsert(dst, Entry.__table__, entries)
+                last_id = entries[-1]['id']
+        await dst.commit()
+
+        async with async_session_maker() as db:
+            await _upsert(db, shard_directory, [{'user_id': user_id, 'shard_id': target}])
+            await publish_invalidation(db, 'shard_directory', [user_id])
+            await db.commit()
+        shard_router.evict_directory([user_id])
+
+        if activity_ids:
+            await src.execute(delete(Entry).where(Entry.activity_id.in_(activity_ids)))
+            await src.execute(delete(ActivityStreak).where(ActivityStreak.activity_id.in_(activity_ids)))
+            await src.execute(delete(activity_activity).where(activity_activity.c.activity_one_id.in_(activity_ids)))
+            await src.execute(update(Activity).where(Activity.id.in_(activity_ids)).values(status=False))
+            await src.commit()
+
+
+async def init_sequences() -> None:
+    """
+    Настраивает последовательности activity и entry так, чтобы шард i выдавал идентификаторы,
+    сравнимые с i по модулю количества шардов. Идентификаторы не пересекаются между шардами.
+    Последовательности есть только в Postgres.
+    """
+    if async_session_maker.kw["bind"].dialect.name != "postgresql":
+        raise SystemExit("Последовательности идентификаторов поддерживаются только для Postgres")
+    count = shard_router.count
+    for table in (Activity.__table__, Entry.__table__):
+        maxima = await shard_router.fetch_all(select(text(f"COALESCE(MAX(id), 0) FROM {table.name}")))
+        current = max(row[0] for row in maxima)
+
+        async def configure(db: AsyncSession, shard_id: int):
+            start = current + 1 + (shard_id - current - 1) % count
+            sequence = f"{table.name}_id_seq"
+            await db.execute(text(f"ALTER SEQUENCE {sequence} INCREMENT BY {count}"))
+            await db.execute(text("SELECT setval(:sequence, :start, false)"), {"sequence": sequence, "start": start})
+            await db.commit()
+
+        for shard_id in range(count):
+            async with shard_router.session(shard_id) as db:
+                await configure(db, shard_id)
+
+
+async def migrate() -> None:
+    """
+    Применяет миграции Alembic ко всем шардам (основная база - шард 0).
+    """
+    for session_maker in shard_router.session_makers:
+        await upgrade_schema(session_maker.kw["bind"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Управление шардами данных пользователей")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Применить миграции ко всем шардам")
+    move = commands.add_parser("rebalance", help="Перенести пользователя на другой шард")
+    move.add_argument("--user-id", type=int, required=True)
+    move.add_argument("--to", type=int, required=True)
+    commands.add_parser("init-sequences", help="Настроить последовательности идентификаторов шардов")
+    args = parser.parse_args()
+
+    if args.command == "rebalance":
+        asyncio.run(rebalance_user(args.user_id, args.to))
+    elif args.command == "migrate":
+        asyncio.run(migrate())
+    else:
+        asyncio.run(init_sequences())
+
+
+if __name__ == "__main__":
+    main()
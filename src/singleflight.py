@@ -0,0 +1,66 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from src.metrics import counter
+
+singleflight_calls = counter("singleflight_calls_total",
+                             "Вызовы через single-flight: leader - выполнили вычисление, coalesced - дождались чужого",
+                             labels=("name", "result"))
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых вычислений: все вызовы с одинаковым ключом, пришедшие,
+    пока вычисление выполняется, ждут одну задачу и получают один и тот же результат.
+    Вычисление выполняется в отдельной задаче, поэтому отмена одного из ожидающих на него не влияет;
+    задача отменяется, только когда отменены все ожидающие.
+    """
+
+    def __init__(self, name: str):
+        """
+        Инициализация.
+
+        :param name: Имя для метрик.
+        """
+        self.name = name
+        self.flights: Dict[Hashable, _Flight] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполняет вычисление или присоединяется к уже выполняющемуся с тем же ключом.
+
+        :param key: Ключ вычисления.
+        :param func: Функция без аргументов, возвращающая корутину вычисления.
+        :return: Результат вычисления.
+        """
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(func()))
+            self.flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+            singleflight_calls.inc(name=self.name, result="leader")
+        else:
+            singleflight_calls.inc(name=self.name, result="coalesced")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Результат больше никому не нужен
+                flight.task.cancel()
+                self._finish(key, flight)
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        if self.flights.get(key) is flight:
+            del self.flights[key]
+        if flight.task.done() and not flight.task.cancelled():
+            # Исключение получат ожидающие; помечаем его полученным, даже если ожидающих не осталось
+            flight.task.exception()
@@ -1,8 +1,7 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
 from sqlalchemy.orm import relationship
 from src.database import Base
 from src.models import TimestampMixin, user_friend, user_activity
-from passlib.context import CryptContext
 
 
 class User(Base, TimestampMixin):
@@ -14,29 +13,31 @@ class User(Base, TimestampMixin):
     chat_id = Column(String(50))
     password = Column(String(128), nullable=False)
     nick = Column(String(50), default='')
-    refresh_token = Column(String, nullable=True)
+    # Версия списка друзей (для ETag): увеличивается при добавлении и удалении друзей
+    friends_revision = Column(Integer, nullable=False, default=0, server_default='0')
 
     activities = relationship('Activity', secondary=user_activity, backref='users', lazy='joined')
     friends = relationship('User',
                            secondary=user_friend,
                            primaryjoin=(id == user_friend.c.user_id),
                            secondaryjoin=(id == user_friend.c.friend_id),
-                           backref='user_friends', lazy='joined')
+                           backref='user_friends', lazy='select')
 
-    def add_friend(self, friend):
-        if friend not in self.friends:
-            self.friends.append(friend)
-            friend.friends.append(self)
+    def __repr__(self):
+        return f'<User {self.username}>'
 
-    def remove_friend(self, friend):
-        if friend in self.friends:
-            self.friends.remove(friend)
-            friend.friends.remove(self)
 
-    def verify_password(self, password: str) -> bool:
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        return pwd_context.verify(password, self.password)
+class AuthSession(Base, TimestampMixin):
+    """
+    Сессия пользователя на отдельном устройстве. Рефреш токен хранится только в виде хеша.
+    """
+    __tablename__ = 'auth_session'
 
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    token_hash = Column(String(64), nullable=False, unique=True)
+    device = Column(String(200), default='')
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
 
     def __repr__(self):
-        return f'<User {self.username}>'
\ No newline at end of file
+        return f'<AuthSession {self.id} user={self.user_id}>'
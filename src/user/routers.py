@@ -2,12 +2,13 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status, Cookie, Request, Response
 from typing import List
-from src.user.schemas import UserCreate, UserUpdate, User, Token, UserFull, LoginRequest
-from src.user.service import UserService
+from src.user.schemas import UserCreate, UserUpdate, User, Token, UserFull, LoginRequest, user_full_adapter
+from src.user.service import UserService, AuthSessionService
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.database import get_db
+from src.responses import AdapterResponse, make_etag, etag_headers, not_modified
 from src.user.utils import get_user_by_username, ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token, get_current_user, \
-    create_refresh_token, verify_token
+    create_refresh_token, verify_token, verify_password
 from fastapi.security import OAuth2PasswordRequestForm
 
 router = APIRouter()
@@ -27,16 +28,21 @@ async def create_user_endpoint(user: UserCreate, db: AsyncSession = Depends(get_
 
 
 @router.get("/{user_id}", response_model=UserFull)
-async def get_user_by_id_endpoint(user_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_user_by_id_endpoint(user_id: int, request: Request, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
-    Эндпоинт для получения пользователя по его идентификатору.
+    Эндпоинт для получения пользователя по его идентификатору. Поддерживает условный запрос (If-None-Match).
 
     :param user_id: Идентификатор пользователя.
+    :param request: Запрос (заголовок If-None-Match).
     :param db: Асинхронная сессия SQLAlchemy.
     :return: Найденный пользователь.
     """
     service = UserService(db)
-    return await service.get_user_by_id(user_id)
+    etag = make_etag("user", user_id, await service.get_user_version(user_id))
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+    return AdapterResponse(user_full_adapter, await service.get_user_by_id(user_id), headers=etag_headers(etag))
 
 @router.put("/{user_id}", response_model=UserFull)
 async def update_user_endpoint(user_id: int, user: UserUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
@@ -66,9 +72,9 @@ async def delete_user_endpoint(user_id: int, db: AsyncSession = Depends(get_db),
 
 
 @router.post("/login", response_model=Token)
-async def login_for_access_token(login_data: LoginRequest, db: AsyncSession = Depends(get_db)):
+async def login_for_access_token(login_data: LoginRequest, request: Request, db: AsyncSession = Depends(get_db)):
     user = await get_user_by_username(db, login_data.username)
-    if not user or not user.verify_password(login_data.password):
+    if not user or not await verify_password(login_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -77,11 +83,9 @@ async def login_for_access_token(login_data: LoginRequest, db: AsyncSession = De
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = await create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
 
-    # Создание и сохранение рефреш токена
+    # Создание рефреш токена и отдельной сессии для устройства
     refresh_token = await create_refresh_token(data={"sub": user.username})
-    user.refresh_token = refresh_token
-    db.add(user)
-    await db.commit()
+    await AuthSessionService(db).create_session(user.id, refresh_token, device=request.headers.get("user-agent", ""))
 
     return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
 
@@ -99,8 +103,6 @@ async def refresh_access_token(refresh_token: str = Cookie(None), db: AsyncSessi
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Refresh token is missing from cookies",
         )
-    # Печать значения куки
-    print(f"Received refresh token: {refresh_token}")
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -108,30 +110,18 @@ async def refresh_access_token(refresh_token: str = Cookie(None), db: AsyncSessi
     )
 
     token_data = await verify_token(refresh_token, credentials_exception)
-    user = await get_user_by_username(db, token_data.username)
 
-    if user is None or user.refresh_token != refresh_token:
+    # Ротация рефреш токена: один индексированный UPDATE по хешу токена в таблице auth_session
+    new_refresh_token = await create_refresh_token(data={"sub": token_data.username})
+    user_id = await AuthSessionService(db).rotate_session(refresh_token, new_refresh_token)
+    if user_id is None:
         raise credentials_exception
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = await create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
-
-    # Генерация нового рефреш токена
-    new_refresh_token = await create_refresh_token(data={"sub": user.username})
-    user.refresh_token = new_refresh_token
-    db.add(user)
-    await db.commit()
+    access_token = await create_access_token(data={"sub": token_data.username}, expires_delta=access_token_expires)
 
     return {"access_token": access_token, "token_type": "bearer", "refresh_token": new_refresh_token}
 
-# @router.post("/refresh", response_model=Token)
-# async def refresh_access_token(request: Request, refresh_token: str = Cookie(None), db: AsyncSession = Depends(get_db)):
-#     # Печать всех куков, переданных в запросе
-#     print("All cookies:", request.cookies)
-#
-#     # Печать конкретного кука
-#     print("Refresh token cookie:", refresh_token)
-
 @router.post("/set-cookie")
 async def set_refresh_cookie(refresh_token, response: Response):
     """
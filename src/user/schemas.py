@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from typing import List, Optional
 
 # Схема для создания пользователя (User)
@@ -57,3 +57,6 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     username: str | None = None
 
+
+# Сериализатор ответа, создается один раз при импорте (после объявления Activity, на которую ссылается UserFull)
+user_full_adapter = TypeAdapter(UserFull)
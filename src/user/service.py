@@ -1,12 +1,23 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
+from sqlalchemy import delete, func, select, true, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from src.activity.models import Activity
+from src.config import settings
 from src.dao_base import BaseDAO
-from src.user.models import User
+from src.database import async_session_maker
+from src.models import user_activity, user_friend
+from src.shard import shard_router
+from src.user.models import User, AuthSession
 from src.user.schemas import UserCreate, UserUpdate
-from passlib.context import CryptContext
+from src.user.utils import hash_password, verify_password, hash_refresh_token
+
+logger = logging.getLogger(__name__)
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 class UserService:
     """
     Сервис для управления пользователями (User), предоставляющий методы для создания, обновления, получения и удаления пользователей.
@@ -18,6 +29,7 @@ class UserService:
 
         :param db: Асинхронная сессия SQLAlchemy.
         """
+        self.db = db
         self.dao = BaseDAO(db, User)
 
     async def create_user(self, user_data: UserCreate) -> User:
@@ -32,9 +44,15 @@ class UserService:
             username=user_data.username,
             chat_id=user_data.chat_id,
             nick=user_data.nick,
-            password=pwd_context.hash(user_data.password)
+            password=await hash_password(user_data.password)
         )
-        return await self.dao.create(new_user)
+        # Домашний шард назначается в той же транзакции, что и создание пользователя
+        self.db.add(new_user)
+        await self.db.flush()
+        await shard_router.assign_shard(self.db, new_user.id)
+        await self.db.commit()
+        await self.db.refresh(new_user)
+        return new_user
 
 
     async def get_user_by_id(self, user_id: int) -> User:
@@ -46,6 +64,40 @@ class UserService:
         """
         return await self.dao.get_by_id(user_id, load_related=['friends', 'activities'])
 
+    async def get_user_version(self, user_id: int) -> Optional[tuple]:
+        """
+        Получает версию пользователя вместе с его активностями и друзьями (для ETag) одним запросом.
+
+        :param user_id: Идентификатор пользователя.
+        :return: Кортеж значений, меняющийся при изменении данных ответа, или None, если пользователя нет.
+        """
+        # Состав друзей определяется версией friends_revision (сумма идентификаторов не различает наборы
+        # с одинаковой суммой), изменения самих друзей - временем их изменения
+        friend = aliased(User)
+        friends = (
+            select(func.count(friend.id).label('friend_count'), func.max(friend.updated_at).label('friend_updated_at'))
+            .join(user_friend, user_friend.c.friend_id == friend.id)
+            .where(user_friend.c.user_id == user_id)
+            .subquery()
+        )
+        activities = (
+            select(func.count(Activity.id).label('activity_count'), func.sum(Activity.id).label('activity_ids'),
+                   func.max(Activity.updated_at).label('activity_updated_at'))
+            .join(user_activity, user_activity.c.activity_id == Activity.id)
+            .where(user_activity.c.user_id == user_id)
+            .subquery()
+        )
+        # Подзапросы возвращают ровно одну строку агрегатов: соединение без условия
+        result = await self.db.execute(
+            select(User.updated_at, User.friends_revision, friends, activities)
+            .select_from(User)
+            .join(friends, true())
+            .join(activities, true())
+            .where(User.id == user_id)
+        )
+        row = result.first()
+        return tuple(row) if row else None
+
     async def update_user(self, user_id: int, user_data: UserUpdate) -> User:
         """
         Обновляет пользователя по его идентификатору.
@@ -59,12 +111,15 @@ class UserService:
             update_data = user_data.dict(exclude_unset=True)
             if 'password' in update_data:
                 # Хеширование пароля перед его обновлением
-                update_data['password'] = pwd_context.hash(update_data['password'])
+                update_data['password'] = await hash_password(update_data['password'])
 
             for field, value in update_data.items():
                 setattr(user, field, value)
 
-            return await self.dao.update(user)
+            await self.dao.update(user)
+            await shard_router.refresh_user_mirrors([user_id])
+            # refresh после фиксации сбрасывает загруженных друзей: ответ сериализуется с повторно загруженными связями
+            return await self.dao.get_by_id(user_id, load_related=['friends', 'activities'])
         return None
 
     async def delete_user(self, user_id: int) -> None:
@@ -88,6 +143,101 @@ class AuthService:
         if user is None:
             return None
         # Проверяем, совпадает ли введенный пароль с хэшированным паролем в базе данных
-        if not pwd_context.verify(password, user.password):
+        if not await verify_password(password, user.password):
             return None
-        return user
\ No newline at end of file
+        return user
+
+
+class AuthSessionService:
+    """
+    Сервис для управления сессиями пользователей (auth_session): выдача, ротация рефреш токенов
+    и очистка истекших сессий.
+    """
+
+    def __init__(self, db: AsyncSession):
+        """
+        Инициализация сервиса с DAO для работы с сессиями.
+
+        :param db: Асинхронная сессия SQLAlchemy.
+        """
+        self.db = db
+        self.dao = BaseDAO(db, AuthSession)
+
+    @staticmethod
+    def _expires_at() -> datetime:
+        return datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+    async def create_session(self, user_id: int, refresh_token: str, device: str = '') -> AuthSession:
+        """
+        Создает новую сессию для устройства пользователя.
+
+        :param user_id: Идентификатор пользователя.
+        :param refresh_token: Выданный рефреш токен.
+        :param device: Описание устройства (например, User-Agent).
+        :return: Созданная сессия.
+        """
+        session = AuthSession(
+            user_id=user_id,
+            token_hash=hash_refresh_token(refresh_token),
+            device=device[:200],
+            expires_at=self._expires_at()
+        )
+        return await self.dao.create(session)
+
+    async def rotate_session(self, refresh_token: str, new_refresh_token: str) -> Optional[int]:
+        """
+        Заменяет рефреш токен действующей сессии новым одним запросом UPDATE ... RETURNING.
+
+        :param refresh_token: Текущий рефреш токен.
+        :param new_refresh_token: Новый рефреш токен.
+        :return: Идентификатор пользователя сессии или None, если сессия не найдена или истекла.
+        """
+        stmt = (
+            update(AuthSession)
+            .where(AuthSession.token_hash == hash_refresh_token(refresh_token),
+                   AuthSession.expires_at > func.now())
+            .values(token_hash=hash_refresh_token(new_refresh_token), expires_at=self._expires_at())
+            .returning(AuthSession.user_id)
+        )
+        result = await self.db.execute(stmt)
+        user_id = result.scalar_one_or_none()
+        await self.db.commit()
+        return user_id
+
+    async def delete_expired(self, batch_size: int) -> int:
+        """
+        Удаляет истекшие сессии пачками, фиксируя транзакцию после каждой пачки.
+
+        :param batch_size: Размер пачки.
+        :return: Количество удаленных сессий.
+        """
+        deleted = 0
+        while True:
+            expired_ids = (
+                select(AuthSession.id)
+                .where(AuthSession.expires_at <= func.now())
+                .limit(batch_size)
+                .scalar_subquery()
+            )
+            result = await self.db.execute(delete(AuthSession).where(AuthSession.id.in_(expired_ids)))
+            await self.db.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                return deleted
+
+
+async def sweep_expired_sessions(interval: int, batch_size: int) -> None:
+    """
+    Фоновая задача, периодически удаляющая истекшие сессии.
+
+    :param interval: Интервал между очистками в секундах.
+    :param batch_size: Размер пачки удаления.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with async_session_maker() as db:
+                await AuthSessionService(db).delete_expired(batch_size)
+        except Exception:
+            # Ошибка очистки не должна останавливать фоновую задачу
+            logger.exception("Ошибка очистки истекших сессий")
@@ -1,5 +1,12 @@
+import asyncio
+import hashlib
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
+from passlib.context import CryptContext
 from typing import Optional
 
 from sqlalchemy.future import select  # Исправленный импорт
@@ -11,15 +18,160 @@ from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.config import settings
 from src.user.schemas import TokenData
+from src.metrics import gauge, counter
 
-# Используем конфигурационные параметры из файла настроек
-SECRET_KEY = settings.SECRET_KEY
-ALGORITHM = settings.ALGORITHM
+# Используем конфигурационные параметры из файла настроек.
+# SECRET_KEY и ALGORITHM читаются из settings при каждом обращении, чтобы поддержать ротацию ключа.
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 REFRESH_TOKEN_EXPIRE_DAYS = settings.REFRESH_TOKEN_EXPIRE_DAYS
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
+# Общий для процесса контекст bcrypt и пул потоков, в котором он выполняется,
+# чтобы хеширование не блокировало цикл событий
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS,
+                                        thread_name_prefix="bcrypt")
+_password_semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+
+password_queue_depth = gauge("password_hash_queue_depth",
+                             "Количество операций bcrypt, ожидающих свободный поток")
+password_operations = counter("password_hash_operations_total",
+                              "Количество выполненных операций bcrypt", labels=("operation",))
+
+
+async def _run_password_operation(operation: str, func, *args):
+    password_queue_depth.inc()
+    try:
+        await _password_semaphore.acquire()
+    finally:
+        password_queue_depth.dec()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_semaphore.release()
+        password_operations.inc(operation=operation)
+
+
+async def warm_up_password_hashing() -> None:
+    """
+    Инициализирует backend bcrypt и потоки хеширования до первых запросов входа
+    (первая проверка пароля иначе заметно дольше последующих).
+    """
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(_password_executor, pwd_context.dummy_verify)
+                           for _ in range(settings.PASSWORD_HASH_WORKERS)))
+
+
+async def hash_password(password: str) -> str:
+    """
+    Хеширует пароль в отдельном потоке.
+
+    :param password: Пароль в открытом виде.
+    :return: Хеш пароля.
+    """
+    return await _run_password_operation("hash", pwd_context.hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> bool:
+    """
+    Проверяет пароль по хешу в отдельном потоке.
+
+    :param password: Пароль в открытом виде.
+    :param hashed_password: Хеш пароля из базы данных.
+    :return: True, если пароль совпадает.
+    """
+    return await _run_password_operation("verify", pwd_context.verify, password, hashed_password)
+
+class TokenCache:
+    """
+    Ограниченный LRU-кэш проверенных токенов: хеш токена -> claims.
+    Запись живет ровно до момента exp токена. При смене ключа подписи кэш сбрасывается.
+    """
+
+    def __init__(self, maxsize: int):
+        """
+        Инициализация кэша.
+
+        :param maxsize: Максимальное количество записей.
+        """
+        self.maxsize = maxsize
+        self.entries: OrderedDict = OrderedDict()
+        self.key_fingerprint: Optional[str] = None
+
+    def check_key(self, fingerprint: str) -> None:
+        """
+        Сбрасывает кэш, если изменился ключ подписи или алгоритм.
+
+        :param fingerprint: Отпечаток текущего ключа.
+        """
+        if fingerprint != self.key_fingerprint:
+            self.entries.clear()
+            self.key_fingerprint = fingerprint
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Возвращает claims по ключу, если запись есть и токен еще не истек.
+
+        :param key: Хеш токена.
+        :return: Claims или None.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        claims, expires_at = entry
+        if time.time() >= expires_at:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return claims
+
+    def put(self, key: str, claims: dict) -> None:
+        """
+        Сохраняет claims проверенного токена. Токены без exp не кэшируются.
+
+        :param key: Хеш токена.
+        :param claims: Декодированные claims.
+        """
+        expires_at = claims.get("exp")
+        if expires_at is None:
+            return
+        self.entries[key] = (claims, float(expires_at))
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+token_cache = TokenCache(settings.JWT_CACHE_SIZE)
+token_cache_requests = counter("jwt_cache_requests_total",
+                               "Обращения к кэшу проверенных JWT", labels=("result",))
+
+
+def decode_token(token: str) -> dict:
+    """
+    Декодирует JWT с проверкой подписи, используя кэш проверенных токенов.
+
+    :param token: JWT.
+    :return: Claims токена.
+    :raises JWTError: Если токен недействителен или истек.
+    """
+    secret_key = settings.SECRET_KEY
+    algorithm = settings.ALGORITHM
+    token_cache.check_key(hashlib.sha256(f"{algorithm}:{secret_key}".encode()).hexdigest())
+
+    key = hashlib.sha256(token.encode()).hexdigest()
+    claims = token_cache.get(key)
+    if claims is not None:
+        token_cache_requests.inc(result="hit")
+        return claims
+
+    token_cache_requests.inc(result="miss")
+    claims = jwt.decode(token, secret_key, algorithms=[algorithm])
+    token_cache.put(key, claims)
+    return claims
+
+
 async def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -27,17 +179,28 @@ async def create_access_token(data: dict, expires_delta: Optional[timedelta] = N
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
 async def create_refresh_token(data: dict):
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     to_encode = data.copy()
-    to_encode.update({"exp": expire})
-    refresh_token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    # jti делает каждый рефреш токен уникальным, даже если они выпущены в одну секунду
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
+    refresh_token = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return refresh_token
 
 
+def hash_refresh_token(token: str) -> str:
+    """
+    Возвращает хеш рефреш токена, по которому сессия ищется в таблице auth_session.
+
+    :param token: Рефреш токен.
+    :return: SHA-256 хеш токена в шестнадцатеричном виде.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     result = await db.execute(select(User).filter(User.username == username))
     return result.scalars().first()
@@ -50,7 +213,7 @@ async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depe
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -65,7 +228,7 @@ async def get_current_user(db: AsyncSession = Depends(get_db), token: str = Depe
 
 async def verify_token(token: str, credentials_exception):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -0,0 +1,146 @@
+"""
+Прогрев приложения при старте: до первых запросов открываются соединения пула, на каждом из них выполняются
+частые запросы (SQLAlchemy кэширует их компиляцию, asyncpg - подготовленные запросы соединения),
+один раз строится схема OpenAPI и инициализируется хеширование паролей.
+
+Готовность (/health/ready) сообщается только после прогрева и снимается при остановке приложения.
+Ошибка отдельного шага прогрева записывается в лог и не останавливает запуск.
+"""
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from sqlalchemy.pool import QueuePool
+
+from src.activity.service import ActivityGraphService, ActivityService
+from src.chart.service import ChartService
+from src.chart.utils import ChartRow
+from src.config import settings
+from src.metrics import gauge
+from src.shard import shard_router
+from src.user.utils import get_user_by_username, warm_up_password_hashing
+
+logger = logging.getLogger(__name__)
+
+app_ready = gauge("app_ready", "Готово ли приложение принимать запросы")
+time_to_ready = gauge("app_time_to_ready_seconds", "Время от начала запуска приложения до готовности")
+warmup_step_duration = gauge("app_warmup_step_seconds", "Длительность шагов прогрева", labels=("step",))
+
+
+class Readiness:
+    """
+    Состояние готовности приложения.
+    """
+
+    def __init__(self):
+        self.ready = False
+
+    def set(self, ready: bool) -> None:
+        self.ready = ready
+        app_ready.set(1 if ready else 0)
+
+
+readiness = Readiness()
+
+
+async def prepare_hot_statements(db: AsyncSession) -> None:
+    """
+    Выполняет частые запросы приложения с несуществующими параметрами. Запросы строятся теми же функциями,
+    что и в обработчиках, поэтому текст SQL совпадает и попадает в кэши компиляции и подготовленных запросов.
+    Списки параметров одноэлементные: текст запросов с IN зависит от длины списка.
+
+    :param db: Сессия, привязанная к прогреваемому соединению.
+    """
+    await get_user_by_username(db, "")
+    activities = ActivityService(db)
+    await activities.get_activities_version(user_id=0)
+    await activities.get_activities_by_user(user_id=0)
+    charts = ChartService(db)
+    await charts.get_dataset_version([0])
+    await charts.entry_dao.get_rows(ChartService._entries_query([0]), dto=ChartRow)
+    await db.execute(ActivityGraphService._group_query([0]))
+
+
+async def warm_up_engine(engine: AsyncEngine, connections: int) -> None:
+    """
+    Открывает соединения пула одновременно и выполняет на каждом частые запросы; соединения возвращаются в пул.
+
+    :param engine: Асинхронный движок.
+    :param connections: Количество соединений, не больше постоянного размера пула (без пула или с одним
+                        соединением - одно: прогревается только кэш компиляции).
+    """
+    if isinstance(engine.pool, QueuePool):
+        connections = min(connections, engine.pool.size())
+    else:
+        connections = 1
+
+    async def warm(connection: AsyncConnection) -> None:
+        async with AsyncSession(bind=connection) as db:
+            await prepare_hot_statements(db)
+            await db.rollback()
+
+    opened: List[AsyncConnection] = []
+    try:
+        # Соединения удерживаются до конца прогрева, иначе пул выдавал бы одно и то же соединение
+        for _ in range(connections):
+            opened.append(await engine.connect())
+        await asyncio.gather(*(warm(connection) for connection in opened))
+    finally:
+        for connection in opened:
+            await connection.close()
+
+
+async def warm_up(app: FastAPI, started: float) -> None:
+    """
+    Прогревает приложение и сообщает готовность. Время с начала запуска записывается в метрику time-to-ready.
+
+    :param app: Приложение FastAPI.
+    :param started: Время начала запуска (time.perf_counter()).
+    """
+    connections = settings.WARMUP_CONNECTIONS
+    engines = [session_maker.kw["bind"] for session_maker in shard_router.session_makers]
+
+    steps: List[tuple] = [
+        ("openapi", lambda: asyncio.to_thread(app.openapi)),
+        ("password_hashing", warm_up_password_hashing),
+    ]
+    if connections > 0:
+        steps += [(f"database_shard_{shard_id}", lambda engine=engine: warm_up_engine(engine, connections))
+                  for shard_id, engine in enumerate(engines)]
+
+    async def run_step(name: str, step: Callable[[], Awaitable]) -> None:
+        step_started = time.perf_counter()
+        try:
+            await step()
+        except Exception:
+            logger.warning("Ошибка шага прогрева %s", name, exc_info=True)
+        finally:
+            warmup_step_duration.set(time.perf_counter() - step_started, step=name)
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*(run_step(name, step) for name, step in steps)),
+                               settings.WARMUP_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        logger.warning("Прогрев не завершился за %s с", settings.WARMUP_TIMEOUT_SECONDS)
+
+    elapsed = time.perf_counter() - started
+    time_to_ready.set(elapsed)
+    readiness.set(True)
+    logger.info("Приложение готово", extra={"time_to_ready_seconds": round(elapsed, 3)})
+
+
+router = APIRouter()
+
+
+@router.get("/health/ready", include_in_schema=False)
+async def readiness_endpoint():
+    """
+    Эндпоинт готовности для балансировщика: 200 после прогрева, 503 до него и во время остановки.
+    """
+    if not readiness.ready:
+        return ORJSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "ready"}